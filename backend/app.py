@@ -1,83 +1,210 @@
 import sys
 import os
+import time
 
 # Ensure the backend directory is on the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from flask_mail import Mail
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from config import Config
-from database.db_setup import init_db
+from database.db_setup import init_db, release_db_connection
 from routes.air_quality import air_quality_bp
 from routes.preferences import preferences_bp
 from routes.alerts import alerts_bp
+from routes.stream import stream_bp
 import services.alert_service as alert_svc
+from services import (
+    alert_jobs,
+    event_hub,
+    geocode_cache,
+    http_client,
+    json_provider,
+    mail_queue,
+    metrics,
+    poll_planner,
+    profiler,
+    reading_cache,
+    retention_service,
+    scheduler_lease,
+    scheduler_service,
+    subscriber_registry,
+    write_buffer,
+)
 
 app = Flask(__name__)
 app.config.from_object(Config)
+json_provider.install(app)
+metrics.install(app)
+profiler.install(app)
 
 # Configure Flask-Mail
 app.config.update(
     MAIL_SERVER=Config.MAIL_SERVER,
     MAIL_PORT=Config.MAIL_PORT,
-    MAIL_USE_TLS=True,
+    MAIL_USE_TLS=Config.MAIL_USE_TLS,
     MAIL_USERNAME=Config.MAIL_USERNAME,
     MAIL_PASSWORD=Config.MAIL_PASSWORD,
     MAIL_DEFAULT_SENDER=Config.MAIL_USERNAME or "noreply@airqualitymonitor.local",
 )
 
 CORS(app, resources={r"/api/*": {"origins": "*"}})
+app.teardown_appcontext(release_db_connection)
 
 mail = Mail(app)
 alert_svc.init_alert_service(mail)
+mail_queue.init_mail_queue(mail)
 
 # Register blueprints
 app.register_blueprint(air_quality_bp)
 app.register_blueprint(preferences_bp)
 app.register_blueprint(alerts_bp)
+app.register_blueprint(stream_bp)
+
+
+# Component stats shown on /api/health and exported as gauges on /api/metrics.
+STATS_SOURCES = {
+    "geocode_cache": geocode_cache.get_stats,
+    "reading_cache": reading_cache.get_stats,
+    "last_alert_check": scheduler_service.get_last_tick,
+    "upstream": http_client.get_stats,
+    "last_retention": retention_service.get_last_run,
+    "mail_queue": mail_queue.get_stats,
+    "subscribers": subscriber_registry.get_stats,
+    "write_buffer": write_buffer.get_stats,
+    "live_streams": event_hub.get_stats,
+    "alert_jobs": alert_jobs.get_stats,
+    "scheduler_lease": scheduler_lease.get_stats,
+    "poll_planner": poll_planner.get_stats,
+}
+metrics.register_stats(STATS_SOURCES)
 
 
 @app.route("/api/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok", "message": "Air Quality Monitor API is running."})
+    payload = {
+        "status": "ok",
+        "message": "Air Quality Monitor API is running.",
+    }
+    payload.update((name, get_stats()) for name, get_stats in STATS_SOURCES.items())
+    return jsonify(payload)
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/api/metrics/profiles", methods=["GET"])
+def slow_request_profiles():
+    return jsonify({
+        "success": True,
+        "enabled": profiler.enabled(),
+        "threshold_ms": Config.PROFILE_SLOW_REQUEST_MS,
+        "profiles": profiler.get_profiles(),
+    })
 
 
+@scheduler_lease.leader_only
 def scheduled_alert_check():
-    """Background job: fetch data for all tracked locations and send alerts."""
-    from database.db_setup import get_db_connection
-    from services.api_service import fetch_air_quality
-    from services.alert_service import check_and_send_alerts
+    """Background job: fetch the tracked locations that are due and send alerts."""
+    return scheduler_service.run_alert_tick()
+
 
-    conn = get_db_connection()
-    rows = conn.execute("SELECT DISTINCT location FROM user_preferences").fetchall()
-    conn.close()
+def refresh_live_streams():
+    """Background job for processes without the lease: update their own live streams.
 
-    for row in rows:
-        location = row["location"]
-        try:
-            data = fetch_air_quality(location)
-            check_and_send_alerts(location, data)
-        except Exception as e:
-            print(f"Scheduled check failed for {location}: {e}")
+    It also picks up subscriber changes made through other processes, which
+    the leader's alert check would otherwise be the only one to notice.
+    """
+    if not scheduler_lease.is_leader():
+        subscriber_registry.refresh_if_stale()
+        scheduler_service.refresh_watched()
+
+
+@app.cli.command("backfill-aqi")
+def backfill_aqi():
+    """Recompute the US EPA AQI of every stored reading and rebuild the rollups."""
+    from database.db_setup import get_db_connection
+    from models.air_quality_data import AirQualityData
+    from models.air_quality_rollup import AirQualityRollup
+    from services.aqi_calculator import compute_aqi
+
+    init_db()
+    start = time.perf_counter()
+    changed = AirQualityData.recompute_aqi(lambda columns: compute_aqi(columns)[0])
+    print(f"Recomputed AQI: {changed} reading(s) changed in {time.perf_counter() - start:.1f}s.")
+    if changed:
+        conn = get_db_connection()
+        with conn:
+            buckets = AirQualityRollup.rebuild(conn)
+        print(f"Rebuilt {buckets} hourly bucket(s) and their daily rollups.")
 
 
 def create_app():
     init_db()
+    warmed = geocode_cache.warm()
+    print(f"Geocode cache warmed with {warmed} location(s).")
+    loaded = subscriber_registry.load()
+    print(f"Subscriber registry loaded {loaded} preference(s).")
+
+    scheduler = BackgroundScheduler()
+    metrics.watch_scheduler(scheduler)
+    # With several worker processes only the lease holder runs the jobs below.
+    scheduler_lease.renew()
+    scheduler.add_job(
+        scheduler_lease.renew,
+        "interval",
+        seconds=Config.SCHEDULER_LEASE_RENEW,
+        id="scheduler_lease",
+        max_instances=1,
+        coalesce=True,
+    )
+    scheduler.add_job(
+        scheduler_lease.leader_only(retention_service.run_retention),
+        "interval",
+        hours=Config.RETENTION_INTERVAL_HOURS,
+        id="retention",
+        max_instances=1,
+        coalesce=True,
+    )
 
     if Config.OPENWEATHER_API_KEY:
-        scheduler = BackgroundScheduler()
-        scheduler.add_job(scheduled_alert_check, "interval", minutes=5, id="alert_check")
-        scheduler.start()
-        print("Background scheduler started (every 5 minutes).")
+        scheduler_service.check_deadline()
+        scheduler.add_job(
+            scheduled_alert_check,
+            "interval",
+            seconds=Config.SCHEDULER_TICK_SECONDS,
+            id="alert_check",
+            max_instances=1,
+            coalesce=True,
+        )
+        scheduler.add_job(
+            refresh_live_streams,
+            "interval",
+            seconds=Config.FOLLOWER_SYNC_SECONDS,
+            id="live_stream_refresh",
+            max_instances=1,
+            coalesce=True,
+        )
+        print(
+            f"Background alert check scheduled (every {Config.SCHEDULER_TICK_SECONDS}s, each location "
+            f"every {Config.POLL_MIN_INTERVAL}-{Config.POLL_MAX_INTERVAL}s)."
+        )
     else:
         print(
             "WARNING: OPENWEATHER_API_KEY not set. "
             "API calls will fail until a key is provided in .env"
         )
 
+    scheduler.start()
+    if profiler.enabled():
+        print(f"Profiling requests slower than {Config.PROFILE_SLOW_REQUEST_MS:g}ms.")
+    print(f"Background scheduler started (retention every {Config.RETENTION_INTERVAL_HOURS} hours).")
+
     return app
 
 
@@ -0,0 +1,62 @@
+"""Compare two run_suite.py result files and print the change of every metric.
+
+Usage:  python benchmarks/compare.py baseline.json candidate.json [--threshold 10]
+
+Metrics that got worse by more than ``--threshold`` percent are flagged;
+the exit status is 1 if any were, so the script can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+# Only timings, throughput and memory are compared; counts describe the workload.
+METRICS = ("_ms", "duration_seconds", "seed_seconds", "rows_per_second", "peak_rss_mb")
+HIGHER_IS_BETTER = ("rows_per_second",)
+SKIPPED = ("meta", "started_at", "status_codes", "upstream_calls", "mail")
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in SKIPPED:
+                continue
+            yield from flatten(item, f"{prefix}{key}.")
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            label = item.get("run", index) if isinstance(item, dict) else index
+            yield from flatten(item, f"{prefix}{label}.")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix.rstrip("."), value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline_run = json.load(f)
+    with open(args.candidate) as f:
+        candidate_run = json.load(f)
+    for key in ("scale", "upstream_latency_ms", "upstream_error_rate"):
+        if baseline_run["meta"].get(key) != candidate_run["meta"].get(key):
+            print(f"warning: runs differ in {key}; the comparison is not like for like")
+    baseline = {k: v for k, v in flatten(baseline_run) if k.endswith(METRICS)}
+    candidate = {k: v for k, v in flatten(candidate_run) if k.endswith(METRICS)}
+
+    regressions = 0
+    print(f"{'metric':52} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for metric in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[metric], candidate[metric]
+        change = (after - before) / before * 100 if before else 0.0
+        worse = -change if metric.endswith(HIGHER_IS_BETTER) else change
+        flag = "  <-- regression" if worse > args.threshold else ""
+        regressions += bool(flag)
+        print(f"{metric:52} {before:12.3f} {after:12.3f} {change:+8.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Local stand-ins for OpenWeatherMap and an SMTP server, used by the benchmarks.
+
+``FakeOpenWeatherMap`` answers the geocoding and air pollution endpoints with
+deterministic data after a configurable delay, and fails a configurable share
+of requests with ``503``. Every city name maps to its own coordinates (a hash
+of the name before the first comma), so "Paris" and "Paris, FR" resolve to the
+same place. Names starting with "nowhere" are not found.
+
+``SmtpSink`` accepts and counts messages without delivering them.
+"""
+import hashlib
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _coordinates(name):
+    digest = hashlib.md5(name.split(",")[0].strip().lower().encode()).digest()
+    lat = int.from_bytes(digest[:4], "big") / 2**32 * 120 - 60
+    lon = int.from_bytes(digest[4:8], "big") / 2**32 * 360 - 180
+    return round(lat, 4), round(lon, 4)
+
+
+class FakeOpenWeatherMap:
+    """Threaded HTTP server imitating the two OWM endpoints the backend uses."""
+
+    def __init__(self, latency=0.05, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = {"geo": 0, "air": 0, "errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        """Start serving on a free local port; returns the base URL."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _handle(self, request):
+        url = urlparse(request.path)
+        query = parse_qs(url.query)
+        time.sleep(self.latency)
+        with self._lock:
+            failing = self._random.random() < self.error_rate
+            if failing:
+                self.calls["errors"] += 1
+        if failing:
+            self._send(request, 503, {"message": "fake outage"})
+            return
+
+        if url.path.endswith("/geo/1.0/direct"):
+            with self._lock:
+                self.calls["geo"] += 1
+            name = query.get("q", [""])[0]
+            if name.lower().startswith("nowhere"):
+                body = []
+            else:
+                lat, lon = _coordinates(name)
+                body = [{"name": name.split(",")[0].strip().title(), "lat": lat, "lon": lon}]
+        elif url.path.endswith("/data/2.5/air_pollution"):
+            with self._lock:
+                self.calls["air"] += 1
+            seed = float(query.get("lat", ["0"])[0]) * 31 + float(query.get("lon", ["0"])[0])
+            rng = random.Random(seed + int(time.time() // 60))
+            body = {"list": [{
+                "main": {"aqi": rng.randint(1, 5)},
+                "components": {
+                    "pm2_5": round(rng.uniform(2, 120), 2),
+                    "pm10": round(rng.uniform(5, 200), 2),
+                    "co": round(rng.uniform(150, 1500), 2),
+                    "no2": round(rng.uniform(1, 150), 2),
+                    "o3": round(rng.uniform(10, 200), 2),
+                    "so2": round(rng.uniform(0.5, 40), 2),
+                },
+            }]}
+        else:
+            self._send(request, 404, {"message": "not found"})
+            return
+        self._send(request, 200, body)
+
+    @staticmethod
+    def _send(request, status, body):
+        payload = json.dumps(body).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(payload)))
+        request.end_headers()
+        request.wfile.write(payload)
+
+
+class SmtpSink:
+    """Minimal SMTP server that accepts every message and only counts it."""
+
+    def __init__(self):
+        self.messages = 0
+        self.sessions = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        """Start listening on a free local port; returns the port."""
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                sink._session(self)
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _session(self, handler):
+        def reply(line):
+            handler.wfile.write((line + "\r\n").encode())
+
+        with self._lock:
+            self.sessions += 1
+        reply("220 sink ready")
+        in_data = False
+        while True:
+            line = handler.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").rstrip("\r\n")
+            if in_data:
+                if command == ".":
+                    in_data = False
+                    with self._lock:
+                        self.messages += 1
+                    reply("250 queued")
+                continue
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                reply("250 sink")
+            elif verb == "DATA":
+                in_data = True
+                reply("354 end with <CRLF>.<CRLF>")
+            elif verb == "QUIT":
+                reply("221 bye")
+                return
+            else:
+                reply("250 ok")
@@ -0,0 +1,121 @@
+"""Benchmark: building and encoding a 10k-point history response.
+
+Compares the original per-row path (sqlite3.Row -> AirQualityData -> dict ->
+stdlib JSON, without the AQI labels) with the tuple-row ``rows`` layout, the
+``columns`` layout, and the optional orjson provider. Reports median latency and peak traced
+allocations per response.
+
+Usage (from backend/):  python benchmarks/history_response.py [points] [repeats]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+_tmp = tempfile.mkdtemp(prefix="aq-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bench.db"
+os.environ["DEBUG"] = "False"  # debug mode pretty-prints JSON
+
+from flask import jsonify  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app import app  # noqa: E402
+from database.db_setup import get_db_connection, init_db  # noqa: E402
+from models.air_quality_data import AirQualityData  # noqa: E402
+from models.location import Location  # noqa: E402
+from services import json_provider  # noqa: E402
+
+LOCATION = "Benchmark City"
+
+
+def seed(points):
+    with app.app_context():
+        location_id = Location.get_or_create_id(LOCATION)
+        start = datetime.utcnow() - timedelta(hours=23)
+        step = timedelta(hours=23) / points
+        conn = get_db_connection()
+        with conn:
+            conn.executemany(
+                """INSERT INTO air_quality_data
+                   (location, location_id, aqi, pm25, pm10, co, no2, o3, so2, timestamp)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (LOCATION, location_id, 50 + i % 150, 12.5 + i % 40, 30.25, 310.5, 21.75,
+                     64.0, 3.5, (start + step * i).isoformat())
+                    for i in range(points)
+                ],
+            )
+
+
+def legacy_history():
+    """The original implementation, kept here as the baseline."""
+    location_id = Location.get_id(LOCATION)
+    since = (datetime.utcnow() - timedelta(hours=24)).isoformat()
+    rows = get_db_connection().execute(
+        """SELECT * FROM air_quality_data
+           WHERE location_id = ? AND timestamp >= ?
+           ORDER BY timestamp ASC""",
+        (location_id, since),
+    ).fetchall()
+    return [AirQualityData.from_row(r).to_dict() for r in rows]
+
+
+def run_legacy():
+    with app.app_context():
+        return jsonify({"success": True, "data": legacy_history()}).get_data()
+
+
+def run_endpoint(layout):
+    client = app.test_client()
+
+    def run():
+        return client.get(f"/api/air-quality/{LOCATION}/history?range=24h&layout={layout}").get_data()
+    return run
+
+
+def measure(fn, repeats):
+    fn()  # warm up caches and the statement cache
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings) * 1000, peak / 1024 / 1024, len(body)
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    init_db()
+    seed(points)
+
+    cases = [
+        ("legacy rows + stdlib json", DefaultJSONProvider, run_legacy),
+        ("rows layout + stdlib json", DefaultJSONProvider, run_endpoint("rows")),
+        ("columns layout + stdlib json", DefaultJSONProvider, run_endpoint("columns")),
+    ]
+    if json_provider.orjson is not None:
+        cases += [("rows layout + orjson", json_provider.OrJSONProvider, run_endpoint("rows"))]
+        cases += [("columns layout + orjson", json_provider.OrJSONProvider, run_endpoint("columns"))]
+    else:
+        print("orjson is not installed; skipping the orjson cases.")
+
+    print(f"{points} points, median of {repeats} runs")
+    print(f"{'case':32} {'latency ms':>11} {'peak MiB':>9} {'bytes':>10}")
+    for name, provider, fn in cases:
+        app.json = provider(app)
+        latency, peak, size = measure(fn, repeats)
+        print(f"{name:32} {latency:11.1f} {peak:9.2f} {size:10d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""End-to-end benchmark suite.
+
+Starts a fake OpenWeatherMap and an SMTP sink on local ports, seeds a fresh
+temporary database at the chosen scale and measures:
+
+* DB write throughput of ``AirQualityData.save`` and ``save_many``
+* scheduler tick duration, with a cold and a warm geocode cache
+* p50/p99 latency of ``/api/air-quality/<location>`` (cached and upstream)
+  and ``/api/air-quality/<location>/history`` (24h raw and 30d hourly)
+* peak RSS of the process
+
+Results are written as JSON so runs can be compared for regressions.
+
+Usage (from backend/):
+    python benchmarks/run_suite.py --scale 1k --latency-ms 50 --error-rate 0.01 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeOpenWeatherMap, SmtpSink  # noqa: E402
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def latency_stats(samples):
+    return {
+        "requests": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def time_requests(client, paths, repeats):
+    samples = []
+    statuses = {}
+    for _ in range(repeats):
+        for path in paths:
+            start = time.perf_counter()
+            response = client.get(path)
+            samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    stats = latency_stats(samples)
+    stats["status_codes"] = {str(code): count for code, count in sorted(statuses.items())}
+    return stats
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", default="1k", help="dataset size: 1k, 100k or 10m history rows")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake upstream delay per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake upstream 503s")
+    parser.add_argument("--repeats", type=int, default=5, help="passes over the locations per route")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    owm = FakeOpenWeatherMap(latency=args.latency_ms / 1000, error_rate=args.error_rate)
+    smtp = SmtpSink()
+    workdir = tempfile.mkdtemp(prefix="aq-bench-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "OPENWEATHER_API_KEY": "benchmark",
+        "OPENWEATHER_BASE_URL": owm.start(),
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": str(smtp.start()),
+        "MAIL_USE_TLS": "False",
+        "MAIL_USERNAME": "",
+        "DEBUG": "False",
+        # The client-side limiter protects the real API; the fake has no quota.
+        "OWM_RATE_LIMIT_PER_MINUTE": "1000000",
+        "OWM_RATE_LIMIT_BURST": "10000",
+        "OWM_BACKOFF_BASE": "0.05",
+        # Every tick polls every location, so cold and warm ticks do the same work.
+        "POLL_MIN_INTERVAL": "0",
+        "POLL_MAX_INTERVAL": "0",
+        "POLL_BUDGET_PER_MINUTE": "0",
+    })
+
+    # Imported only now: Config reads the environment at import time.
+    from app import app
+    from database.db_setup import init_db
+    from models.air_quality_data import AirQualityData
+    from services import mail_queue, scheduler_service, subscriber_registry
+    from seed import SCALES, seed
+
+    if args.scale not in SCALES:
+        parser.error(f"--scale must be one of: {', '.join(SCALES)}")
+
+    results = {
+        "meta": {
+            "started_at": time.time(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "history_rows": SCALES[args.scale][0],
+            "locations": SCALES[args.scale][1],
+            "subscribers": SCALES[args.scale][2],
+            "upstream_latency_ms": args.latency_ms,
+            "upstream_error_rate": args.error_rate,
+        },
+    }
+
+    init_db()
+    start = time.perf_counter()
+    with app.app_context():
+        locations = seed(args.scale)
+    results["seed_seconds"] = round(time.perf_counter() - start, 3)
+    subscriber_registry.load()
+
+    with app.app_context():
+        writes = 500
+        start = time.perf_counter()
+        for i in range(writes):
+            AirQualityData.save("Benchmark Writes", {"aqi": i % 300, "pm25": 10.0})
+        single = time.perf_counter() - start
+        batch = [("Benchmark Writes", {"aqi": i % 300, "pm25": 10.0}) for i in range(5000)]
+        start = time.perf_counter()
+        AirQualityData.save_many(batch)
+        bulk = time.perf_counter() - start
+    results["db_writes"] = {
+        "save_rows_per_second": round(writes / single, 1),
+        "save_many_rows_per_second": round(len(batch) / bulk, 1),
+    }
+
+    ticks = []
+    for label in ("cold_geocode", "warm_geocode"):
+        summary = scheduler_service.run_alert_tick()
+        ticks.append({"run": label, **{k: v for k, v in summary.items() if k != "slowest"}})
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        stats = mail_queue.get_stats()
+        if stats["outbox"] == 0 and stats["sent"] + stats["failed"] >= stats["queued"]:
+            break
+        time.sleep(0.1)
+    results["scheduler_ticks"] = ticks
+    results["mail"] = {**mail_queue.get_stats(), "sink_messages": smtp.messages, "sink_sessions": smtp.sessions}
+
+    client = app.test_client()
+    quoted = [name.replace(" ", "%20") for name in locations]
+    results["routes"] = {
+        "air_quality_cached": time_requests(client, [f"/api/air-quality/{n}" for n in quoted], args.repeats),
+        "air_quality_upstream": time_requests(
+            client, [f"/api/air-quality/Uncached%20{i:04d}" for i in range(len(locations))], 1
+        ),
+        "history_24h_raw": time_requests(
+            client, [f"/api/air-quality/{n}/history?range=24h" for n in quoted], args.repeats
+        ),
+        "history_30d_hourly": time_requests(
+            client, [f"/api/air-quality/{n}/history?range=30d" for n in quoted], args.repeats
+        ),
+    }
+    results["upstream_calls"] = dict(owm.calls)
+    results["peak_rss_mb"] = peak_rss_mb()
+    results["meta"]["finished_at"] = time.time()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+    owm.stop()
+    smtp.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Synthetic data for the benchmarks.
+
+``SCALES`` names the dataset sizes by their number of stored readings. Each
+scale also fixes how many locations and subscribers exist, so one run at a
+given scale is comparable with another. Rows are bulk-inserted in chunks, and
+the rollups are rebuilt afterwards as the migrations do.
+"""
+import random
+from datetime import datetime, timedelta
+
+from database.db_setup import get_db_connection
+from models.air_quality_rollup import AirQualityRollup
+from models.location import Location
+
+# name -> (history rows, locations, subscribers)
+SCALES = {
+    "1k": (1_000, 10, 100),
+    "100k": (100_000, 50, 1_000),
+    "10m": (10_000_000, 200, 10_000),
+}
+HISTORY_DAYS = 30
+CHUNK_ROWS = 50_000
+
+
+def location_names(count):
+    return [f"Benchcity {i:04d}" for i in range(count)]
+
+
+def seed_subscribers(locations, subscribers, rng):
+    """Insert ``subscribers`` email-enabled preferences spread over ``locations``."""
+    location_ids = [Location.get_or_create_id(name) for name in locations]
+    now = datetime.utcnow().isoformat()
+    rows = []
+    for i in range(subscribers):
+        index = i % len(locations)
+        rows.append((
+            locations[index], location_ids[index], f"subscriber{i}@bench.local",
+            rng.choice((50, 100, 150)), rng.choice((12.0, 35.4)), 154.0, 100.0, 100.0, 1, now, now,
+        ))
+    conn = get_db_connection()
+    with conn:
+        conn.executemany(
+            """INSERT INTO user_preferences
+               (location, location_id, email, alert_threshold, pm25_threshold, pm10_threshold,
+                no2_threshold, o3_threshold, email_enabled, created_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+    return len(rows)
+
+
+def seed_history(locations, total_rows, rng):
+    """Insert ``total_rows`` readings spread evenly over ``HISTORY_DAYS`` days, oldest first."""
+    location_ids = [Location.get_or_create_id(name) for name in locations]
+    start = datetime.utcnow() - timedelta(days=HISTORY_DAYS)
+    step = timedelta(days=HISTORY_DAYS) / max(1, total_rows)
+    conn = get_db_connection()
+    written = 0
+    while written < total_rows:
+        count = min(CHUNK_ROWS, total_rows - written)
+        rows = []
+        for i in range(written, written + count):
+            index = i % len(locations)
+            pm25 = rng.uniform(2, 120)
+            rows.append((
+                locations[index], location_ids[index], int(pm25 * 1.5), round(pm25, 2),
+                round(rng.uniform(5, 200), 2), round(rng.uniform(150, 1500), 2),
+                round(rng.uniform(1, 150), 2), round(rng.uniform(10, 200), 2),
+                round(rng.uniform(0.5, 40), 2), (start + step * i).isoformat(),
+            ))
+        with conn:
+            conn.executemany(
+                """INSERT INTO air_quality_data
+                   (location, location_id, aqi, pm25, pm10, co, no2, o3, so2, timestamp)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+        written += count
+    with conn:
+        AirQualityRollup.rebuild(conn)
+    return written
+
+
+def seed(scale, seed=0):
+    """Seed the current database at ``scale``; returns the list of location names."""
+    history_rows, location_count, subscribers = SCALES[scale]
+    rng = random.Random(seed)
+    locations = location_names(location_count)
+    seed_subscribers(locations, subscribers, rng)
+    seed_history(locations, history_rows, rng)
+    return locations
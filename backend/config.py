@@ -6,14 +6,115 @@ load_dotenv()
 
 class Config:
     OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY", "")
+    OPENWEATHER_BASE_URL = os.environ.get("OPENWEATHER_BASE_URL", "http://api.openweathermap.org").rstrip("/")
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.gmail.com")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", 587))
-    MAIL_USE_TLS = True
+    MAIL_USE_TLS = os.environ.get("MAIL_USE_TLS", "True").lower() in ("true", "1", "yes")
     MAIL_USERNAME = os.environ.get("MAIL_USERNAME", "")
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD", "")
+    # Alert mail queue: retries for transient SMTP failures, base backoff in seconds.
+    MAIL_MAX_RETRIES = int(os.environ.get("MAIL_MAX_RETRIES", 3))
+    MAIL_RETRY_BACKOFF = float(os.environ.get("MAIL_RETRY_BACKOFF", 2.0))
+
+    # Alert state: a firing alert is re-sent only after the cooldown (or when the AQI
+    # band worsens) and clears once the value drops HYSTERESIS (fraction) below threshold.
+    ALERT_COOLDOWN_MINUTES = int(os.environ.get("ALERT_COOLDOWN_MINUTES", 360))
+    ALERT_HYSTERESIS = float(os.environ.get("ALERT_HYSTERESIS", 0.1))
+
+    # Seconds a synchronous manual alert check waits for its mail before reporting it as still pending.
+    ALERT_CHECK_SEND_TIMEOUT = float(os.environ.get("ALERT_CHECK_SEND_TIMEOUT", 30))
+
+    # Asynchronous manual alert checks: worker threads and how long finished jobs stay queryable.
+    ALERT_JOB_MAX_WORKERS = int(os.environ.get("ALERT_JOB_MAX_WORKERS", 4))
+    ALERT_JOB_RETENTION = int(os.environ.get("ALERT_JOB_RETENTION", 3600))
+    ALERT_JOB_MAX_KEPT = int(os.environ.get("ALERT_JOB_MAX_KEPT", 1000))
+
     DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///database/air_quality.db")
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key-change-in-production")
     DEBUG = os.environ.get("DEBUG", "True").lower() in ("true", "1", "yes")
+    # "auto" encodes responses with orjson when it is installed; "stdlib" forces Flask's default.
+    JSON_ENCODER = os.environ.get("JSON_ENCODER", "auto").lower()
+
+    # SQLite connection reuse: pooled connections for requests, prepared-statement
+    # cache per connection and how long a writer waits on a locked database.
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+    DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 256))
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))
+
+    # Retention: raw readings are kept for RAW_RETENTION_DAYS (minimum 1) and
+    # afterwards only in rollups. HOURLY_RETENTION_DAYS=0 keeps hourly rollups forever.
+    RAW_RETENTION_DAYS = int(os.environ.get("RAW_RETENTION_DAYS", 30))
+    HOURLY_RETENTION_DAYS = int(os.environ.get("HOURLY_RETENTION_DAYS", 365))
+    RETENTION_INTERVAL_HOURS = int(os.environ.get("RETENTION_INTERVAL_HOURS", 6))
+    RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", 500))
+    RETENTION_BATCH_PAUSE = float(os.environ.get("RETENTION_BATCH_PAUSE", 0.05))
+    VACUUM_INTERVAL_DAYS = int(os.environ.get("VACUUM_INTERVAL_DAYS", 30))
+
+    # Geocoding cache: coordinates never change, so entries live for a long time.
+    # "Location not found" answers are cached for a shorter period.
+    GEOCODE_CACHE_SIZE = int(os.environ.get("GEOCODE_CACHE_SIZE", 1024))
+    GEOCODE_CACHE_TTL = int(os.environ.get("GEOCODE_CACHE_TTL", 30 * 24 * 3600))
+    GEOCODE_NEGATIVE_TTL = int(os.environ.get("GEOCODE_NEGATIVE_TTL", 3600))
+
+    # Readings younger than READING_CACHE_TTL seconds are served without an upstream call.
+    READING_CACHE_TTL = int(os.environ.get("READING_CACHE_TTL", 300))
+    READING_CACHE_SIZE = int(os.environ.get("READING_CACHE_SIZE", 1024))
+    # POST /api/air-quality/batch: max locations per request and concurrent upstream fetches.
+    BATCH_MAX_LOCATIONS = int(os.environ.get("BATCH_MAX_LOCATIONS", 25))
+    BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 10))
+    # Rows read from the cursor and written out per chunk by /api/air-quality/export.
+    EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 5000))
+
+    # Live updates (/api/stream): buffered events for Last-Event-ID resume, heartbeat and client retry.
+    EVENT_HUB_BUFFER_SIZE = int(os.environ.get("EVENT_HUB_BUFFER_SIZE", 1000))
+    SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+    SSE_RETRY_MS = int(os.environ.get("SSE_RETRY_MS", 5000))
+
+    # Scheduled alert check: concurrent location fetches.
+    SCHEDULER_MAX_WORKERS = int(os.environ.get("SCHEDULER_MAX_WORKERS", 8))
+    # Adaptive polling: the check runs every SCHEDULER_TICK_SECONDS and fetches only the locations
+    # that are due. Each is re-polled between POLL_MIN_INTERVAL and POLL_MAX_INTERVAL seconds later,
+    # sooner when it is volatile, close to a threshold or has many subscribers. Scheduled fetches
+    # are capped at POLL_BUDGET_PER_MINUTE (0 = no cap); equal min and max give a fixed sweep.
+    SCHEDULER_TICK_SECONDS = int(os.environ.get("SCHEDULER_TICK_SECONDS", 30))
+    # Per-tick deadline (seconds); it must end SCHEDULER_TICK_MARGIN seconds before the next tick is
+    # due, which leaves time for the final write and mail flush.
+    SCHEDULER_TICK_MARGIN = 5
+    SCHEDULER_TICK_DEADLINE = int(
+        os.environ.get("SCHEDULER_TICK_DEADLINE", max(1, SCHEDULER_TICK_SECONDS - SCHEDULER_TICK_MARGIN))
+    )
+    POLL_MIN_INTERVAL = int(os.environ.get("POLL_MIN_INTERVAL", 60))
+    POLL_MAX_INTERVAL = int(os.environ.get("POLL_MAX_INTERVAL", 900))
+    POLL_BUDGET_PER_MINUTE = int(os.environ.get("POLL_BUDGET_PER_MINUTE", 30))
+    # Locations whose coordinates fall in the same grid cell (degrees) share one fetch; 0 disables.
+    LOCATION_GRID_DEGREES = float(os.environ.get("LOCATION_GRID_DEGREES", 0.01))
+
+    # Only the process holding the scheduler lease runs the background jobs. The holder renews
+    # it every SCHEDULER_LEASE_RENEW seconds; another process takes over SCHEDULER_LEASE_TTL
+    # seconds after it stops. Other processes refresh their own live streams from the database.
+    SCHEDULER_LEASE_TTL = float(os.environ.get("SCHEDULER_LEASE_TTL", 30))
+    SCHEDULER_LEASE_RENEW = float(os.environ.get("SCHEDULER_LEASE_RENEW", 10))
+    FOLLOWER_SYNC_SECONDS = float(os.environ.get("FOLLOWER_SYNC_SECONDS", 60))
+
+    # Write-behind buffer for scheduled readings: flushed at this many rows or every N seconds.
+    WRITE_BUFFER_MAX_ROWS = int(os.environ.get("WRITE_BUFFER_MAX_ROWS", 500))
+    WRITE_BUFFER_FLUSH_INTERVAL = float(os.environ.get("WRITE_BUFFER_FLUSH_INTERVAL", 5))
+    # Failed writes after which a buffered reading is dropped instead of retried.
+    WRITE_BUFFER_MAX_RETRIES = int(os.environ.get("WRITE_BUFFER_MAX_RETRIES", 3))
+
+    # OpenWeatherMap client: connection pool, client-side rate limit and retry backoff (seconds).
+    HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 16))
+    OWM_RATE_LIMIT_PER_MINUTE = int(os.environ.get("OWM_RATE_LIMIT_PER_MINUTE", 60))
+    OWM_RATE_LIMIT_BURST = int(os.environ.get("OWM_RATE_LIMIT_BURST", 10))
+    OWM_MAX_RETRIES = int(os.environ.get("OWM_MAX_RETRIES", 3))
+    OWM_BACKOFF_BASE = float(os.environ.get("OWM_BACKOFF_BASE", 0.5))
+    OWM_BACKOFF_MAX = float(os.environ.get("OWM_BACKOFF_MAX", 10))
+
+    # Sampling profiler for slow requests: 0 disables it; otherwise requests slower than
+    # this many ms keep their hot stacks (sampled every PROFILE_SAMPLE_INTERVAL_MS).
+    PROFILE_SLOW_REQUEST_MS = float(os.environ.get("PROFILE_SLOW_REQUEST_MS", 0))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", 5))
+    PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 20))
 
     # Derive the SQLite file path from DATABASE_URL
     @staticmethod
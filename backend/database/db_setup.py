@@ -1,23 +1,207 @@
-import sqlite3
 import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+
 from config import Config
 
+# Connections are long-lived: requests borrow one from a small pool for the
+# lifetime of their app context, and background threads (scheduler workers)
+# keep one per thread. Either way the connection and its prepared-statement
+# cache are reused instead of being reopened for every model call.
+_pool = queue.LifoQueue(maxsize=Config.DB_POOL_SIZE)
+_local = threading.local()
+_dir_lock = threading.Lock()
+_dir_ready = False
 
-def get_db_connection():
+
+def _ensure_db_dir(db_path):
+    global _dir_ready
+    if _dir_ready:
+        return
+    with _dir_lock:
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        _dir_ready = True
+
+
+def _connect():
     db_path = Config.get_db_path()
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    _ensure_db_dir(db_path)
+    conn = sqlite3.connect(
+        db_path,
+        timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=Config.DB_STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
+    # WAL lets readers proceed while the scheduler is writing.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {int(Config.DB_BUSY_TIMEOUT_MS)}")
+    return conn
+
+
+def _acquire():
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        return _connect()
+
+
+def _release(conn):
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+def get_db_connection():
+    """Return the connection bound to the current app context or thread.
+
+    Callers must not close it; use ``with conn:`` around writes so the
+    transaction is committed or rolled back.
+    """
+    if has_app_context():
+        conn = g.get("_db_conn")
+        if conn is None:
+            conn = g._db_conn = _acquire()
+        return conn
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _connect()
     return conn
 
 
+def release_db_connection(exc=None):
+    """Return the app context's connection to the pool (teardown handler)."""
+    conn = g.pop("_db_conn", None)
+    if conn is not None:
+        _release(conn)
+
+
+@contextmanager
+def borrowed_connection():
+    """Borrow a pooled connection for work that outlives the app context.
+
+    Streamed responses keep reading after the request's teardown has run, so
+    they cannot use ``get_db_connection()``.
+    """
+    conn = _acquire()
+    try:
+        yield conn
+    finally:
+        _release(conn)
+
+
+def _column_exists(conn, table, column):
+    return any(row["name"] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _migrate_location_ids(conn):
+    """integer location IDs with indexed exact-match lookups"""
+    from models.location import normalize_location
+
+    for table in ("air_quality_data", "user_preferences"):
+        if not _column_exists(conn, table, "location_id"):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN location_id INTEGER REFERENCES locations(id)")
+
+    # Resolve each distinct location string once, then backfill both tables in
+    # a single pass each through a keyed temporary mapping table.
+    names = [
+        row["location"]
+        for row in conn.execute(
+            "SELECT location FROM air_quality_data UNION SELECT location FROM user_preferences"
+        )
+    ]
+    conn.execute("CREATE TEMP TABLE location_map (location TEXT PRIMARY KEY, location_id INTEGER)")
+    for name in names:
+        key = normalize_location(name)
+        conn.execute("INSERT OR IGNORE INTO locations (key, name) VALUES (?, ?)", (key, name.strip()))
+        conn.execute(
+            "INSERT INTO location_map (location, location_id) SELECT ?, id FROM locations WHERE key = ?",
+            (name, key),
+        )
+    for table in ("air_quality_data", "user_preferences"):
+        conn.execute(f"""
+            UPDATE {table} SET location_id = (
+                SELECT location_id FROM location_map m WHERE m.location = {table}.location
+            ) WHERE location_id IS NULL
+        """)
+    conn.execute("DROP TABLE temp.location_map")
+
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_air_quality_location_time "
+        "ON air_quality_data (location_id, timestamp)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_user_preferences_location "
+        "ON user_preferences (location_id)"
+    )
+
+
+def _backfill_rollups(conn):
+    """hourly and daily rollups of existing readings"""
+    from models.air_quality_rollup import AirQualityRollup
+
+    AirQualityRollup.rebuild(conn)
+
+
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS = (
+    _migrate_location_ids,
+    _backfill_rollups,
+)
+
+
+def _migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock in case another process just migrated.
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            print(f"Applied database migration {number}: {migration.__doc__}.")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _enable_incremental_vacuum(conn):
+    """Switch the database to auto_vacuum=INCREMENTAL so freed pages can be reclaimed."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # Existing databases only pick up the new mode after a one-off VACUUM.
+    if conn.execute("PRAGMA page_count").fetchone()[0] > 0:
+        print("Enabling incremental vacuum (one-off VACUUM, may take a while)...")
+        conn.execute("VACUUM")
+
+
 def init_db():
-    db_path = Config.get_db_path()
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    from models.air_quality_rollup import TIERS, rollup_table_sql
 
     conn = get_db_connection()
+    _enable_incremental_vacuum(conn)
     cursor = conn.cursor()
 
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS locations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL
+        )
+    """)
+
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS user_preferences (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -49,6 +233,72 @@ def init_db():
         )
     """)
 
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            query TEXT PRIMARY KEY,
+            lat REAL,
+            lon REAL,
+            name TEXT,
+            found INTEGER NOT NULL DEFAULT 1,
+            fetched_at REAL NOT NULL
+        )
+    """)
+
+    for table, _, _ in TIERS.values():
+        cursor.execute(rollup_table_sql(table))
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alert_state (
+            preference_id INTEGER NOT NULL REFERENCES user_preferences(id),
+            metric TEXT NOT NULL,
+            firing INTEGER NOT NULL DEFAULT 0,
+            band INTEGER,
+            last_value REAL,
+            last_sent_at REAL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (preference_id, metric)
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job TEXT NOT NULL,
+            finished_at REAL NOT NULL,
+            rows_purged INTEGER NOT NULL DEFAULT 0,
+            bytes_reclaimed INTEGER NOT NULL DEFAULT 0,
+            duration_seconds REAL NOT NULL DEFAULT 0,
+            full_vacuum INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Bumped by triggers on every write, so other processes can tell in one
+    # primary-key read whether a table changed (see subscriber_registry).
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES ('user_preferences', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS user_preferences_version_{event.lower()}
+            AFTER {event} ON user_preferences
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = 'user_preferences';
+            END
+        """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            acquired_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+
     conn.commit()
-    conn.close()
+    _migrate(conn)
     print("Database initialized successfully.")
@@ -1,8 +1,18 @@
+import numpy as np
+
 from database.db_setup import get_db_connection
-from datetime import datetime
+from datetime import datetime, timedelta
+from models.air_quality_rollup import AirQualityRollup
+from models.location import Location
+from services import metrics
+
+
+COLUMNS = ("id", "location", "aqi", "pm25", "pm10", "co", "no2", "o3", "so2", "timestamp")
 
 
 class AirQualityData:
+    __slots__ = COLUMNS
+
     def __init__(self, id=None, location="", aqi=0, pm25=0.0, pm10=0.0,
                  co=0.0, no2=0.0, o3=0.0, so2=0.0, timestamp=None):
         self.id = id
@@ -48,51 +58,143 @@ class AirQualityData:
         )
 
     @classmethod
+    @metrics.timed_query
     def save(cls, location, data):
+        location_id = Location.get_or_create_id(location)
         conn = get_db_connection()
         now = datetime.utcnow().isoformat()
-        cursor = conn.execute(
-            """INSERT INTO air_quality_data
-               (location, aqi, pm25, pm10, co, no2, o3, so2, timestamp)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                location,
-                data.get("aqi", 0),
-                data.get("pm25", 0.0),
-                data.get("pm10", 0.0),
-                data.get("co", 0.0),
-                data.get("no2", 0.0),
-                data.get("o3", 0.0),
-                data.get("so2", 0.0),
-                now,
-            ),
-        )
-        conn.commit()
-        new_id = cursor.lastrowid
-        conn.close()
-        return new_id
+        with conn:
+            cursor = conn.execute(
+                """INSERT INTO air_quality_data
+                   (location, location_id, aqi, pm25, pm10, co, no2, o3, so2, timestamp)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    location,
+                    location_id,
+                    data.get("aqi", 0),
+                    data.get("pm25", 0.0),
+                    data.get("pm10", 0.0),
+                    data.get("co", 0.0),
+                    data.get("no2", 0.0),
+                    data.get("o3", 0.0),
+                    data.get("so2", 0.0),
+                    now,
+                ),
+            )
+            AirQualityRollup.refresh(conn, location_id, now)
+        return cursor.lastrowid
 
     @classmethod
-    def get_history(cls, location, hours=24):
+    @metrics.timed_query
+    def save_many(cls, readings):
+        """Insert several ``(location, data)`` readings in one transaction.
+
+        Returns the number of rows written.
+        """
+        if not readings:
+            return 0
+        location_ids = [Location.get_or_create_id(location) for location, _ in readings]
         conn = get_db_connection()
-        rows = conn.execute(
-            """SELECT * FROM air_quality_data
-               WHERE location LIKE ?
-               AND timestamp >= datetime('now', ?)
-               ORDER BY timestamp ASC""",
-            (f"%{location}%", f"-{hours} hours"),
+        now = datetime.utcnow().isoformat()
+        with conn:
+            conn.executemany(
+                """INSERT INTO air_quality_data
+                   (location, location_id, aqi, pm25, pm10, co, no2, o3, so2, timestamp)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (
+                        location,
+                        location_id,
+                        data.get("aqi", 0),
+                        data.get("pm25", 0.0),
+                        data.get("pm10", 0.0),
+                        data.get("co", 0.0),
+                        data.get("no2", 0.0),
+                        data.get("o3", 0.0),
+                        data.get("so2", 0.0),
+                        now,
+                    )
+                    for (location, data), location_id in zip(readings, location_ids)
+                ],
+            )
+            for location_id in set(location_ids):
+                AirQualityRollup.refresh(conn, location_id, now)
+        return len(readings)
+
+    @classmethod
+    @metrics.timed_query
+    def recompute_aqi(cls, compute, batch_size=50000):
+        """Recompute the stored ``aqi`` of every row with ``compute``, in id-ordered batches.
+
+        ``compute`` takes a dict of pollutant -> NumPy array and returns an
+        array of AQI values. Returns the number of rows whose AQI changed.
+        """
+        conn = get_db_connection()
+        changed = 0
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                """SELECT id, aqi, pm25, pm10, co, no2, o3, so2 FROM air_quality_data
+                   WHERE id > ? ORDER BY id LIMIT ?""",
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                return changed
+            columns = np.array([tuple(r) for r in rows], dtype=np.float64)
+            ids, old = columns[:, 0], columns[:, 1]
+            pollutants = ("pm25", "pm10", "co", "no2", "o3", "so2")
+            new = compute({p: columns[:, i + 2] for i, p in enumerate(pollutants)})
+            updates = np.flatnonzero(new != old)
+            with conn:
+                conn.executemany(
+                    "UPDATE air_quality_data SET aqi = ? WHERE id = ?",
+                    [(int(new[i]), int(ids[i])) for i in updates],
+                )
+            changed += len(updates)
+            last_id = int(ids[-1])
+
+    @classmethod
+    @metrics.timed_query
+    def _history_rows(cls, location, hours):
+        """Return the matching rows as plain tuples in ``COLUMNS`` order."""
+        location_id = Location.get_id(location)
+        if location_id is None:
+            return []
+        # Timestamps are stored as ISO-8601 strings, so compare against one.
+        since = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+        cursor = get_db_connection().cursor()
+        # Tuples instead of sqlite3.Row: these rows are only re-encoded.
+        cursor.row_factory = None
+        return cursor.execute(
+            f"""SELECT {", ".join(COLUMNS)} FROM air_quality_data
+                WHERE location_id = ? AND timestamp >= ?
+                ORDER BY timestamp ASC""",
+            (location_id, since),
         ).fetchall()
-        conn.close()
-        return [cls.from_row(r).to_dict() for r in rows]
 
     @classmethod
+    def get_history(cls, location, hours=24):
+        return [dict(zip(COLUMNS, row)) for row in cls._history_rows(location, hours)]
+
+    @classmethod
+    def get_history_columns(cls, location, hours=24):
+        """Return the history as ``{column: [values...]}``, one list per field."""
+        rows = cls._history_rows(location, hours)
+        if not rows:
+            return {column: [] for column in COLUMNS}
+        return {column: list(values) for column, values in zip(COLUMNS, zip(*rows))}
+
+    @classmethod
+    @metrics.timed_query
     def get_latest(cls, location):
+        location_id = Location.get_id(location)
+        if location_id is None:
+            return None
         conn = get_db_connection()
         row = conn.execute(
             """SELECT * FROM air_quality_data
-               WHERE location LIKE ?
+               WHERE location_id = ?
                ORDER BY timestamp DESC LIMIT 1""",
-            (f"%{location}%",),
+            (location_id,),
         ).fetchone()
-        conn.close()
         return cls.from_row(row)
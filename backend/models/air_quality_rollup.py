@@ -0,0 +1,185 @@
+import math
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from database.db_setup import get_db_connection
+from models.location import Location
+from services import metrics
+
+METRICS = ("aqi", "pm25", "pm10", "co", "no2", "o3", "so2")
+STATS = ("min", "max", "mean", "p95")
+
+# resolution -> (table, length of the ISO timestamp prefix that identifies a bucket, bucket width)
+TIERS = {
+    "hour": ("air_quality_hourly", 13, timedelta(hours=1)),
+    "day": ("air_quality_daily", 10, timedelta(days=1)),
+}
+
+_STAT_COLUMNS = [f"{metric}_{stat}" for metric in METRICS for stat in STATS]
+# Fields of each point returned by get_series, in order.
+SERIES_FIELDS = ("timestamp", "samples") + tuple(
+    field for metric in METRICS for field in (metric, f"{metric}_min", f"{metric}_max", f"{metric}_p95")
+)
+REBUILD_CHUNK = 10000  # buckets written per executemany during a rebuild
+
+
+def rollup_table_sql(table):
+    """Return the CREATE TABLE statement for a rollup tier."""
+    columns = ",\n            ".join(f"{column} REAL" for column in _STAT_COLUMNS)
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            location_id INTEGER NOT NULL REFERENCES locations(id),
+            bucket_start TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            {columns},
+            PRIMARY KEY (location_id, bucket_start)
+        ) WITHOUT ROWID
+    """
+
+
+def _bucket_bounds(timestamp, prefix_len, width):
+    """Return the ISO [start, end) of the bucket containing ``timestamp``."""
+    prefix = timestamp[:prefix_len]
+    start = datetime.fromisoformat(prefix + ("T00:00:00" if prefix_len == 10 else ":00:00"))
+    return start.isoformat(), (start + width).isoformat()
+
+
+def _p95(values):
+    """Nearest-rank 95th percentile of an already sorted list."""
+    return values[max(0, math.ceil(0.95 * len(values)) - 1)]
+
+
+def _summarize(rows):
+    stats = []
+    for i in range(len(METRICS)):
+        values = sorted(r[i] for r in rows if r[i] is not None)
+        if values:
+            stats += [values[0], values[-1], round(sum(values) / len(values), 2), _p95(values)]
+        else:
+            stats += [None, None, None, None]
+    return stats
+
+
+def _summarize_day(location_id, rows):
+    """Return ``{table: buckets}`` for one location's rows of one day, ordered by time.
+
+    ``rows`` are ``(timestamp, *METRICS)``; the day and its hours are
+    summarized from the same rows.
+    """
+    hour_table, hour_prefix, hour_width = TIERS["hour"]
+    day_table, day_prefix, day_width = TIERS["day"]
+    hours = []
+    for prefix, group in groupby(rows, key=lambda row: row[0][:hour_prefix]):
+        group = [row[1:] for row in group]
+        start, _ = _bucket_bounds(prefix, hour_prefix, hour_width)
+        hours.append((location_id, start, len(group), *_summarize(group)))
+    values = [row[1:] for row in rows]
+    start, _ = _bucket_bounds(rows[0][0], day_prefix, day_width)
+    return {hour_table: hours, day_table: [(location_id, start, len(values), *_summarize(values))]}
+
+
+def _write(conn, buckets):
+    """Upsert ``{table: [(location_id, bucket_start, samples, *stats)]}``."""
+    placeholders = ", ".join("?" * (len(_STAT_COLUMNS) + 3))
+    for table, rows in buckets.items():
+        conn.executemany(
+            f"""INSERT OR REPLACE INTO {table}
+                (location_id, bucket_start, samples, {", ".join(_STAT_COLUMNS)})
+                VALUES ({placeholders})""",
+            rows,
+        )
+
+
+class AirQualityRollup:
+    """Hourly and daily min/max/mean/p95 aggregates of ``air_quality_data``."""
+
+    @classmethod
+    @metrics.timed_query
+    def refresh(cls, conn, location_id, timestamp):
+        """Recompute the hourly and daily buckets that contain ``timestamp``.
+
+        Called inside the transaction that inserted the raw reading. The day's
+        rows are read once and the hour is summarized from its share of them;
+        the p95 cannot be updated from the stored statistics alone, so both
+        buckets are recomputed rather than adjusted.
+        """
+        hour_table, hour_prefix, hour_width = TIERS["hour"]
+        day_table, day_prefix, day_width = TIERS["day"]
+        day_start, day_end = _bucket_bounds(timestamp, day_prefix, day_width)
+        rows = conn.execute(
+            f"""SELECT timestamp, {", ".join(METRICS)} FROM air_quality_data
+                WHERE location_id = ? AND timestamp >= ? AND timestamp < ?""",
+            (location_id, day_start, day_end),
+        ).fetchall()
+        if not rows:
+            return
+        hour_start, _ = _bucket_bounds(timestamp, hour_prefix, hour_width)
+        hour = [row[1:] for row in rows if row[0][:hour_prefix] == timestamp[:hour_prefix]]
+        day = [row[1:] for row in rows]
+        _write(conn, {
+            hour_table: [(location_id, hour_start, len(hour), *_summarize(hour))] if hour else [],
+            day_table: [(location_id, day_start, len(day), *_summarize(day))],
+        })
+
+    @classmethod
+    @metrics.timed_query
+    def rebuild(cls, conn):
+        """Recompute every bucket from the raw readings (used by migrations).
+
+        One pass over the raw rows in (location, time) order: each day is
+        summarized once, together with its hours. Returns the number of hourly
+        buckets written.
+        """
+        hour_table = TIERS["hour"][0]
+        day_prefix = TIERS["day"][1]
+        rows = conn.execute(
+            f"""SELECT location_id, timestamp, {", ".join(METRICS)} FROM air_quality_data
+                WHERE location_id IS NOT NULL
+                ORDER BY location_id, timestamp"""
+        )
+        pending = {table: [] for table, _, _ in TIERS.values()}
+        hours = 0
+        for (location_id, _), day in groupby(rows, key=lambda row: (row[0], row[1][:day_prefix])):
+            for table, buckets in _summarize_day(location_id, [row[1:] for row in day]).items():
+                pending[table] += buckets
+            if len(pending[hour_table]) >= REBUILD_CHUNK:
+                hours += len(pending[hour_table])
+                _write(conn, pending)
+                pending = {table: [] for table in pending}
+        hours += len(pending[hour_table])
+        _write(conn, pending)
+        return hours
+
+    @classmethod
+    @metrics.timed_query
+    def get_series(cls, location, resolution, hours):
+        """Return the buckets of the last ``hours`` hours, oldest first.
+
+        Each point carries the mean under the plain metric name (so it can be
+        charted like a raw reading) plus ``<metric>_min``, ``_max`` and ``_p95``.
+        """
+        location_id = Location.get_id(location)
+        if location_id is None:
+            return []
+        table, prefix_len, width = TIERS[resolution]
+        since, _ = _bucket_bounds(
+            (datetime.utcnow() - timedelta(hours=hours)).isoformat(), prefix_len, width
+        )
+        conn = get_db_connection()
+        rows = conn.execute(
+            f"""SELECT * FROM {table}
+                WHERE location_id = ? AND bucket_start >= ?
+                ORDER BY bucket_start ASC""",
+            (location_id, since),
+        ).fetchall()
+
+        series = []
+        for row in rows:
+            point = {"timestamp": row["bucket_start"], "samples": row["samples"]}
+            for metric in METRICS:
+                point[metric] = row[f"{metric}_mean"]
+                point[f"{metric}_min"] = row[f"{metric}_min"]
+                point[f"{metric}_max"] = row[f"{metric}_max"]
+                point[f"{metric}_p95"] = row[f"{metric}_p95"]
+            series.append(point)
+        return series
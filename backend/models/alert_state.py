@@ -0,0 +1,95 @@
+from database.db_setup import get_db_connection
+from services import metrics
+
+
+class AlertState:
+    """Last known alert state for one (preference, metric) pair."""
+
+    def __init__(self, preference_id, metric, firing=False, band=None,
+                 last_value=None, last_sent_at=None, updated_at=None):
+        self.preference_id = preference_id
+        self.metric = metric
+        self.firing = firing
+        self.band = band
+        self.last_value = last_value
+        self.last_sent_at = last_sent_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_row(cls, row):
+        if row is None:
+            return None
+        return cls(
+            preference_id=row["preference_id"],
+            metric=row["metric"],
+            firing=bool(row["firing"]),
+            band=row["band"],
+            last_value=row["last_value"],
+            last_sent_at=row["last_sent_at"],
+            updated_at=row["updated_at"],
+        )
+
+    @classmethod
+    @metrics.timed_query
+    def get_firing_for_location(cls, location_id):
+        """Return {(preference_id, metric): AlertState} of the firing alerts of a location.
+
+        States that are not firing behave exactly like missing ones, so they are not loaded.
+        """
+        conn = get_db_connection()
+        rows = conn.execute(
+            """SELECT s.* FROM alert_state s
+               JOIN user_preferences p ON p.id = s.preference_id
+               WHERE p.location_id = ? AND s.firing = 1""",
+            (location_id,),
+        ).fetchall()
+        return {(row["preference_id"], row["metric"]): cls.from_row(row) for row in rows}
+
+    @classmethod
+    @metrics.timed_query
+    def save_many(cls, states):
+        """Upsert a batch of states in one transaction.
+
+        While a row is firing its band and send time belong to ``mark_sent``:
+        a delivery may finish between loading a state and saving it, so they
+        are only taken from ``states`` for new rows and rows that were clear.
+        """
+        if not states:
+            return
+        conn = get_db_connection()
+        with conn:
+            conn.executemany(
+                """INSERT INTO alert_state
+                   (preference_id, metric, firing, band, last_value, last_sent_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (preference_id, metric) DO UPDATE SET
+                       band = CASE WHEN alert_state.firing THEN alert_state.band ELSE excluded.band END,
+                       last_sent_at = CASE WHEN alert_state.firing
+                                           THEN alert_state.last_sent_at ELSE excluded.last_sent_at END,
+                       firing = excluded.firing,
+                       last_value = excluded.last_value,
+                       updated_at = excluded.updated_at""",
+                [
+                    (s.preference_id, s.metric, 1 if s.firing else 0, s.band,
+                     s.last_value, s.last_sent_at, s.updated_at)
+                    for s in states
+                ],
+            )
+
+    @classmethod
+    @metrics.timed_query
+    def mark_sent(cls, alerts, sent_at):
+        """Record a delivered alert: ``alerts`` are ``(preference_id, metric, band)`` it carried.
+
+        The band and send time only change once the mail went out, so a failed
+        delivery leaves the cooldown and escalation checks where they were.
+        """
+        if not alerts:
+            return
+        conn = get_db_connection()
+        with conn:
+            conn.executemany(
+                "UPDATE alert_state SET band = ?, last_sent_at = ? WHERE preference_id = ? AND metric = ?",
+                [(band, sent_at, preference_id, metric) for preference_id, metric, band in alerts],
+            )
+
@@ -0,0 +1,52 @@
+import threading
+
+from database.db_setup import get_db_connection
+from services import metrics
+
+
+def normalize_location(name):
+    """Return the lookup key for a location name: lower-cased, whitespace collapsed."""
+    return " ".join((name or "").lower().split())
+
+
+class Location:
+    """Integer IDs for normalized location names.
+
+    IDs are never reassigned, so resolved keys are memoized in-process and most
+    lookups do not touch the database.
+    """
+
+    _ids = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    @metrics.timed_query
+    def get_id(cls, name):
+        """Return the ID for ``name`` or None if the location has never been stored."""
+        key = normalize_location(name)
+        location_id = cls._ids.get(key)
+        if location_id is not None:
+            return location_id
+        conn = get_db_connection()
+        row = conn.execute("SELECT id FROM locations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with cls._lock:
+            cls._ids[key] = row["id"]
+        return row["id"]
+
+    @classmethod
+    @metrics.timed_query
+    def get_or_create_id(cls, name):
+        """Return the ID for ``name``, inserting a new location if needed."""
+        location_id = cls.get_id(name)
+        if location_id is not None:
+            return location_id
+        key = normalize_location(name)
+        conn = get_db_connection()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO locations (key, name) VALUES (?, ?)",
+                (key, name.strip()),
+            )
+        return cls.get_id(name)
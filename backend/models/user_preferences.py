@@ -1,5 +1,7 @@
 from database.db_setup import get_db_connection
 from datetime import datetime
+from models.location import Location
+from services import metrics, subscriber_registry
 
 
 class UserPreferences:
@@ -53,77 +55,95 @@ class UserPreferences:
         )
 
     @classmethod
+    @metrics.timed_query
+    def _write_through(cls, user_id):
+        """Push the stored row to the in-memory subscriber registry and return it."""
+        conn = get_db_connection()
+        row = conn.execute(
+            "SELECT * FROM user_preferences WHERE id = ?", (user_id,)
+        ).fetchone()
+        if row is not None:
+            subscriber_registry.upsert(row)
+        return cls.from_row(row)
+
+    @classmethod
+    @metrics.timed_query
     def get_by_id(cls, user_id):
         conn = get_db_connection()
         row = conn.execute(
             "SELECT * FROM user_preferences WHERE id = ?", (user_id,)
         ).fetchone()
-        conn.close()
         return cls.from_row(row)
 
     @classmethod
+    @metrics.timed_query
     def create(cls, data):
+        location_id = Location.get_or_create_id(data.get("location", ""))
         conn = get_db_connection()
         now = datetime.utcnow().isoformat()
-        cursor = conn.execute(
-            """INSERT INTO user_preferences
-               (location, email, alert_threshold, pm25_threshold, pm10_threshold,
-                no2_threshold, o3_threshold, email_enabled, created_at, updated_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                data.get("location", ""),
-                data.get("email", ""),
-                data.get("alert_threshold", 150),
-                data.get("pm25_threshold", 35.4),
-                data.get("pm10_threshold", 154.0),
-                data.get("no2_threshold", 100.0),
-                data.get("o3_threshold", 100.0),
-                1 if data.get("email_enabled", False) else 0,
-                now,
-                now,
-            ),
-        )
-        conn.commit()
-        new_id = cursor.lastrowid
-        conn.close()
-        return cls.get_by_id(new_id)
+        with conn:
+            cursor = conn.execute(
+                """INSERT INTO user_preferences
+                   (location, location_id, email, alert_threshold, pm25_threshold, pm10_threshold,
+                    no2_threshold, o3_threshold, email_enabled, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    data.get("location", ""),
+                    location_id,
+                    data.get("email", ""),
+                    data.get("alert_threshold", 150),
+                    data.get("pm25_threshold", 35.4),
+                    data.get("pm10_threshold", 154.0),
+                    data.get("no2_threshold", 100.0),
+                    data.get("o3_threshold", 100.0),
+                    1 if data.get("email_enabled", False) else 0,
+                    now,
+                    now,
+                ),
+            )
+        return cls._write_through(cursor.lastrowid)
 
     @classmethod
+    @metrics.timed_query
     def update(cls, user_id, data):
+        location_id = Location.get_or_create_id(data["location"]) if data.get("location") else None
         conn = get_db_connection()
         now = datetime.utcnow().isoformat()
-        conn.execute(
-            """UPDATE user_preferences SET
-               location = COALESCE(?, location),
-               email = COALESCE(?, email),
-               alert_threshold = COALESCE(?, alert_threshold),
-               pm25_threshold = COALESCE(?, pm25_threshold),
-               pm10_threshold = COALESCE(?, pm10_threshold),
-               no2_threshold = COALESCE(?, no2_threshold),
-               o3_threshold = COALESCE(?, o3_threshold),
-               email_enabled = COALESCE(?, email_enabled),
-               updated_at = ?
-               WHERE id = ?""",
-            (
-                data.get("location"),
-                data.get("email"),
-                data.get("alert_threshold"),
-                data.get("pm25_threshold"),
-                data.get("pm10_threshold"),
-                data.get("no2_threshold"),
-                data.get("o3_threshold"),
-                1 if data.get("email_enabled") else (0 if "email_enabled" in data else None),
-                now,
-                user_id,
-            ),
-        )
-        conn.commit()
-        conn.close()
-        return cls.get_by_id(user_id)
+        with conn:
+            conn.execute(
+                """UPDATE user_preferences SET
+                   location = COALESCE(?, location),
+                   location_id = COALESCE(?, location_id),
+                   email = COALESCE(?, email),
+                   alert_threshold = COALESCE(?, alert_threshold),
+                   pm25_threshold = COALESCE(?, pm25_threshold),
+                   pm10_threshold = COALESCE(?, pm10_threshold),
+                   no2_threshold = COALESCE(?, no2_threshold),
+                   o3_threshold = COALESCE(?, o3_threshold),
+                   email_enabled = COALESCE(?, email_enabled),
+                   updated_at = ?
+                   WHERE id = ?""",
+                (
+                    data.get("location"),
+                    location_id,
+                    data.get("email"),
+                    data.get("alert_threshold"),
+                    data.get("pm25_threshold"),
+                    data.get("pm10_threshold"),
+                    data.get("no2_threshold"),
+                    data.get("o3_threshold"),
+                    1 if data.get("email_enabled") else (0 if "email_enabled" in data else None),
+                    now,
+                    user_id,
+                ),
+            )
+        return cls._write_through(user_id)
 
     @classmethod
+    @metrics.timed_query
     def delete(cls, user_id):
         conn = get_db_connection()
-        conn.execute("DELETE FROM user_preferences WHERE id = ?", (user_id,))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute("DELETE FROM alert_state WHERE preference_id = ?", (user_id,))
+            conn.execute("DELETE FROM user_preferences WHERE id = ?", (user_id,))
+        subscriber_registry.remove(user_id)
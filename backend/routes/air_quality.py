@@ -1,28 +1,167 @@
-from flask import Blueprint, jsonify
-from services.api_service import fetch_air_quality, fetch_air_quality_history
+import re
+from datetime import datetime
+
+from flask import Blueprint, Response, jsonify, request
+from config import Config
+from models.location import Location
+from services import export_service
+from services.api_service import (
+    HISTORY_LAYOUTS,
+    HISTORY_RESOLUTIONS,
+    choose_resolution,
+    fetch_air_quality_history,
+)
+from services.reading_cache import get_reading, get_readings
 from services.recommendation_service import get_recommendations
 
 air_quality_bp = Blueprint("air_quality", __name__)
 
+RANGE_PATTERN = re.compile(r"^(\d+)([hdwy])$")
+RANGE_UNIT_HOURS = {"h": 1, "d": 24, "w": 24 * 7, "y": 24 * 365}
+
+
+def _parse_range(value):
+    """Convert a range such as ``24h``, ``30d`` or ``1y`` to hours."""
+    match = RANGE_PATTERN.match(value.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid range '{value}'. Use e.g. 24h, 7d, 30d or 1y.")
+    return int(match.group(1)) * RANGE_UNIT_HOURS[match.group(2)]
+
 
 @air_quality_bp.route("/api/air-quality/<path:location>", methods=["GET"])
 def get_air_quality(location):
     """Fetch current air quality for a location."""
     try:
-        data = fetch_air_quality(location)
+        data, cached, age_seconds = get_reading(location)
         recommendations = get_recommendations(data["aqi"])
-        return jsonify({"success": True, "data": data, "recommendations": recommendations})
+        return jsonify({
+            "success": True,
+            "data": data,
+            "recommendations": recommendations,
+            "cached": cached,
+            "age_seconds": age_seconds,
+        })
     except ValueError as e:
         return jsonify({"success": False, "error": str(e)}), 404
     except Exception as e:
         return jsonify({"success": False, "error": f"Failed to fetch air quality: {str(e)}"}), 500
 
 
+@air_quality_bp.route("/api/air-quality/batch", methods=["POST"])
+def get_air_quality_batch():
+    """Fetch current air quality for several locations at once.
+
+    Body: ``{"locations": ["London", "Paris", ...]}``. Locations are fetched
+    concurrently; each result carries its own ``success`` flag and ``error``.
+    A reading that was fetched but could not be saved is still returned, with
+    a ``save_error``.
+    Cached readings cost nothing, but every location fetched upstream takes a
+    token from the shared OpenWeatherMap rate limit, two for one that was never
+    geocoded. Past ``OWM_RATE_LIMIT_BURST`` tokens the batch is throttled to
+    ``OWM_RATE_LIMIT_PER_MINUTE``, so a batch of new cities can take seconds.
+    """
+    body = request.get_json(silent=True) or {}
+    locations = body.get("locations")
+    if not isinstance(locations, list) or not locations:
+        return jsonify({"success": False, "error": "'locations' must be a non-empty list."}), 400
+    locations = [str(l).strip() for l in locations if str(l).strip()]
+    if not locations:
+        return jsonify({"success": False, "error": "'locations' must be a non-empty list."}), 400
+    if len(locations) > Config.BATCH_MAX_LOCATIONS:
+        return jsonify({
+            "success": False,
+            "error": f"At most {Config.BATCH_MAX_LOCATIONS} locations per request.",
+        }), 400
+
+    try:
+        results = get_readings(locations)
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Failed to fetch air quality: {str(e)}"}), 500
+    for result in results:
+        if result["success"]:
+            result["recommendations"] = get_recommendations(result["data"]["aqi"])
+    return jsonify({"success": True, "results": results})
+
+
+@air_quality_bp.route("/api/air-quality/batch", methods=["GET"])
+def get_air_quality_batch_method():
+    """Keep ``GET /api/air-quality/batch`` from being read as a location named "batch"."""
+    response = jsonify({"success": False, "error": "Use POST with a JSON body for batch lookups."})
+    response.headers["Allow"] = "POST"
+    return response, 405
+
+
+@air_quality_bp.route("/api/air-quality/export", methods=["GET"])
+def export_air_quality():
+    """Stream stored readings as NDJSON, CSV, Arrow IPC or Parquet.
+
+    Query parameters: ``format`` (default ``ndjson``), ``locations``
+    (comma-separated; default all), ``start`` and ``end`` (ISO dates or
+    timestamps, UTC; ``end`` is exclusive).
+    """
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in export_service.FORMATS:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid format '{fmt}'. Use one of: {', '.join(export_service.FORMATS)}.",
+        }), 400
+    if not export_service.format_available(fmt):
+        return jsonify({"success": False, "error": f"The '{fmt}' format requires pyarrow."}), 400
+
+    bounds = {}
+    for name in ("start", "end"):
+        value = request.args.get(name)
+        if not value:
+            continue
+        try:
+            bounds[name] = datetime.fromisoformat(value).isoformat()
+        except ValueError:
+            return jsonify({"success": False, "error": f"Invalid {name} '{value}'. Use an ISO date."}), 400
+
+    location_ids = None
+    if request.args.get("locations"):
+        names = [l.strip() for l in request.args["locations"].split(",") if l.strip()]
+        location_ids = [i for i in (Location.get_id(name) for name in names) if i is not None]
+
+    mimetype, extension, _ = export_service.FORMATS[fmt]
+    return Response(
+        export_service.export(fmt, location_ids, bounds.get("start"), bounds.get("end")),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=air_quality_export.{extension}"},
+    )
+
+
 @air_quality_bp.route("/api/air-quality/<path:location>/history", methods=["GET"])
 def get_air_quality_history(location):
-    """Return historical air quality data for a location."""
+    """Return historical air quality data for a location.
+
+    Query parameters: ``range`` (default ``24h``), ``resolution`` (``auto``,
+    ``raw``, ``hour`` or ``day``; default ``auto``) and ``layout`` (``rows``,
+    a list of points, or ``columns``, one array per field; default ``rows``).
+    """
+    range_param = request.args.get("range", "24h")
+    resolution = request.args.get("resolution", "auto")
+    layout = request.args.get("layout", "rows")
+    if layout not in HISTORY_LAYOUTS:
+        return jsonify({"success": False, "error": f"Invalid layout '{layout}'."}), 400
+    try:
+        hours = _parse_range(range_param)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if resolution == "auto":
+        resolution = choose_resolution(hours)
+    elif resolution not in HISTORY_RESOLUTIONS:
+        return jsonify({"success": False, "error": f"Invalid resolution '{resolution}'."}), 400
+
     try:
-        history = fetch_air_quality_history(location)
-        return jsonify({"success": True, "data": history, "location": location})
+        history = fetch_air_quality_history(location, hours=hours, resolution=resolution, layout=layout)
+        return jsonify({
+            "success": True,
+            "data": history,
+            "location": location,
+            "range": range_param,
+            "resolution": resolution,
+            "layout": layout,
+        })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -1,4 +1,8 @@
+import time
+
 from flask import Blueprint, request, jsonify
+from config import Config
+from services import alert_jobs, mail_queue, subscriber_registry
 from services.alert_service import check_and_send_alerts, send_email_alert
 
 alerts_bp = Blueprint("alerts", __name__)
@@ -48,22 +52,58 @@ def test_alert():
 
 @alerts_bp.route("/api/alerts/check", methods=["POST"])
 def manual_check():
-    """Manually trigger alert check for a location."""
+    """Manually trigger alert check for a location.
+
+    The synchronous check waits up to ``ALERT_CHECK_SEND_TIMEOUT`` seconds for
+    its emails and reports how many were queued, sent, failed and still
+    pending. With ``"async": true`` in the body (or ``?async=1``) the check
+    runs in the background and the response is ``202`` with a job ID to poll
+    at ``/api/alerts/jobs/<id>``.
+    """
     data = request.get_json() or {}
     location = data.get("location")
     if not location:
         return jsonify({"success": False, "error": "location is required"}), 400
+    run_async = data.get("async") is True or request.args.get("async") in ("1", "true")
+    if run_async:
+        job, created = alert_jobs.submit(location)
+        return jsonify({
+            "success": True,
+            "job_id": job.id,
+            "status": job.status,
+            "deduplicated": not created,
+            "status_url": f"/api/alerts/jobs/{job.id}",
+        }), 202
     try:
         from services.api_service import fetch_air_quality
         air_data = fetch_air_quality(location)
-        alerts_sent = check_and_send_alerts(location, air_data)
+        subscriber_registry.refresh_if_stale()
+        batch = mail_queue.Batch()
+        recipients = check_and_send_alerts(location, air_data, batch)
+        deliveries = batch.flush()
+        deadline = time.monotonic() + Config.ALERT_CHECK_SEND_TIMEOUT
+        for delivery in deliveries:
+            delivery.wait(max(0, deadline - time.monotonic()))
+        statuses = [delivery.status for delivery in deliveries]
         return jsonify({
             "success": True,
             "data": air_data,
-            "alerts_sent": len(alerts_sent),
-            "recipients": alerts_sent,
+            "alerts_queued": len(deliveries),
+            "alerts_sent": statuses.count("sent"),
+            "alerts_failed": statuses.count("failed"),
+            "alerts_pending": statuses.count("queued"),
+            "recipients": recipients,
         })
     except ValueError as e:
         return jsonify({"success": False, "error": str(e)}), 404
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
+
+
+@alerts_bp.route("/api/alerts/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Report the progress of an asynchronous alert check."""
+    job = alert_jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found."}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
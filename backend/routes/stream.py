@@ -0,0 +1,71 @@
+import json
+
+from flask import Blueprint, Response, jsonify, request
+from config import Config
+from services import event_hub, reading_cache
+from services.recommendation_service import get_recommendations
+
+stream_bp = Blueprint("stream", __name__)
+
+
+def _format_event(event_id, location, data, fetched_at):
+    payload = {
+        "location": location,
+        "data": data,
+        "recommendations": get_recommendations(data["aqi"]),
+        "fetched_at": fetched_at,
+    }
+    return f"id: {event_id}\nevent: reading\ndata: {json.dumps(payload)}\n\n"
+
+
+def _stream(locations, cursor):
+    keys = event_hub.watch(locations)
+    try:
+        yield f"retry: {Config.SSE_RETRY_MS}\n\n"
+        if cursor is None or not event_hub.can_resume(cursor):
+            # New client, or one that missed more than the buffer holds: send a snapshot.
+            cursor = event_hub.last_event_id()
+            for location in locations:
+                known = reading_cache.peek(location)
+                if known is not None:
+                    yield _format_event(cursor, location, known[0], known[1])
+        while True:
+            events, cursor = event_hub.wait(cursor, keys, Config.SSE_HEARTBEAT_SECONDS)
+            if not events:
+                yield ": heartbeat\n\n"
+                continue
+            for event in events:
+                yield _format_event(event.id, event.location, event.data, event.published_at)
+    finally:
+        event_hub.unwatch(keys)
+
+
+@stream_bp.route("/api/stream", methods=["GET"])
+def stream():
+    """Server-Sent Events stream of new readings.
+
+    Query parameter ``locations`` is a comma-separated list. Each new reading
+    is sent as a ``reading`` event; a comment line is sent every
+    ``SSE_HEARTBEAT_SECONDS`` to keep idle connections open. Reconnecting
+    clients resume from the ``Last-Event-ID`` header.
+    """
+    locations = [l.strip() for l in request.args.get("locations", "").split(",") if l.strip()]
+    if not locations:
+        return jsonify({"success": False, "error": "Query parameter 'locations' is required."}), 400
+    if len(locations) > Config.BATCH_MAX_LOCATIONS:
+        return jsonify({
+            "success": False,
+            "error": f"At most {Config.BATCH_MAX_LOCATIONS} locations per stream.",
+        }), 400
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("lastEventId")
+    try:
+        cursor = int(last_event_id) if last_event_id else None
+    except ValueError:
+        cursor = None
+
+    return Response(
+        _stream(locations, cursor),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,144 @@
+"""Background jobs for manual alert checks.
+
+``POST /api/alerts/check`` in async mode hands the work to ``submit()`` and
+returns at once. The job fetches the location, evaluates its subscribers into
+its own ``mail_queue.Batch`` and waits on the deliveries of that batch, so
+``GET /api/alerts/jobs/<id>`` can report how many recipients were processed,
+sent and failed. A location that already has a queued or running job reuses
+that job instead of starting a second one.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from services import mail_queue, reading_cache, subscriber_registry
+from services.alert_service import check_and_send_alerts
+from services.api_service import fetch_air_quality
+from services.geocode_cache import normalize_query
+
+_jobs = OrderedDict()  # job id -> AlertJob, oldest first
+_active = {}  # normalized location -> AlertJob still queued or running
+_lock = threading.Lock()
+_executor = None
+
+
+class AlertJob:
+    """State of one asynchronous alert check."""
+
+    def __init__(self, location):
+        self.id = uuid.uuid4().hex
+        self.location = location
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.recipients = []
+        self.sent = 0
+        self.failed = 0
+        self.error = None
+        self.data = None
+
+    def to_dict(self):
+        with _lock:
+            return {
+                "id": self.id,
+                "location": self.location,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "recipients": len(self.recipients),
+                "processed": self.sent + self.failed,
+                "sent": self.sent,
+                "failed": self.failed,
+                "error": self.error,
+                "data": self.data,
+            }
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.ALERT_JOB_MAX_WORKERS), thread_name_prefix="alert-job"
+            )
+    return _executor
+
+
+def _prune(now):
+    """Forget finished jobs past their retention. Caller holds _lock."""
+    for job_id in list(_jobs):
+        job = _jobs[job_id]
+        expired = job.finished_at is not None and now - job.finished_at > Config.ALERT_JOB_RETENTION
+        if not expired and len(_jobs) <= Config.ALERT_JOB_MAX_KEPT:
+            break
+        if job.finished_at is None:
+            continue
+        del _jobs[job_id]
+
+
+def submit(location):
+    """Queue an alert check for ``location``.
+
+    Returns ``(job, created)``; ``created`` is False when an in-flight job for
+    the same location was reused.
+    """
+    key = normalize_query(location)
+    with _lock:
+        _prune(time.time())
+        job = _active.get(key)
+        if job is not None:
+            return job, False
+        job = AlertJob(location)
+        _jobs[job.id] = job
+        _active[key] = job
+    _get_executor().submit(_run, job, key)
+    return job, True
+
+
+def get(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def _run(job, key):
+    with _lock:
+        job.status = "running"
+        job.started_at = time.time()
+    try:
+        data = fetch_air_quality(job.location)
+        reading_cache.put(job.location, data)
+        subscriber_registry.refresh_if_stale()
+        batch = mail_queue.Batch()
+        check_and_send_alerts(job.location, data, batch)
+        # The batch is the job's own, so these are exactly the messages it raised.
+        deliveries = batch.flush()
+        with _lock:
+            job.data = data
+            job.recipients = [delivery.recipient for delivery in deliveries]
+        for delivery in deliveries:
+            delivery.wait()
+            with _lock:
+                if delivery.status == "sent":
+                    job.sent += 1
+                else:
+                    job.failed += 1
+        status, error = "done", None
+    except Exception as e:
+        print(f"Alert job {job.id} for {job.location} failed: {e}")
+        status, error = "failed", str(e)
+    with _lock:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if _active.get(key) is job:
+            del _active[key]
+
+
+def get_stats():
+    with _lock:
+        return {"jobs": len(_jobs), "active": len(_active)}
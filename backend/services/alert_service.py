@@ -1,73 +1,181 @@
+import threading
+import time
+from functools import partial
+
+import numpy as np
 from flask_mail import Message
-from services.recommendation_service import get_aqi_level
+
+from config import Config
+from models.alert_state import AlertState
+from services import mail_queue, threshold_engine
+from services.recommendation_service import get_aqi_band, get_aqi_level
 
 # mail instance is set by app.py after initialization
 mail = None
 
+# (preference_id, metric) of alerts handed to the mail queue and not yet sent or given up.
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
 
 def init_alert_service(mail_instance):
     global mail
     mail = mail_instance
 
 
-def check_and_send_alerts(location, data, preferences_list=None):
-    """Check AQI thresholds and send alerts for matching user preferences."""
-    from models.user_preferences import UserPreferences
-    from database.db_setup import get_db_connection
+# A firing pollutant alert escalates each time its value climbs another
+# ESCALATION_STEP (as a fraction of the subscriber's threshold) above it.
+ESCALATION_STEP = 0.5
+
+POLLUTANT_LABELS = (
+    ("pm25", "PM2.5"),
+    ("pm10", "PM10"),
+    ("no2", "NO₂"),
+    ("o3", "O₃"),
+)
+
+
+def _severity(metric, value, threshold, aqi_band):
+    """Return the escalation band of ``value`` on the metric's own scale.
+
+    The AQI uses its EPA band. A pollutant uses how far the value sits above
+    the subscriber's own threshold, in steps of ``ESCALATION_STEP``.
+    """
+    if metric == "aqi":
+        return aqi_band
+    if value < threshold:
+        return 0
+    return 1 + int((value / threshold - 1) / ESCALATION_STEP)
+
+
+def _next_state(state, preference_id, metric, value, threshold, band, now):
+    """Advance one (preference, metric) alert state.
+
+    Returns ``(new_state, notify)``. An alert fires when the value crosses the
+    threshold, re-fires only after the cooldown or when its band (see
+    ``_severity``) gets worse, and clears once the value drops below the
+    threshold minus the hysteresis margin. ``new_state`` is the unchanged
+    ``state`` when nothing needs to be persisted. A notifying state keeps the
+    band and send time of the last delivered alert; ``AlertState.mark_sent``
+    moves them on once the mail was actually sent.
+    """
+    exceeded = value >= threshold
+    firing = state is not None and state.firing
+
+    if not firing:
+        if not exceeded:
+            return state, False
+        return AlertState(preference_id, metric, True, None, value, None, now), True
+
+    if value < threshold * (1 - Config.ALERT_HYSTERESIS):
+        return AlertState(preference_id, metric, False, band, value, state.last_sent_at, now), False
+
+    cooled_down = now - (state.last_sent_at or 0) >= Config.ALERT_COOLDOWN_MINUTES * 60
+    escalated = state.band is not None and band > state.band
+    if exceeded and (cooled_down or escalated):
+        return AlertState(preference_id, metric, True, state.band, value, state.last_sent_at, now), True
+    return state, False
+
+
+def _delivered(alerts, delivery):
+    """Mail-queue callback: stamp the alerts a delivery carried once it was sent."""
+    with _in_flight_lock:
+        _in_flight.difference_update((preference_id, metric) for preference_id, metric, _ in alerts)
+    if delivery.status == "sent":
+        AlertState.mark_sent(alerts, time.time())
+
+
+def check_and_send_alerts(location, data, batch):
+    """Check thresholds for matching user preferences and queue alert emails.
+
+    The reading is compared against every subscriber of the location at once
+    (see ``threshold_engine``); only subscribers with a crossed threshold or
+    an alert already firing go through the per-metric state machine. All
+    alerts for one recipient are merged into a single message in the caller's
+    ``mail_queue.Batch``; the caller delivers it with ``batch.flush()``. An
+    alert counts as sent, for the cooldown, only once its mail was delivered;
+    until then it is not queued again. Returns the list of recipients an
+    alert was queued for.
+    """
+    from models.location import Location
 
     aqi = data.get("aqi", 0)
 
-    conn = get_db_connection()
-    rows = conn.execute(
-        "SELECT * FROM user_preferences WHERE location LIKE ?",
-        (f"%{location}%",),
-    ).fetchall()
-    conn.close()
-
-    alerts_sent = []
-    for row in rows:
-        threshold = row["alert_threshold"] or 150
-        email_enabled = bool(row["email_enabled"])
-        email = row["email"]
-
-        if aqi >= threshold and email_enabled and email:
-            try:
-                send_email_alert(email, location, aqi, data)
-                alerts_sent.append(email)
-            except Exception as e:
-                print(f"Failed to send alert to {email}: {e}")
-
-        # Check individual pollutant thresholds
-        pollutant_alerts = []
-        if row["pm25_threshold"] and data.get("pm25", 0) >= row["pm25_threshold"]:
-            pollutant_alerts.append(f"PM2.5: {data['pm25']} µg/m³ (threshold: {row['pm25_threshold']})")
-        if row["pm10_threshold"] and data.get("pm10", 0) >= row["pm10_threshold"]:
-            pollutant_alerts.append(f"PM10: {data['pm10']} µg/m³ (threshold: {row['pm10_threshold']})")
-        if row["no2_threshold"] and data.get("no2", 0) >= row["no2_threshold"]:
-            pollutant_alerts.append(f"NO₂: {data['no2']} µg/m³ (threshold: {row['no2_threshold']})")
-        if row["o3_threshold"] and data.get("o3", 0) >= row["o3_threshold"]:
-            pollutant_alerts.append(f"O₃: {data['o3']} µg/m³ (threshold: {row['o3_threshold']})")
-
-        # Send pollutant-specific alert independently of the AQI alert.
-        # Both alert types are evaluated and sent when applicable so users
-        # receive complete information about every exceeded threshold.
-        if pollutant_alerts and email_enabled and email:
-            try:
-                _send_pollutant_alert(email, location, pollutant_alerts)
-                alerts_sent.append(email)
-            except Exception as e:
-                print(f"Failed to send pollutant alert to {email}: {e}")
-
-    return alerts_sent
-
-
-def send_email_alert(email, location, aqi, data):
-    """Send an AQI threshold exceeded email alert."""
-    if mail is None:
-        raise RuntimeError("Mail service not initialized.")
+    location_id = Location.get_id(location)
+    if location_id is None:
+        return []
+    subscribers = threshold_engine.get_thresholds(location_id)
+    if not len(subscribers):
+        return []
+
+    candidates = np.zeros(len(subscribers), dtype=bool)
+    for mask in subscribers.exceeded(data).values():
+        candidates |= mask
+    firing = AlertState.get_firing_for_location(location_id)
+    if firing:
+        firing_ids = np.fromiter({preference_id for preference_id, _ in firing}, dtype=np.int64)
+        candidates |= np.isin(subscribers.ids, firing_ids)
+
+    aqi_band = get_aqi_band(aqi)
+    now = time.time()
+
+    # email -> {"aqi": bool, "pollutants": [lines], "alerts": [(preference_id, metric, band)]};
+    # a recipient with several matching preferences still gets one section per location.
+    recipients = {}
+    changed = []
+    # Pairs this check took into _in_flight and has not handed to the batch yet.
+    reserved = set()
+    try:
+        for i in np.flatnonzero(candidates):
+            preference_id = int(subscribers.ids[i])
+            notify = {}
+            for metric, thresholds in subscribers.thresholds.items():
+                threshold = thresholds[i]
+                if np.isnan(threshold):
+                    continue
+                threshold = float(threshold)
+                value = data.get(metric) or 0
+                state = firing.get((preference_id, metric))
+                band = _severity(metric, value, threshold, aqi_band)
+                new_state, send = _next_state(state, preference_id, metric, value, threshold, band, now)
+                if new_state is not state:
+                    changed.append(new_state)
+                if send:
+                    notify[metric] = (threshold, band)
+            with _in_flight_lock:
+                for metric in [m for m in notify if (preference_id, m) in _in_flight]:
+                    del notify[metric]
+                _in_flight.update((preference_id, metric) for metric in notify)
+            reserved.update((preference_id, metric) for metric in notify)
+            if not notify:
+                continue
+
+            pollutant_alerts = [
+                f"{label}: {data[metric]} µg/m³ (threshold: {notify[metric][0]})"
+                for metric, label in POLLUTANT_LABELS
+                if metric in notify
+            ]
+            entry = recipients.setdefault(subscribers.emails[i], {"aqi": False, "pollutants": [], "alerts": []})
+            entry["aqi"] = entry["aqi"] or "aqi" in notify
+            entry["pollutants"] += [a for a in pollutant_alerts if a not in entry["pollutants"]]
+            entry["alerts"] += [(preference_id, metric, band) for metric, (_, band) in notify.items()]
+
+        AlertState.save_many(changed)
+        for email, entry in recipients.items():
+            subject, body = _alert_message(location, aqi, data, entry["aqi"], entry["pollutants"])
+            batch.add(email, location, subject, body, on_done=partial(_delivered, entry["alerts"]))
+            reserved.difference_update((preference_id, metric) for preference_id, metric, _ in entry["alerts"])
+    except Exception:
+        # Nothing will deliver these alerts, so nothing would release them either.
+        with _in_flight_lock:
+            _in_flight.difference_update(reserved)
+        raise
+    return list(recipients)
+
+
+def _aqi_alert_body(location, aqi, data):
     level = get_aqi_level(aqi)
-    subject = f"⚠️ Air Quality Alert for {location} – AQI {aqi} ({level['label']})"
-    body = f"""Air Quality Alert
+    return f"""Air Quality Alert
 
 Location: {location}
 AQI: {aqi} – {level['label']}
@@ -81,20 +189,31 @@ Pollutant Breakdown:
   SO₂   : {data.get('so2', 'N/A')} µg/m³
 
 Please take necessary precautions.
-
--- Air Quality Monitor
 """
-    msg = Message(subject=subject, recipients=[email], body=body)
-    mail.send(msg)
 
 
-def _send_pollutant_alert(email, location, pollutant_alerts):
-    """Send a pollutant-specific threshold exceeded email alert."""
+def _alert_message(location, aqi, data, aqi_exceeded, pollutant_alerts):
+    """Return (subject, body) for one location's alert, without the signature."""
+    parts = []
+    if aqi_exceeded:
+        level = get_aqi_level(aqi)
+        subject = f"⚠️ Air Quality Alert for {location} – AQI {aqi} ({level['label']})"
+        parts.append(_aqi_alert_body(location, aqi, data))
+    else:
+        subject = f"⚠️ Pollutant Alert for {location}"
+    if pollutant_alerts:
+        text = f"The following pollutants have exceeded your thresholds in {location}:\n\n"
+        text += "\n".join(f"  • {a}" for a in pollutant_alerts) + "\n"
+        parts.append(text)
+    return subject, "\n".join(parts)
+
+
+def send_email_alert(email, location, aqi, data):
+    """Send an AQI threshold exceeded email alert immediately."""
     if mail is None:
         raise RuntimeError("Mail service not initialized.")
-    subject = f"⚠️ Pollutant Alert for {location}"
-    body = "The following pollutants have exceeded your thresholds:\n\n"
-    body += "\n".join(f"  • {a}" for a in pollutant_alerts)
-    body += "\n\n-- Air Quality Monitor\n"
+    level = get_aqi_level(aqi)
+    subject = f"⚠️ Air Quality Alert for {location} – AQI {aqi} ({level['label']})"
+    body = _aqi_alert_body(location, aqi, data) + mail_queue.SIGNATURE
     msg = Message(subject=subject, recipients=[email], body=body)
     mail.send(msg)
@@ -1,18 +1,38 @@
-import requests
 from config import Config
 from models.air_quality_data import AirQualityData
+from models.air_quality_rollup import SERIES_FIELDS, AirQualityRollup
+from services import geocode_cache, http_client
+from services.aqi_calculator import aqi_for_reading
+from services.recommendation_service import label_series, label_values
 
 
-GEOCODING_URL = "http://api.openweathermap.org/geo/1.0/direct"
-AIR_POLLUTION_URL = "http://api.openweathermap.org/data/2.5/air_pollution"
+GEOCODING_URL = f"{Config.OPENWEATHER_BASE_URL}/geo/1.0/direct"
+AIR_POLLUTION_URL = f"{Config.OPENWEATHER_BASE_URL}/data/2.5/air_pollution"
 
+# OWM's 1-5 index: the upper bounds (µg/m³) of its first four bands per pollutant.
+OWM_INDEX_BOUNDS = {
+    "so2": (20, 80, 250, 350),
+    "no2": (40, 70, 150, 200),
+    "pm10": (20, 50, 100, 200),
+    "pm25": (10, 25, 50, 75),
+    "o3": (60, 100, 140, 180),
+    "co": (4400, 9400, 12400, 15400),
+}
 
-def _get_coordinates(location):
+
+def get_coordinates(location):
     """Resolve city name to (lat, lon) using OpenWeatherMap Geocoding API."""
     api_key = Config.OPENWEATHER_API_KEY
     if not api_key:
         raise ValueError("OPENWEATHER_API_KEY is not configured.")
-    response = requests.get(
+
+    cached = geocode_cache.lookup(location)
+    if cached is not None:
+        if not cached.found:
+            raise ValueError(f"Location '{location}' not found.")
+        return cached.lat, cached.lon, cached.name
+
+    response = http_client.get(
         GEOCODING_URL,
         params={"q": location, "limit": 1, "appid": api_key},
         timeout=10,
@@ -20,8 +40,11 @@ def _get_coordinates(location):
     response.raise_for_status()
     results = response.json()
     if not results:
+        geocode_cache.store_not_found(location)
         raise ValueError(f"Location '{location}' not found.")
-    return results[0]["lat"], results[0]["lon"], results[0].get("name", location)
+    lat, lon, name = results[0]["lat"], results[0]["lon"], results[0].get("name", location)
+    geocode_cache.store(location, lat, lon, name)
+    return lat, lon, name
 
 
 def _parse_air_quality(data, location_name):
@@ -30,12 +53,7 @@ def _parse_air_quality(data, location_name):
     components = item.get("components", {})
     aqi_index = item["main"]["aqi"]  # 1-5 scale from OWM
 
-    # Map OWM AQI (1-5) to US AQI approximation
-    aqi_map = {1: 25, 2: 75, 3: 125, 4: 175, 5: 250}
-    aqi = aqi_map.get(aqi_index, aqi_index * 50)
-
-    return {
-        "aqi": aqi,
+    parsed = {
         "aqi_index": aqi_index,
         "pm25": round(components.get("pm2_5", 0.0), 2),
         "pm10": round(components.get("pm10", 0.0), 2),
@@ -45,26 +63,105 @@ def _parse_air_quality(data, location_name):
         "so2": round(components.get("so2", 0.0), 2),
         "location": location_name,
     }
+    # US EPA AQI from the concentrations (OWM's own index only has five steps).
+    parsed["aqi"], parsed["dominant_pollutant"] = aqi_for_reading(parsed)
+    return parsed
+
+
+def owm_index(reading):
+    """Return OWM's 1-5 index for a reading, from its concentrations."""
+    band = 0
+    for pollutant, bounds in OWM_INDEX_BOUNDS.items():
+        value = reading.get(pollutant)
+        if value is not None:
+            band = max(band, sum(value >= bound for bound in bounds))
+    return band + 1
+
+
+def enrich_stored(reading):
+    """Add the fields a live reading has but a stored row lacks, in place.
+
+    Only the concentrations and the EPA AQI are stored, so ``aqi_index`` and
+    ``dominant_pollutant`` are derived from them again.
+    """
+    reading["aqi_index"] = owm_index(reading)
+    reading["dominant_pollutant"] = aqi_for_reading(reading)[1]
+    return reading
+
+
+def fetch_air_quality(location, store=True):
+    """Fetch current air quality for a location name.
 
+    With ``store=False`` the reading is returned without being saved, so the
+    caller can persist several readings together.
+    """
+    lat, lon, location_name = get_coordinates(location)
+    return fetch_air_quality_at(lat, lon, location_name, store=store)
 
-def fetch_air_quality(location):
-    """Fetch current air quality for a location name."""
-    lat, lon, location_name = _get_coordinates(location)
+
+def grid_key(lat, lon):
+    """Snap coordinates to the ``LOCATION_GRID_DEGREES`` grid.
+
+    Returns ``(key, lat, lon)``: a hashable cell key and the cell's centre.
+    """
+    step = Config.LOCATION_GRID_DEGREES
+    if step <= 0:
+        return (lat, lon), lat, lon
+    row, col = round(lat / step), round(lon / step)
+    return (row, col), round(row * step, 6), round(col * step, 6)
+
+
+def fetch_air_quality_at(lat, lon, location_name, store=True):
+    """Fetch current air quality at already resolved coordinates."""
     api_key = Config.OPENWEATHER_API_KEY
-    response = requests.get(
+    response = http_client.get(
         AIR_POLLUTION_URL,
         params={"lat": lat, "lon": lon, "appid": api_key},
         timeout=10,
     )
     response.raise_for_status()
     parsed = _parse_air_quality(response.json(), location_name)
-    store_air_quality_data(location_name, parsed)
+    if store:
+        store_air_quality_data(location_name, parsed)
     return parsed
 
 
-def fetch_air_quality_history(location):
-    """Return last 24 hours of stored air quality data for a location."""
-    return AirQualityData.get_history(location, hours=24)
+HISTORY_RESOLUTIONS = ("raw", "hour", "day")
+
+
+def choose_resolution(hours):
+    """Pick the cheapest tier that still gives a useful number of points."""
+    if hours <= 48:
+        return "raw"
+    if hours <= 31 * 24:
+        return "hour"
+    return "day"
+
+
+HISTORY_LAYOUTS = ("rows", "columns")
+
+
+def fetch_air_quality_history(location, hours=24, resolution="raw", layout="rows"):
+    """Return stored air quality data for the last ``hours`` hours at ``resolution``.
+
+    Every point is labelled with the ``level`` and ``color`` of its AQI band.
+    With ``layout="columns"`` the result is ``{field: [values...]}`` instead
+    of a list of point dicts, which is much cheaper to build and encode for
+    long series.
+    """
+    if layout == "columns":
+        if resolution == "raw":
+            columns = AirQualityData.get_history_columns(location, hours=hours)
+        else:
+            points = AirQualityRollup.get_series(location, resolution, hours)
+            columns = {field: [p[field] for p in points] for field in SERIES_FIELDS}
+        columns["level"], columns["color"] = label_values(columns["aqi"])
+        return columns
+    if resolution == "raw":
+        points = AirQualityData.get_history(location, hours=hours)
+    else:
+        points = AirQualityRollup.get_series(location, resolution, hours)
+    return label_series(points)
 
 
 def store_air_quality_data(location, data):
@@ -0,0 +1,112 @@
+"""US EPA AQI from pollutant concentrations.
+
+Each pollutant's breakpoint table is held as NumPy arrays and looked up with
+``searchsorted``, so the same code computes the index of one reading or of a
+whole column of stored readings in one pass. OpenWeatherMap reports every
+pollutant in µg/m³; gases are converted to the ppb/ppm units of the EPA tables
+(25 °C, 1 atm) and truncated as the EPA technical guidance prescribes before
+interpolation. The PM2.5 and PM10 tables are the 2024 revision.
+
+The EPA tables are defined for 8-hour (O₃, CO) and 24-hour (PM) averages;
+instantaneous concentrations are used here, as they are all OWM provides.
+"""
+import numpy as np
+
+MOLAR_VOLUME = 24.45  # litres per mole at 25 °C and 1 atm
+MOLECULAR_WEIGHTS = {"o3": 48.00, "no2": 46.01, "so2": 64.07, "co": 28.01}
+
+# pollutant -> rows of (C_low, C_high, I_low, I_high), in the table's native unit
+BREAKPOINTS = {
+    "pm25": (  # µg/m³, truncated to 0.1
+        (0.0, 9.0, 0, 50), (9.1, 35.4, 51, 100), (35.5, 55.4, 101, 150),
+        (55.5, 125.4, 151, 200), (125.5, 225.4, 201, 300), (225.5, 325.4, 301, 500),
+    ),
+    "pm10": (  # µg/m³, truncated to integer
+        (0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150),
+        (255, 354, 151, 200), (355, 424, 201, 300), (425, 604, 301, 500),
+    ),
+    # ppb, truncated to integer. The 8-hour table ends at 200 ppb (AQI 300); the EPA
+    # computes AQI 301+ from 1-hour ozone, whose top row is 405-604 ppb -> 301-500.
+    # We hand off at 200 ppb and stretch that top row down to 201 ppb, so 201-604 ppb
+    # maps onto 301-500 and the index keeps rising with the concentration.
+    "o3": (
+        (0, 54, 0, 50), (55, 70, 51, 100), (71, 85, 101, 150),
+        (86, 105, 151, 200), (106, 200, 201, 300), (201, 604, 301, 500),
+    ),
+    "no2": (  # ppb, truncated to integer
+        (0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150),
+        (361, 649, 151, 200), (650, 1249, 201, 300), (1250, 2049, 301, 500),
+    ),
+    "so2": (  # ppb, truncated to integer
+        (0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150),
+        (186, 304, 151, 200), (305, 604, 201, 300), (605, 1004, 301, 500),
+    ),
+    "co": (  # ppm, truncated to 0.1
+        (0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150),
+        (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300), (30.5, 50.4, 301, 500),
+    ),
+}
+TRUNCATION = {"pm25": 1, "pm10": 0, "o3": 0, "no2": 0, "so2": 0, "co": 1}
+POLLUTANTS = tuple(BREAKPOINTS)
+MAX_AQI = 500
+
+
+def _columns(rows):
+    table = np.array(rows, dtype=np.float64)
+    return table[:, 0], table[:, 1], table[:, 2], table[:, 3]
+
+
+_TABLES = {pollutant: _columns(rows) for pollutant, rows in BREAKPOINTS.items()}
+
+
+def to_table_units(pollutant, values):
+    """Convert µg/m³ to the unit of the pollutant's breakpoint table and truncate."""
+    values = np.asarray(values, dtype=np.float64)
+    if pollutant in MOLECULAR_WEIGHTS:
+        values = values * MOLAR_VOLUME / MOLECULAR_WEIGHTS[pollutant]
+        if pollutant == "co":
+            values = values / 1000.0  # ppb -> ppm
+    scale = 10.0 ** TRUNCATION[pollutant]
+    # The small epsilon keeps values such as 0.3 * 10 from truncating to 2.
+    return np.floor(values * scale + 1e-9) / scale
+
+
+def sub_index(pollutant, concentrations):
+    """Return the AQI sub-index for µg/m³ ``concentrations`` (scalar or array).
+
+    Missing (NaN) or negative concentrations give NaN; values above the top
+    breakpoint are capped at 500.
+    """
+    c = to_table_units(pollutant, concentrations)
+    c_low, c_high, i_low, i_high = _TABLES[pollutant]
+    idx = np.minimum(np.searchsorted(c_high, c, side="left"), len(c_high) - 1)
+    index = (i_high[idx] - i_low[idx]) / (c_high[idx] - c_low[idx]) * (c - c_low[idx]) + i_low[idx]
+    index = np.where(c > c_high[-1], MAX_AQI, index)
+    index = np.where(c < 0, np.nan, index)
+    return np.round(np.clip(index, 0, MAX_AQI))
+
+
+def compute_aqi(concentrations):
+    """Return ``(aqi, dominant)`` for a mapping of pollutant -> µg/m³ values.
+
+    Values may be scalars or equally long arrays; pollutants that are absent
+    are ignored. ``aqi`` is the maximum sub-index (0 if nothing is known) and
+    ``dominant`` the pollutant that produced it, as arrays of the input shape.
+    """
+    pollutants = [p for p in POLLUTANTS if concentrations.get(p) is not None]
+    if not pollutants:
+        return np.int64(0), None
+    indices = np.stack([sub_index(p, concentrations[p]) for p in pollutants])
+    filled = np.nan_to_num(indices, nan=-1.0)
+    best = np.argmax(filled, axis=0)
+    aqi = np.maximum(np.take_along_axis(filled, np.expand_dims(best, 0), 0)[0], 0).astype(np.int64)
+    dominant = np.asarray(pollutants, dtype=object)[best]
+    return aqi, dominant
+
+
+def aqi_for_reading(reading):
+    """Return ``(aqi, dominant_pollutant)`` for one reading dict in µg/m³."""
+    aqi, dominant = compute_aqi({p: reading.get(p) for p in POLLUTANTS})
+    if dominant is None or int(aqi) == 0:
+        return int(aqi), None
+    return int(aqi), str(dominant)
@@ -0,0 +1,119 @@
+"""In-process fan-out of new readings to Server-Sent Events streams.
+
+Every reading fetched from upstream is published once into a bounded ring
+buffer with a monotonically increasing event ID. Stream handlers block on a
+single shared condition until an event newer than their cursor arrives, so an
+idle connection costs a sleeping thread and no work. A reconnecting client
+sends ``Last-Event-ID`` and receives the events it missed, as long as they
+are still in the buffer.
+
+Locations with an open stream are reported by ``watched_locations()`` so the
+scheduler keeps them fresh; upstream load therefore depends on the number of
+distinct locations, not on the number of open browser tabs.
+"""
+import threading
+import time
+from collections import deque
+from itertools import takewhile
+
+from config import Config
+from services.geocode_cache import normalize_query
+
+
+class Event:
+    __slots__ = ("id", "key", "location", "data", "published_at")
+
+    def __init__(self, id, key, location, data, published_at):
+        self.id = id
+        self.key = key
+        self.location = location
+        self.data = data
+        self.published_at = published_at
+
+
+_events = deque(maxlen=Config.EVENT_HUB_BUFFER_SIZE)
+_last_id = 0
+_cond = threading.Condition()
+_watchers = {}  # key -> [location name, open stream count]
+_stats = {"published": 0, "delivered": 0}
+
+
+def publish(location, data):
+    """Append a new reading for ``location`` and wake every waiting stream."""
+    global _last_id
+    with _cond:
+        _last_id += 1
+        _events.append(Event(_last_id, normalize_query(location), location, data, time.time()))
+        _stats["published"] += 1
+        _cond.notify_all()
+
+
+def last_event_id():
+    with _cond:
+        return _last_id
+
+
+def can_resume(cursor):
+    """True if every event after ``cursor`` is still buffered (so no reading was missed)."""
+    with _cond:
+        if cursor > _last_id:
+            return False  # the ID comes from before a restart
+        oldest = _events[0].id if _events else _last_id + 1
+        return cursor >= oldest - 1
+
+
+def wait(cursor, keys, timeout):
+    """Block until events newer than ``cursor`` exist or ``timeout`` passes.
+
+    Returns ``(events, cursor)``: the new events for ``keys`` and the cursor to
+    pass to the next call. Events for other locations advance the cursor but
+    are not returned. The buffer is read from its newest end back to the
+    cursor, so a wake-up costs the number of new events, not the buffer size.
+    """
+    with _cond:
+        _cond.wait_for(lambda: _last_id > cursor, timeout)
+        newer = takewhile(lambda e: e.id > cursor, reversed(_events))
+        events = [e for e in newer if e.key in keys]
+        events.reverse()
+        _stats["delivered"] += len(events)
+        return events, max(cursor, _last_id)
+
+
+def watch(locations):
+    """Register an open stream for ``locations``; returns the set of keys it follows."""
+    keys = set()
+    with _cond:
+        for location in locations:
+            key = normalize_query(location)
+            if key in keys:
+                continue
+            keys.add(key)
+            _watchers.setdefault(key, [location, 0])[1] += 1
+    return keys
+
+
+def unwatch(keys):
+    with _cond:
+        for key in keys:
+            watcher = _watchers.get(key)
+            if watcher is None:
+                continue
+            watcher[1] -= 1
+            if watcher[1] <= 0:
+                del _watchers[key]
+
+
+def watched_locations():
+    """Return one location name per location that has at least one open stream."""
+    with _cond:
+        return [location for location, _ in _watchers.values()]
+
+
+def get_stats():
+    with _cond:
+        stats = dict(_stats)
+        stats["buffered"] = len(_events)
+        stats["last_event_id"] = _last_id
+        stats["subscriptions"] = sum(count for _, count in _watchers.values())
+        stats["watched_locations"] = len(_watchers)
+    return stats
@@ -0,0 +1,141 @@
+"""Streaming export of stored readings.
+
+Rows are read from the cursor ``EXPORT_CHUNK_SIZE`` at a time and each chunk
+is encoded and yielded before the next is read, so memory use stays flat no
+matter how many rows match. NDJSON and CSV need nothing beyond the standard
+library; Arrow IPC and Parquet need the optional ``pyarrow`` package.
+"""
+import csv
+import io
+import json
+import sqlite3
+
+from config import Config
+from database.db_setup import borrowed_connection
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+COLUMNS = ("location", "timestamp", "aqi", "pm25", "pm10", "co", "no2", "o3", "so2")
+
+# format -> (mimetype, file extension, needs pyarrow)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson", False),
+    "csv": ("text/csv", "csv", False),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow", True),
+    "parquet": ("application/vnd.apache.parquet", "parquet", True),
+}
+
+
+def format_available(fmt):
+    return fmt in FORMATS and (pa is not None or not FORMATS[fmt][2])
+
+
+def _chunks(location_ids, start, end):
+    """Yield lists of row tuples from a connection held for the whole export."""
+    clauses, params = [], []
+    if location_ids is not None:
+        clauses.append(f"location_id IN ({', '.join('?' * len(location_ids))})")
+        params += location_ids
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with borrowed_connection() as conn:
+        # Plain tuples: no sqlite3.Row objects for rows that are only re-encoded.
+        conn.row_factory = None
+        try:
+            cursor = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM air_quality_data {where} ORDER BY id", params
+            )
+            while True:
+                rows = cursor.fetchmany(Config.EXPORT_CHUNK_SIZE)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            conn.row_factory = sqlite3.Row
+
+
+def _ndjson(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in rows)
+
+
+def _csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink:
+    """Write-only file object that hands pyarrow's output back to the generator."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _schema():
+    return pa.schema(
+        [("location", pa.string()), ("timestamp", pa.string()), ("aqi", pa.int64())]
+        + [(column, pa.float64()) for column in COLUMNS[3:]]
+    )
+
+
+def _arrow(chunks, parquet=False):
+    schema = _schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_batch(batch)  # for Parquet: one row group per chunk
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export(fmt, location_ids=None, start=None, end=None):
+    """Return a generator of encoded chunks for the matching readings."""
+    chunks = _chunks(location_ids, start, end)
+    if fmt == "ndjson":
+        return _ndjson(chunks)
+    if fmt == "csv":
+        return _csv(chunks)
+    return _arrow(chunks, parquet=fmt == "parquet")
@@ -0,0 +1,127 @@
+"""Geocoding cache: an in-process LRU in front of the ``geocode_cache`` table.
+
+A city's coordinates never change, so resolving them once and remembering the
+answer saves one upstream round trip on every air-quality fetch. Lookups that
+returned no match are cached too (for a shorter period) so repeated typos do
+not keep hitting the geocoding API.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from config import Config
+from database.db_setup import get_db_connection
+from models.location import normalize_location
+
+GeocodeEntry = namedtuple("GeocodeEntry", ["lat", "lon", "name", "found", "fetched_at"])
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "db_hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0}
+
+
+def normalize_query(location):
+    """Return the cache key for a free-text location."""
+    return normalize_location(location)
+
+
+def _is_fresh(entry, now):
+    ttl = Config.GEOCODE_CACHE_TTL if entry.found else Config.GEOCODE_NEGATIVE_TTL
+    return now - entry.fetched_at < ttl
+
+
+def _remember(key, entry):
+    """Insert into the LRU, evicting the least recently used entries. Caller holds _lock."""
+    _entries[key] = entry
+    _entries.move_to_end(key)
+    while len(_entries) > Config.GEOCODE_CACHE_SIZE:
+        _entries.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def _load_from_db(key):
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT lat, lon, name, found, fetched_at FROM geocode_cache WHERE query = ?",
+        (key,),
+    ).fetchone()
+    if row is None:
+        return None
+    return GeocodeEntry(row["lat"], row["lon"], row["name"], bool(row["found"]), row["fetched_at"])
+
+
+def lookup(location):
+    """Return a fresh GeocodeEntry for ``location`` or None on a cache miss."""
+    key = normalize_query(location)
+    now = time.time()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and _is_fresh(entry, now):
+            _entries.move_to_end(key)
+            _stats["hits" if entry.found else "negative_hits"] += 1
+            return entry
+
+    # Another process (or an earlier run) may already have resolved it.
+    entry = _load_from_db(key)
+    with _lock:
+        if entry is not None and _is_fresh(entry, now):
+            _remember(key, entry)
+            _stats["db_hits" if entry.found else "negative_hits"] += 1
+            return entry
+        _entries.pop(key, None)
+        _stats["misses"] += 1
+    return None
+
+
+def _store(location, entry):
+    key = normalize_query(location)
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO geocode_cache (query, lat, lon, name, found, fetched_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (key, entry.lat, entry.lon, entry.name, 1 if entry.found else 0, entry.fetched_at),
+        )
+    with _lock:
+        _remember(key, entry)
+
+
+def store(location, lat, lon, name):
+    """Cache a successful geocoding result."""
+    _store(location, GeocodeEntry(lat, lon, name, True, time.time()))
+
+
+def store_not_found(location):
+    """Cache a "location not found" answer."""
+    _store(location, GeocodeEntry(None, None, None, False, time.time()))
+
+
+def warm():
+    """Populate the in-process LRU with the most recently resolved locations."""
+    conn = get_db_connection()
+    rows = conn.execute(
+        """SELECT query, lat, lon, name, found, fetched_at FROM geocode_cache
+           ORDER BY fetched_at DESC LIMIT ?""",
+        (Config.GEOCODE_CACHE_SIZE,),
+    ).fetchall()
+
+    now = time.time()
+    loaded = 0
+    with _lock:
+        # Oldest first so the most recent entries end up at the MRU end.
+        for row in reversed(rows):
+            entry = GeocodeEntry(row["lat"], row["lon"], row["name"], bool(row["found"]), row["fetched_at"])
+            if _is_fresh(entry, now):
+                _remember(row["query"], entry)
+                loaded += 1
+    return loaded
+
+
+def get_stats():
+    """Return hit/miss counters and the current cache size."""
+    with _lock:
+        stats = dict(_stats)
+        stats["size"] = len(_entries)
+    lookups = stats["hits"] + stats["db_hits"] + stats["negative_hits"] + stats["misses"]
+    stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+    return stats
@@ -0,0 +1,181 @@
+"""Shared HTTP client for OpenWeatherMap calls.
+
+All upstream requests go through one pooled ``requests.Session`` so TCP/TLS
+connections are reused. Transient failures (connection errors, 429 and 5xx
+responses) are retried with jittered exponential backoff, honouring
+``Retry-After`` when the server sends one. A client-side token bucket keeps
+the combined request rate of the scheduler and the API routes under the
+configured quota.
+"""
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from services import metrics
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a token is available."""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token and return the number of seconds spent waiting for it."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_session = None
+_session_lock = threading.Lock()
+_bucket = TokenBucket(Config.OWM_RATE_LIMIT_PER_MINUTE, Config.OWM_RATE_LIMIT_BURST)
+
+_request_seconds = metrics.histogram(
+    "upstream_request_seconds",
+    "OpenWeatherMap request latency per attempt, by endpoint path and status.",
+    ("endpoint", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "requests": 0,
+    "retries": 0,
+    "errors": 0,
+    "throttled_waits": 0,
+    "throttled_seconds": 0.0,
+    "status": {},
+}
+
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=Config.HTTP_POOL_SIZE,
+                pool_maxsize=Config.HTTP_POOL_SIZE,
+                max_retries=0,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _observe(url, latency, status):
+    _request_seconds.observe(latency, urlsplit(url).path, status)
+    with _metrics_lock:
+        _metrics["requests"] += 1
+        _metrics["status"][status] = _metrics["status"].get(status, 0) + 1
+
+
+def _count(name, amount=1):
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+def _backoff(attempt):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(Config.OWM_BACKOFF_MAX, Config.OWM_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after(response):
+    """Return the server-requested delay in seconds, or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def get(url, params=None, timeout=10):
+    """GET ``url`` with pooling, rate limiting and retries. Returns the final response."""
+    session = _get_session()
+    attempt = 0
+    while True:
+        waited = _bucket.acquire()
+        if waited:
+            _count("throttled_waits")
+            _count("throttled_seconds", waited)
+
+        start = time.perf_counter()
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            _observe(url, time.perf_counter() - start, "error")
+            if attempt >= Config.OWM_MAX_RETRIES:
+                _count("errors")
+                raise
+            _count("retries")
+            time.sleep(_backoff(attempt))
+            attempt += 1
+            continue
+
+        _observe(url, time.perf_counter() - start, response.status_code)
+        if response.status_code not in RETRY_STATUSES or attempt >= Config.OWM_MAX_RETRIES:
+            return response
+
+        delay = _retry_after(response)
+        if delay is None:
+            delay = _backoff(attempt)
+        elif delay > Config.OWM_BACKOFF_MAX:
+            # The server wants us to back off longer than a caller should wait.
+            return response
+        _count("retries")
+        response.close()
+        time.sleep(delay)
+        attempt += 1
+
+
+def get_stats():
+    """Return upstream request counters.
+
+    Latency is only recorded in the ``aqm_upstream_request_seconds`` histogram
+    on /api/metrics.
+    """
+    with _metrics_lock:
+        return {
+            "requests": _metrics["requests"],
+            "retries": _metrics["retries"],
+            "errors": _metrics["errors"],
+            "throttled_waits": _metrics["throttled_waits"],
+            "throttled_seconds": round(_metrics["throttled_seconds"], 3),
+            "status": {str(k): v for k, v in _metrics["status"].items()},
+        }
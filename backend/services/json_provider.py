@@ -0,0 +1,40 @@
+"""Optional orjson-backed JSON provider for Flask.
+
+When ``orjson`` is installed (and ``JSON_ENCODER`` is not ``stdlib``),
+``jsonify`` responses are encoded by orjson straight to bytes. Types orjson
+does not know natively fall back to Flask's own conversions (dates, UUIDs,
+dataclasses, ...). Keys are not sorted, unlike the stdlib provider.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class OrJSONProvider(DefaultJSONProvider):
+    options = orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.options),
+            mimetype=self.mimetype,
+        )
+
+
+def install(app):
+    """Switch ``app`` to the orjson provider if available; returns the encoder name."""
+    if Config.JSON_ENCODER == "stdlib" or orjson is None:
+        return "stdlib"
+    app.json = OrJSONProvider(app)
+    return "orjson"
@@ -0,0 +1,234 @@
+"""Outbound alert mail queue.
+
+Every caller that raises alerts (a scheduler tick, a manual check) collects
+them in its own ``Batch``. Alerts are kept per recipient and only turned into
+messages on ``Batch.flush()``, so a subscriber whose AQI and pollutant
+thresholds both tripped, or who follows several locations, gets a single email
+per check. A flush only sends the mail of its own batch and returns the
+``Delivery`` handles for it. Flushed batches are delivered by a background
+thread over one SMTP session; transient SMTP failures reconnect and retry with
+exponential backoff, so a slow mail server never holds up the caller.
+"""
+import queue
+import smtplib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from flask_mail import Message
+
+from config import Config
+from services import metrics
+
+SIGNATURE = "\n-- Air Quality Monitor\n"
+
+_mail = None
+_batches = weakref.WeakSet()  # batches not flushed yet, for the pending count
+_batches_lock = threading.Lock()
+_outbox = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_stats = {"queued": 0, "sent": 0, "failed": 0, "sessions": 0, "retries": 0}
+_stats_lock = threading.Lock()
+_connect_seconds = metrics.histogram("smtp_connect_seconds", "Time to open an SMTP session (connect, TLS, login).")
+_send_seconds = metrics.histogram("smtp_send_seconds", "Time to send one message over an open session.", ("result",))
+
+
+class Delivery:
+    """One outgoing message; ``wait()`` blocks until it was sent or gave up.
+
+    ``callbacks`` are called with the delivery once its status is final, before
+    ``wait()`` returns, in the sender thread with an app context.
+    """
+
+    def __init__(self, recipient, subject, body, callbacks=()):
+        self.recipient = recipient
+        self.subject = subject
+        self.body = body
+        self.status = "queued"
+        self.error = None
+        self._callbacks = list(callbacks)
+        self._done = threading.Event()
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        for callback in self._callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Mail queue: callback for {self.recipient} failed: {e}")
+        self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+def init_mail_queue(mail_instance):
+    global _mail
+    _mail = mail_instance
+
+
+def _compose(recipient, sections, callbacks=()):
+    if len(sections) == 1:
+        subject, body = next(iter(sections.values()))
+    else:
+        subject = f"⚠️ Air Quality Alerts for {len(sections)} locations"
+        body = ("\n" + "-" * 40 + "\n\n").join(body for _, body in sections.values())
+    return Delivery(recipient, subject, body + SIGNATURE, callbacks)
+
+
+def _enqueue(deliveries):
+    if deliveries:
+        _ensure_worker()
+        with _stats_lock:
+            _stats["queued"] += len(deliveries)
+        _outbox.put(deliveries)
+
+
+class Batch:
+    """Alerts raised by one caller, merged per recipient until the caller flushes them.
+
+    Alerts added after the flush (a scheduler unit that finished past the tick
+    deadline, for example) are not lost: each is sent as a message of its own.
+    """
+
+    def __init__(self):
+        self._pending = OrderedDict()  # email -> OrderedDict(location -> (subject, body))
+        self._callbacks = {}  # email -> [on_done]
+        self._lock = threading.Lock()
+        self._flushed = False
+        with _batches_lock:
+            _batches.add(self)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, recipient, location, subject, body, on_done=None):
+        """Queue one location's alert for ``recipient`` until the flush.
+
+        ``body`` should not include the signature; it is added once per message.
+        ``on_done`` is called with the ``Delivery`` that carried the alert once
+        it was sent or gave up.
+        """
+        callbacks = [on_done] if on_done is not None else []
+        with self._lock:
+            if not self._flushed:
+                self._pending.setdefault(recipient, OrderedDict())[location] = (subject, body)
+                self._callbacks.setdefault(recipient, []).extend(callbacks)
+                return
+        _enqueue([_compose(recipient, {location: (subject, body)}, callbacks)])
+
+    def flush(self):
+        """Turn the batch into one message per recipient and hand them to the sender.
+
+        Returns the list of ``Delivery`` objects for this batch only.
+        """
+        with self._lock:
+            pending = list(self._pending.items())
+            callbacks = self._callbacks
+            self._pending.clear()
+            self._callbacks = {}
+            self._flushed = True
+        with _batches_lock:
+            _batches.discard(self)
+        deliveries = [
+            _compose(recipient, sections, callbacks.get(recipient, ())) for recipient, sections in pending
+        ]
+        _enqueue(deliveries)
+        return deliveries
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name="mail-queue", daemon=True)
+            _worker.start()
+
+
+def _worker_loop():
+    while True:
+        batch = _outbox.get()
+        # Coalesce everything already waiting into the same SMTP session.
+        while True:
+            try:
+                batch += _outbox.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            with _mail.app.app_context():
+                _send_batch(batch)
+        except Exception as e:
+            for delivery in batch:
+                if delivery.status == "queued":
+                    _record(delivery, "failed", e)
+            print(f"Mail queue: batch of {len(batch)} failed: {e}")
+
+
+def _is_transient(error):
+    """Connection problems and 4xx replies are worth retrying; 5xx replies are not."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    # Socket-level failures (refused, reset, timed out); SMTPException is itself an OSError.
+    return isinstance(error, OSError)
+
+
+def _record(delivery, status, error=None):
+    with _stats_lock:
+        _stats[status] += 1
+    delivery._finish(status, error)
+
+
+def _send_batch(batch):
+    remaining = list(batch)
+    attempt = 0
+    while remaining:
+        try:
+            with _stats_lock:
+                _stats["sessions"] += 1
+            start = time.perf_counter()
+            with _mail.connect() as conn:
+                _connect_seconds.observe(time.perf_counter() - start)
+                while remaining:
+                    delivery = remaining[0]
+                    message = Message(subject=delivery.subject, recipients=[delivery.recipient], body=delivery.body)
+                    start = time.perf_counter()
+                    try:
+                        conn.send(message)
+                    except Exception as e:
+                        _send_seconds.observe(time.perf_counter() - start, "error")
+                        if _is_transient(e):
+                            raise
+                        print(f"Failed to send alert to {delivery.recipient}: {e}")
+                        _record(remaining.pop(0), "failed", e)
+                        continue
+                    _send_seconds.observe(time.perf_counter() - start, "sent")
+                    _record(remaining.pop(0), "sent")
+        except Exception as e:
+            if not _is_transient(e) or attempt >= Config.MAIL_MAX_RETRIES:
+                for delivery in remaining:
+                    _record(delivery, "failed", e)
+                print(f"Mail queue: giving up on {len(remaining)} message(s): {e}")
+                return
+            attempt += 1
+            with _stats_lock:
+                _stats["retries"] += 1
+            time.sleep(Config.MAIL_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+
+def get_stats():
+    """Return delivery counters and the number of recipients waiting for a flush."""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _batches_lock:
+        batches = list(_batches)
+    stats["pending"] = sum(len(batch) for batch in batches)
+    stats["outbox"] = _outbox.qsize()
+    return stats
@@ -0,0 +1,277 @@
+"""In-process metrics, exposed in Prometheus text format on ``/api/metrics``.
+
+Services declare their own counters and histograms at import time through
+``counter()`` and ``histogram()``; asking for an existing name returns the same
+metric. Request latency per blueprint is recorded by the hooks ``install()``
+adds to the app, SQL time per model method by the ``timed_query`` decorator
+and APScheduler lag and missed runs by ``watch_scheduler()``.
+
+The counters services already keep for ``/api/health`` are not duplicated:
+``register_stats()`` exports every numeric field of their ``get_stats()`` dicts
+as a gauge when the endpoint is scraped.
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+PREFIX = "aqm_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+_stats_sources = {}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=""):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds (seconds), optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *label_values):
+        """Context manager observing the duration of its block."""
+        return _Timer(self, label_values)
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for label_values, values in series:
+            cumulative = 0
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {values[-1]!r}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+def _register(cls, name, help, labels, **kwargs):
+    name = PREFIX + name
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, help, labels, **kwargs)
+        return metric
+
+
+def counter(name, help, labels=()):
+    """Return the counter ``name`` (without prefix), creating it on first use."""
+    return _register(Counter, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    """Return the histogram ``name`` (without prefix), creating it on first use."""
+    return _register(Histogram, name, help, labels, buckets=buckets)
+
+
+def register_stats(sources):
+    """Export the numeric fields of ``{component: get_stats}`` as gauges on every scrape."""
+    _stats_sources.update(sources)
+
+
+def _stats_lines():
+    for component, get_stats in _stats_sources.items():
+        try:
+            stats = get_stats()
+        except Exception as e:
+            print(f"Metrics: reading {component} stats failed: {e}")
+            continue
+        for key, value in stats.items():
+            name = f"{PREFIX}{component}_{key}"
+            if isinstance(value, dict):
+                samples = [
+                    (f'{{key="{_escape(k)}"}}', v) for k, v in value.items() if isinstance(v, (int, float))
+                ]
+            elif isinstance(value, (int, float)):
+                samples = [("", value)]
+            else:
+                continue
+            if samples:
+                yield f"# TYPE {name} gauge"
+                for labels, sample in samples:
+                    yield f"{name}{labels} {_format_value(int(sample) if isinstance(sample, bool) else sample)}"
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    lines.extend(_stats_lines())
+    return "\n".join(lines) + "\n"
+
+
+_query_seconds = histogram("db_query_seconds", "Time spent in model methods that run SQL.", ("method",))
+
+
+def timed_query(func):
+    """Record the duration of a model method in ``aqm_db_query_seconds``.
+
+    Place it below ``@classmethod``; the label is the method's qualified name.
+    """
+    label = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _query_seconds.observe(time.perf_counter() - start, label)
+
+    return wrapper
+
+
+_request_seconds = histogram(
+    "http_request_seconds",
+    "API request latency until the response is ready, by blueprint.",
+    ("blueprint", "method", "status"),
+)
+
+
+def _start_request_timer():
+    g.metrics_request_start = time.perf_counter()
+
+
+def _observe_request(response):
+    start = g.pop("metrics_request_start", None)
+    if start is not None:
+        _request_seconds.observe(
+            time.perf_counter() - start, request.blueprint or "app", request.method, response.status_code
+        )
+    return response
+
+
+def install(app):
+    """Time every request of ``app``; streamed bodies are timed until their headers are ready."""
+    app.before_request(_start_request_timer)
+    app.after_request(_observe_request)
+
+
+_job_lag_seconds = histogram(
+    "scheduler_job_lag_seconds", "Delay between a job's scheduled time and its submission.", ("job",)
+)
+_job_seconds = histogram(
+    "scheduler_job_seconds", "Background job run time.", ("job", "result"),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 240.0, 600.0),
+)
+_job_missed = counter(
+    "scheduler_job_missed_total",
+    "Scheduled runs that did not happen: past the misfire grace time or the previous run still going.",
+    ("job", "reason"),
+)
+
+
+def watch_scheduler(scheduler):
+    """Record lag, run time and missed runs of every job on an APScheduler ``scheduler``."""
+    from apscheduler.events import (
+        EVENT_JOB_ERROR,
+        EVENT_JOB_EXECUTED,
+        EVENT_JOB_MAX_INSTANCES,
+        EVENT_JOB_MISSED,
+        EVENT_JOB_SUBMITTED,
+    )
+
+    submitted = {}
+
+    def listener(event):
+        if event.code == EVENT_JOB_SUBMITTED:
+            now = time.time()
+            submitted[event.job_id] = time.perf_counter()
+            for run_time in event.scheduled_run_times:
+                _job_lag_seconds.observe(max(0.0, now - run_time.timestamp()), event.job_id)
+        elif event.code in (EVENT_JOB_EXECUTED, EVENT_JOB_ERROR):
+            start = submitted.pop(event.job_id, None)
+            if start is not None:
+                result = "error" if event.code == EVENT_JOB_ERROR else "ok"
+                _job_seconds.observe(time.perf_counter() - start, event.job_id, result)
+        elif event.code == EVENT_JOB_MISSED:
+            _job_missed.inc(1, event.job_id, "misfire")
+        elif event.code == EVENT_JOB_MAX_INSTANCES:
+            _job_missed.inc(1, event.job_id, "max_instances")
+
+    scheduler.add_listener(
+        listener,
+        EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES,
+    )
@@ -0,0 +1,194 @@
+"""Adaptive poll times for the scheduled alert check.
+
+Every grid cell (see ``scheduler_service.FetchUnit``) has its own next poll
+time, kept in a heap. After each fetch the next interval is set between
+``POLL_MIN_INTERVAL`` and ``POLL_MAX_INTERVAL`` from an urgency in [0, 1]
+that combines:
+
+* proximity: how close any pollutant is to any subscriber's threshold
+  (``threshold_engine.LocationThresholds.headroom``)
+* volatility: the fastest recent AQI change, projected over the max interval
+* subscribers: more subscribers weigh a little more
+
+Readings do not change between upstream updates. The longest recent stretch
+in which a cell kept returning the same reading is a lower bound on the
+upstream update period. The next poll is not scheduled before that much time
+has passed since the last change, so urgent cells do not re-read data that
+cannot have changed yet.
+
+``select`` hands out the due cells, most urgent first, until the
+``POLL_BUDGET_PER_MINUTE`` of scheduled upstream fetches is used up. Cells
+over budget stay due and go first on the next tick.
+"""
+import heapq
+import math
+import threading
+import time
+from collections import deque
+
+from config import Config
+from services import metrics
+
+# Values within this relative distance of a threshold raise the urgency (linearly up to 1 at 0).
+HEADROOM_SCALE = 0.5
+# A projected AQI change of this size within POLL_MAX_INTERVAL means full urgency.
+VOLATILITY_AQI = 25.0
+# Subscriber count at which the subscriber weight peaks (log scale).
+SUBSCRIBERS_SCALE = 1000
+SAMPLES_KEPT = 6
+STABLE_SPANS_KEPT = 5
+BUDGET_WINDOW = 60.0
+
+_cells = {}  # grid key -> _Cell
+_heap = []  # (due_at, key); entries whose due_at no longer matches the cell are stale
+_fetches = deque()  # monotonic times of scheduled fetches inside the budget window
+_lock = threading.Lock()
+_stats = {"selected": 0, "deferred": 0, "not_due": 0, "failed": 0}
+_interval_seconds = metrics.histogram(
+    "poll_interval_seconds",
+    "Interval chosen for the next poll of a location cell.",
+    buckets=(30, 60, 120, 180, 300, 450, 600, 900, 1800, 3600),
+)
+
+
+class _Cell:
+    __slots__ = (
+        "due_at", "interval", "urgency", "samples", "values", "changed_at", "unchanged_at", "stable_spans",
+    )
+
+    def __init__(self, now):
+        self.due_at = now
+        self.interval = None
+        self.urgency = 1.0  # never fetched: as urgent as it gets
+        self.samples = deque(maxlen=SAMPLES_KEPT)  # (time, aqi)
+        self.values = None
+        self.changed_at = None
+        self.unchanged_at = None  # last poll that returned the same reading as the one before
+        self.stable_spans = deque(maxlen=STABLE_SPANS_KEPT)
+
+
+def _schedule(key, cell, due_at):
+    cell.due_at = due_at
+    heapq.heappush(_heap, (due_at, key))
+
+
+def select(units, busy=(), now=None):
+    """Return the units to fetch now, most urgent first, within the upstream budget.
+
+    ``units`` are all cells that are currently tracked; cells that are no
+    longer among them are forgotten and new ones are due immediately. Due
+    cells whose key is in ``busy`` (still being fetched) wait for the next tick.
+    """
+    now = time.monotonic() if now is None else now
+    by_key = {unit.key: unit for unit in units}
+    with _lock:
+        for key in list(_cells):
+            if key not in by_key:
+                del _cells[key]
+        for key in by_key:
+            if key not in _cells:
+                _schedule(key, _cells.setdefault(key, _Cell(now)), now)
+
+        due = []
+        while _heap and _heap[0][0] <= now:
+            due_at, key = heapq.heappop(_heap)
+            cell = _cells.get(key)
+            if cell is not None and cell.due_at == due_at:
+                due.append(key)
+        waiting = [key for key in due if key in busy]
+        due = [key for key in due if key not in busy]
+        due.sort(key=lambda k: (-_cells[k].urgency, _cells[k].due_at))
+
+        while _fetches and now - _fetches[0] >= BUDGET_WINDOW:
+            _fetches.popleft()
+        allowed = len(due)
+        if Config.POLL_BUDGET_PER_MINUTE > 0:
+            allowed = max(0, min(allowed, Config.POLL_BUDGET_PER_MINUTE - len(_fetches)))
+        for key in due[allowed:] + waiting:
+            # Still due: back on the heap with the same time so they lead the next tick.
+            heapq.heappush(_heap, (_cells[key].due_at, key))
+        _fetches.extend([now] * allowed)
+
+        _stats["selected"] += allowed
+        _stats["deferred"] += len(due) - allowed
+        _stats["not_due"] += len(by_key) - len(due)
+    return [by_key[key] for key in due[:allowed]]
+
+
+def _urgency(cell, subscribers, headroom):
+    proximity = 0.0
+    if headroom is not None:
+        proximity = max(0.0, 1.0 - headroom / HEADROOM_SCALE)
+
+    volatility = 0.0
+    samples = list(cell.samples)
+    for (t0, a0), (t1, a1) in zip(samples, samples[1:]):
+        if t1 > t0:
+            rate = abs(a1 - a0) / (t1 - t0)
+            volatility = max(volatility, min(1.0, rate * Config.POLL_MAX_INTERVAL / VOLATILITY_AQI))
+
+    weight = 0.0
+    if subscribers:
+        weight = min(1.0, math.log10(1 + subscribers) / math.log10(1 + SUBSCRIBERS_SCALE))
+    return 1.0 - (1.0 - proximity) * (1.0 - volatility) * (1.0 - 0.5 * weight)
+
+
+def observe(unit, data, subscribers, headroom, now=None):
+    """Record a successful fetch of ``unit`` and schedule its next poll; returns the interval."""
+    now = time.monotonic() if now is None else now
+    values = tuple(data.get(metric) for metric in ("aqi", "pm25", "pm10", "co", "no2", "o3", "so2"))
+    with _lock:
+        cell = _cells.get(unit.key)
+        if cell is None:
+            return None
+        if values == cell.values:
+            cell.unchanged_at = now
+        else:
+            if cell.unchanged_at is not None:
+                cell.stable_spans.append(cell.unchanged_at - cell.changed_at)
+            cell.values = values
+            cell.changed_at = now
+            cell.unchanged_at = None
+        cell.samples.append((now, float(data.get("aqi") or 0)))
+
+        cell.urgency = _urgency(cell, subscribers, headroom)
+        low, high = Config.POLL_MIN_INTERVAL, max(Config.POLL_MIN_INTERVAL, Config.POLL_MAX_INTERVAL)
+        interval = high - (high - low) * cell.urgency
+        due_at = now + interval
+        if cell.stable_spans:
+            # Upstream has not updated sooner than this after a change lately.
+            expected = cell.changed_at + max(cell.stable_spans)
+            due_at = min(max(due_at, expected), now + high)
+        cell.interval = due_at - now
+        _schedule(unit.key, cell, due_at)
+    _interval_seconds.observe(cell.interval)
+    return cell.interval
+
+
+def failed(unit, now=None):
+    """Retry a cell whose fetch failed or timed out after the minimum interval."""
+    now = time.monotonic() if now is None else now
+    with _lock:
+        cell = _cells.get(unit.key)
+        if cell is None:
+            return
+        _stats["failed"] += 1
+        _schedule(unit.key, cell, now + Config.POLL_MIN_INTERVAL)
+
+
+def get_stats():
+    """Return selection counters and the spread of the current poll intervals."""
+    now = time.monotonic()
+    with _lock:
+        stats = dict(_stats)
+        intervals = [cell.interval for cell in _cells.values() if cell.interval is not None]
+        stats["cells"] = len(_cells)
+        stats["due"] = sum(1 for cell in _cells.values() if cell.due_at <= now)
+        while _fetches and now - _fetches[0] >= BUDGET_WINDOW:
+            _fetches.popleft()
+        stats["budget_used"] = len(_fetches)
+    stats["budget_per_minute"] = Config.POLL_BUDGET_PER_MINUTE
+    stats["min_interval"] = round(min(intervals), 1) if intervals else None
+    stats["mean_interval"] = round(sum(intervals) / len(intervals), 1) if intervals else None
+    stats["max_interval"] = round(max(intervals), 1) if intervals else None
+    return stats
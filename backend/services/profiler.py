@@ -0,0 +1,123 @@
+"""Opt-in sampling profiler for slow API requests.
+
+With ``PROFILE_SLOW_REQUEST_MS`` > 0, a background thread samples the Python
+stack of every thread that is serving a request, every
+``PROFILE_SAMPLE_INTERVAL_MS``. When a request takes longer than the
+threshold, its samples are folded into hot stacks (``frame;frame;frame`` ->
+sample count, the input format of flame graph tools). The slowest stack is
+printed, and the last ``PROFILE_KEEP`` profiles are served on
+``/api/metrics/profiles``.
+
+Sampling reads ``sys._current_frames()`` and does not trace calls, so
+unprofiled code runs at full speed. The cost is one stack walk per active
+request per interval.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from flask import g, request
+
+from config import Config
+
+MAX_DEPTH = 40
+TOP_STACKS = 10
+
+_active = {}  # thread id -> Counter(stack -> samples)
+_lock = threading.Lock()
+_profiles = deque(maxlen=max(1, Config.PROFILE_KEEP))
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def enabled():
+    return Config.PROFILE_SLOW_REQUEST_MS > 0
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _stack(frame):
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _sample_loop():
+    interval = Config.PROFILE_SAMPLE_INTERVAL_MS / 1000
+    while True:
+        time.sleep(interval)
+        with _lock:
+            if not _active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, samples in _active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[_stack(frame)] += 1
+
+
+def _ensure_sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None or not _sampler.is_alive():
+            _sampler = threading.Thread(target=_sample_loop, name="profiler", daemon=True)
+            _sampler.start()
+
+
+def _start():
+    _ensure_sampler()
+    g.profile_start = time.perf_counter()
+    with _lock:
+        _active[threading.get_ident()] = Counter()
+
+
+def _finish(response):
+    start = g.pop("profile_start", None)
+    with _lock:
+        samples = _active.pop(threading.get_ident(), None)
+    if start is None or not samples:
+        return response
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms < Config.PROFILE_SLOW_REQUEST_MS:
+        return response
+
+    hot = samples.most_common(TOP_STACKS)
+    profile = {
+        "at": time.time(),
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "status": response.status_code,
+        "duration_ms": round(duration_ms, 1),
+        "samples": sum(samples.values()),
+        "stacks": {stack: count for stack, count in hot},
+    }
+    with _lock:
+        _profiles.append(profile)
+    leaf = hot[0][0].rsplit(";", 1)[-1]
+    print(
+        f"Slow request: {profile['method']} {profile['path']} took {profile['duration_ms']}ms, "
+        f"hottest frame {leaf} in {hot[0][1]}/{profile['samples']} samples."
+    )
+    return response
+
+
+def install(app):
+    """Profile the requests of ``app`` if ``PROFILE_SLOW_REQUEST_MS`` is set; returns whether it is."""
+    if not enabled():
+        return False
+    app.before_request(_start)
+    app.after_request(_finish)
+    return True
+
+
+def get_profiles():
+    """Return the retained slow-request profiles, newest first."""
+    with _lock:
+        return list(reversed(_profiles))
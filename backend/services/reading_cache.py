@@ -0,0 +1,214 @@
+"""Per-location cache of recent air quality readings.
+
+Readings are considered fresh for ``READING_CACHE_TTL`` seconds. Within that
+window callers are served from memory, or from the latest stored row, instead
+of calling OpenWeatherMap again. Concurrent misses for the same location are
+coalesced: the first caller performs the fetch and the others wait for its
+result. Readings that come from upstream are published to the event hub for
+live streams.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import Config
+from models.air_quality_data import AirQualityData
+from services import event_hub
+from services.api_service import enrich_stored, fetch_air_quality
+from services.geocode_cache import normalize_query
+
+_readings = OrderedDict()  # key -> (data, fetched_at)
+_inflight = {}  # key -> _Flight
+_lock = threading.Lock()
+_stats = {"hits": 0, "db_hits": 0, "coalesced": 0, "misses": 0}
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class _Flight:
+    """A fetch in progress that other callers can wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.data = None
+        self.fetched_at = None
+        self.error = None
+
+
+def _remember(key, data, fetched_at):
+    """Store a reading, dropping the oldest entries past the size limit. Caller holds _lock."""
+    _readings[key] = (data, fetched_at)
+    _readings.move_to_end(key)
+    while len(_readings) > Config.READING_CACHE_SIZE:
+        _readings.popitem(last=False)
+
+
+def _from_stored(latest, now):
+    """Return (data, fetched_at) for a stored row, shaped like a live reading.
+
+    ``fetched_at`` is None if the row's timestamp cannot be parsed.
+    """
+    data = latest.to_dict()
+    data.pop("id", None)
+    try:
+        stored_at = datetime.fromisoformat(data.pop("timestamp"))
+        fetched_at = now - (datetime.utcnow() - stored_at).total_seconds()
+    except (TypeError, ValueError):
+        fetched_at = None
+    return enrich_stored(data), fetched_at
+
+
+def _latest_stored(location, now):
+    """Return (data, fetched_at) for the newest stored row if it is still fresh."""
+    latest = AirQualityData.get_latest(location)
+    if latest is None:
+        return None
+    data, fetched_at = _from_stored(latest, now)
+    if fetched_at is None or now - fetched_at >= Config.READING_CACHE_TTL:
+        return None
+    return data, fetched_at
+
+
+def put(location, data, fetched_at=None):
+    """Record a reading fetched elsewhere (e.g. by the scheduler)."""
+    with _lock:
+        _remember(normalize_query(location), data, fetched_at or time.time())
+    event_hub.publish(location, data)
+
+
+def sync_stored(location):
+    """Adopt the newest stored reading if it is fresh and newer than the cached one.
+
+    Another process (the scheduler lease holder) may have fetched and saved it;
+    adopting it publishes it to this process's live streams. Returns whether a
+    fresh stored reading exists.
+    """
+    now = time.time()
+    stored = _latest_stored(location, now)
+    if stored is None:
+        return False
+    key = normalize_query(location)
+    with _lock:
+        entry = _readings.get(key)
+        newer = entry is None or stored[1] > entry[1]
+    if newer:
+        put(location, stored[0], stored[1])
+    return True
+
+
+def peek(location):
+    """Return ``(data, fetched_at)`` of the newest known reading without going upstream.
+
+    Falls back to the latest stored row, however old; returns None if there is none.
+    """
+    with _lock:
+        entry = _readings.get(normalize_query(location))
+    if entry is not None:
+        return entry
+    latest = AirQualityData.get_latest(location)
+    if latest is None:
+        return None
+    return _from_stored(latest, time.time())
+
+
+def get_reading(location, store=True):
+    """Return ``(data, cached, age_seconds)`` for ``location``.
+
+    ``cached`` is False only for the caller that actually went upstream. With
+    ``store=False`` that caller is responsible for saving the reading.
+    """
+    key = normalize_query(location)
+    now = time.time()
+    with _lock:
+        entry = _readings.get(key)
+        if entry is not None and now - entry[1] < Config.READING_CACHE_TTL:
+            _stats["hits"] += 1
+            return entry[0], True, round(now - entry[1], 1)
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+
+    if not leader:
+        flight.event.wait()
+        with _lock:
+            _stats["coalesced"] += 1
+        if flight.error is not None:
+            raise flight.error
+        return flight.data, True, round(time.time() - flight.fetched_at, 1)
+
+    try:
+        stored = _latest_stored(location, now)
+        if stored is not None:
+            flight.data, flight.fetched_at = stored
+            cached = True
+        else:
+            flight.data = fetch_air_quality(location, store=store)
+            flight.fetched_at = time.time()
+            cached = False
+        with _lock:
+            _remember(key, flight.data, flight.fetched_at)
+            _stats["db_hits" if cached else "misses"] += 1
+        if not cached:
+            event_hub.publish(location, flight.data)
+        return flight.data, cached, round(time.time() - flight.fetched_at, 1)
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        flight.event.set()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.BATCH_MAX_WORKERS), thread_name_prefix="reading-batch"
+            )
+    return _executor
+
+
+def _batch_item(location):
+    try:
+        data, cached, age_seconds = get_reading(location, store=False)
+    except Exception as e:
+        return {"location": location, "success": False, "error": str(e)}
+    return {"location": location, "success": True, "data": data, "cached": cached, "age_seconds": age_seconds}
+
+
+def get_readings(locations):
+    """Return one result dict per distinct location, fetching misses concurrently.
+
+    Each result has ``success`` and either ``data``/``cached``/``age_seconds``
+    or ``error``, so one bad location does not fail the others. Readings that
+    went upstream are saved together in a single transaction; if that fails
+    they are still returned, each with a ``save_error``.
+    """
+    unique = OrderedDict()
+    for location in locations:
+        unique.setdefault(normalize_query(location), location)
+    results = list(_get_executor().map(_batch_item, unique.values()))
+
+    fresh = [r for r in results if r["success"] and not r["cached"]]
+    try:
+        AirQualityData.save_many([(r["data"]["location"], r["data"]) for r in fresh])
+    except Exception as e:
+        print(f"Batch lookup: failed to save {len(fresh)} reading(s): {e}")
+        for result in fresh:
+            result["save_error"] = f"Failed to save reading: {e}"
+    return results
+
+
+def get_stats():
+    """Return hit/miss counters and the number of cached locations."""
+    with _lock:
+        stats = dict(_stats)
+        stats["size"] = len(_readings)
+    lookups = stats["hits"] + stats["db_hits"] + stats["coalesced"] + stats["misses"]
+    stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+    return stats
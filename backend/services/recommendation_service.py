@@ -1,3 +1,7 @@
+from bisect import bisect_left
+
+import numpy as np
+
 AQI_LEVELS = [
     {"min": 0,   "max": 50,  "label": "Good",                          "color": "#00e400"},
     {"min": 51,  "max": 100, "label": "Moderate",                      "color": "#ffff00"},
@@ -16,60 +20,110 @@ RECOMMENDATIONS = {
     "Hazardous": "Health alert: avoid all outdoor activities. Keep windows and doors closed.",
 }
 
+ACTIVITY_SUGGESTIONS = {
+    "Good": [
+        "Great day for a run or bike ride.",
+        "Open windows to ventilate your home.",
+        "Outdoor sports and picnics are fine.",
+    ],
+    "Moderate": [
+        "Light outdoor activities are okay for most people.",
+        "Sensitive individuals should keep activity short.",
+        "Consider wearing a mask if you have allergies.",
+    ],
+    "Unhealthy for Sensitive Groups": [
+        "Children and elderly should stay indoors.",
+        "Asthmatics should carry their inhaler.",
+        "Avoid strenuous outdoor exercise.",
+    ],
+    "Unhealthy": [
+        "Wear a surgical mask or N95 outdoors.",
+        "Limit time outside to essential trips only.",
+        "Keep indoor air clean with air purifiers.",
+    ],
+    "Very Unhealthy": [
+        "Stay indoors with windows closed.",
+        "Use an N95 mask if you must go outside.",
+        "Run air purifiers on high inside.",
+    ],
+    "Hazardous": [
+        "Do NOT go outdoors.",
+        "Seal gaps around doors and windows.",
+        "Contact local health authorities for guidance.",
+    ],
+}
+
+
+class _FrozenDict(dict):
+    """A dict that refuses modification, so shared payloads cannot be altered by a caller."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("precomputed recommendation payloads are read-only")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _readonly
+
+
+# Upper bound of every band but the last: bisect gives the band index directly.
+_BAND_UPPER = [level["max"] for level in AQI_LEVELS[:-1]]
+_BAND_UPPER_ARRAY = np.array(_BAND_UPPER, dtype=np.float64)
+_LEVELS = tuple(
+    _FrozenDict(label=level["label"], color=level["color"]) for level in AQI_LEVELS
+)
+_RECOMMENDATIONS = tuple(
+    _FrozenDict(
+        level=level["label"],
+        color=level["color"],
+        recommendation=RECOMMENDATIONS.get(level["label"], "Check local guidelines."),
+        activities=tuple(ACTIVITY_SUGGESTIONS.get(level["label"], ())),
+    )
+    for level in AQI_LEVELS
+)
+
+
+def get_aqi_band(aqi):
+    """Return the index of the AQI_LEVELS band for ``aqi`` (higher is worse)."""
+    return bisect_left(_BAND_UPPER, aqi)
+
 
 def get_aqi_level(aqi):
     """Return label and color for the given AQI value."""
-    for level in AQI_LEVELS:
-        if level["min"] <= aqi <= level["max"]:
-            return {"label": level["label"], "color": level["color"]}
-    return {"label": "Hazardous", "color": "#7e0023"}
+    return _LEVELS[get_aqi_band(aqi)]
 
 
 def get_recommendations(aqi):
-    """Return health recommendations based on AQI."""
-    level = get_aqi_level(aqi)
-    label = level["label"]
-    recommendation = RECOMMENDATIONS.get(label, "Check local guidelines.")
-    activities = _get_activity_suggestions(label)
-    return {
-        "level": label,
-        "color": level["color"],
-        "recommendation": recommendation,
-        "activities": activities,
-    }
-
-
-def _get_activity_suggestions(label):
-    suggestions = {
-        "Good": [
-            "Great day for a run or bike ride.",
-            "Open windows to ventilate your home.",
-            "Outdoor sports and picnics are fine.",
-        ],
-        "Moderate": [
-            "Light outdoor activities are okay for most people.",
-            "Sensitive individuals should keep activity short.",
-            "Consider wearing a mask if you have allergies.",
-        ],
-        "Unhealthy for Sensitive Groups": [
-            "Children and elderly should stay indoors.",
-            "Asthmatics should carry their inhaler.",
-            "Avoid strenuous outdoor exercise.",
-        ],
-        "Unhealthy": [
-            "Wear a surgical mask or N95 outdoors.",
-            "Limit time outside to essential trips only.",
-            "Keep indoor air clean with air purifiers.",
-        ],
-        "Very Unhealthy": [
-            "Stay indoors with windows closed.",
-            "Use an N95 mask if you must go outside.",
-            "Run air purifiers on high inside.",
-        ],
-        "Hazardous": [
-            "Do NOT go outdoors.",
-            "Seal gaps around doors and windows.",
-            "Contact local health authorities for guidance.",
-        ],
-    }
-    return suggestions.get(label, [])
+    """Return health recommendations based on AQI (a shared, read-only payload)."""
+    return _RECOMMENDATIONS[get_aqi_band(aqi)]
+
+
+def label_values(values):
+    """Return ``(levels, colors)`` lists for a sequence of AQI values in one lookup.
+
+    Missing values (None or NaN) get None for both.
+    """
+    values = np.array(values, dtype=np.float64)
+    bands = np.searchsorted(_BAND_UPPER_ARRAY, values, side="left").tolist()
+    levels, colors = [], []
+    for value, band in zip(values.tolist(), bands):
+        if value != value:  # NaN: no value for this point
+            levels.append(None)
+            colors.append(None)
+        else:
+            levels.append(_LEVELS[band]["label"])
+            colors.append(_LEVELS[band]["color"])
+    return levels, colors
+
+
+def label_series(points, key="aqi"):
+    """Add ``level`` and ``color`` to every point of a history series in place.
+
+    The bands of the whole series are found with one vectorized lookup.
+    Points without a value for ``key`` are left unlabelled. Returns ``points``.
+    """
+    if not points:
+        return points
+    levels, colors = label_values([p.get(key) for p in points])
+    for point, level, color in zip(points, levels, colors):
+        if level is not None:
+            point["level"] = level
+            point["color"] = color
+    return points
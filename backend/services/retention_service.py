@@ -0,0 +1,140 @@
+"""Retention and compaction for stored readings.
+
+Raw rows older than ``RAW_RETENTION_DAYS`` are deleted in small batches (each
+its own short transaction) so the job never holds the write lock for long;
+their history survives in the hourly and daily rollups. Hourly rollups are
+trimmed after ``HOURLY_RETENTION_DAYS``; daily rollups are kept. Freed pages
+are returned to the filesystem with ``incremental_vacuum`` and, every
+``VACUUM_INTERVAL_DAYS``, with a full ``VACUUM``.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+from database.db_setup import get_db_connection
+
+_run_lock = threading.Lock()
+_last_run = {}
+
+
+def _file_pages(conn):
+    return conn.execute("PRAGMA page_count").fetchone()[0]
+
+
+def _purge_raw(conn, cutoff):
+    """Delete raw rows older than ``cutoff``, oldest first, in batches.
+
+    Rows are inserted in time order, so walking the rowid from the start finds
+    expired rows without scanning the rest of the table.
+    """
+    purged = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, timestamp FROM air_quality_data WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, Config.RETENTION_BATCH_SIZE),
+        ).fetchall()
+        expired = []
+        for row in rows:
+            if row["timestamp"] >= cutoff:
+                break
+            expired.append(row["id"])
+        if expired:
+            with conn:
+                conn.execute(
+                    "DELETE FROM air_quality_data WHERE id BETWEEN ? AND ?",
+                    (expired[0], expired[-1]),
+                )
+            purged += len(expired)
+            last_id = expired[-1]
+        if len(expired) < Config.RETENTION_BATCH_SIZE:
+            return purged
+        time.sleep(Config.RETENTION_BATCH_PAUSE)
+
+
+def _purge_hourly(conn, cutoff):
+    """Trim old hourly buckets one location at a time (primary-key range deletes)."""
+    purged = 0
+    location_ids = [row["id"] for row in conn.execute("SELECT id FROM locations")]
+    for location_id in location_ids:
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM air_quality_hourly WHERE location_id = ? AND bucket_start < ?",
+                (location_id, cutoff),
+            )
+        purged += cursor.rowcount
+    return purged
+
+
+def _full_vacuum_due(conn):
+    if Config.VACUUM_INTERVAL_DAYS <= 0:
+        return False
+    row = conn.execute(
+        "SELECT MAX(finished_at) AS finished_at FROM maintenance_runs WHERE full_vacuum = 1"
+    ).fetchone()
+    if row["finished_at"] is None:
+        return True
+    return time.time() - row["finished_at"] >= Config.VACUUM_INTERVAL_DAYS * 86400
+
+
+def run_retention():
+    """Apply the retention policy once and return a summary dict."""
+    if not _run_lock.acquire(blocking=False):
+        print("Retention skipped: previous run is still in progress.")
+        return None
+    try:
+        return _run()
+    finally:
+        _run_lock.release()
+
+
+def _run():
+    start = time.perf_counter()
+    conn = get_db_connection()
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages_before = _file_pages(conn)
+    now = datetime.utcnow()
+
+    raw_cutoff = (now - timedelta(days=max(1, Config.RAW_RETENTION_DAYS))).isoformat()
+    rows_purged = _purge_raw(conn, raw_cutoff)
+    buckets_purged = 0
+    if Config.HOURLY_RETENTION_DAYS > 0:
+        hourly_cutoff = (now - timedelta(days=Config.HOURLY_RETENTION_DAYS)).isoformat()
+        buckets_purged = _purge_hourly(conn, hourly_cutoff)
+
+    full_vacuum = _full_vacuum_due(conn)
+    if full_vacuum:
+        conn.execute("VACUUM")
+    else:
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+
+    bytes_reclaimed = max(0, pages_before - _file_pages(conn)) * page_size
+    duration = time.perf_counter() - start
+    with conn:
+        conn.execute(
+            """INSERT INTO maintenance_runs
+               (job, finished_at, rows_purged, bytes_reclaimed, duration_seconds, full_vacuum)
+               VALUES ('retention', ?, ?, ?, ?, ?)""",
+            (time.time(), rows_purged + buckets_purged, bytes_reclaimed, duration, 1 if full_vacuum else 0),
+        )
+
+    summary = {
+        "rows_purged": rows_purged,
+        "hourly_buckets_purged": buckets_purged,
+        "bytes_reclaimed": bytes_reclaimed,
+        "full_vacuum": full_vacuum,
+        "duration_seconds": round(duration, 3),
+    }
+    _last_run.clear()
+    _last_run.update(summary)
+    print(
+        f"Retention: purged {rows_purged} raw row(s) and {buckets_purged} hourly bucket(s), "
+        f"reclaimed {bytes_reclaimed} bytes in {summary['duration_seconds']}s."
+    )
+    return summary
+
+
+def get_last_run():
+    """Return the summary of the most recent run (empty before the first run)."""
+    return dict(_last_run)
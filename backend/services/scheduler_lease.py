@@ -0,0 +1,154 @@
+"""Leader election for the background jobs of several app processes.
+
+Every process that runs ``create_app`` (each gunicorn worker, for example)
+starts its own scheduler. Only the process holding the ``scheduler`` lease,
+a row in the shared SQLite database, runs the alert check and retention.
+Without the lease, every worker would fetch, store and mail each location
+once per interval. The holder renews the lease every
+``SCHEDULER_LEASE_RENEW`` seconds. If it dies, the lease expires after
+``SCHEDULER_LEASE_TTL`` seconds and the next process to try takes over. A
+process that exits cleanly hands the lease back at once.
+
+The holder ID includes the PID and is made on first use in each process, so
+a process forked from one that already had an ID never shares it. That is
+the only state reset at fork: ``create_app`` must run in each worker after
+the fork. Forking an app that is already set up (gunicorn ``--preload``) is
+not supported, since the parent's SQLite connections must not be used
+across a fork and its scheduler thread does not survive one.
+"""
+import atexit
+import functools
+import os
+import socket
+import threading
+import time
+import uuid
+
+from config import Config
+from database.db_setup import get_db_connection
+
+NAME = "scheduler"
+
+_lock = threading.Lock()
+_holder = None  # (pid, holder id)
+_expires_at = 0.0
+_stats = {"acquired": 0, "lost": 0, "renewals": 0, "errors": 0}
+
+
+def holder_id():
+    """Return this process's holder ID, creating it on first use after start or fork."""
+    global _holder
+    pid = os.getpid()
+    with _lock:
+        if _holder is None or _holder[0] != pid:
+            _holder = (pid, f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}")
+        return _holder[1]
+
+
+def _after_fork():
+    """A forked child never holds its parent's lease or reuses its holder ID."""
+    global _lock, _holder, _expires_at
+    _lock = threading.Lock()
+    _holder = None
+    _expires_at = 0.0
+    for key in _stats:
+        _stats[key] = 0
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def is_leader():
+    """Whether this process held the lease at its last renewal and it has not expired since."""
+    with _lock:
+        return time.time() < _expires_at
+
+
+def renew():
+    """Take the lease if it is free or expired, or extend it if we hold it. Returns leadership."""
+    global _expires_at
+    holder = holder_id()
+    now = time.time()
+    expires_at = now + Config.SCHEDULER_LEASE_TTL
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute(
+                """INSERT OR IGNORE INTO scheduler_leases (name, holder, acquired_at, expires_at)
+                   VALUES (?, '', 0, 0)""",
+                (NAME,),
+            )
+            cursor = conn.execute(
+                """UPDATE scheduler_leases
+                   SET acquired_at = CASE WHEN holder = ? THEN acquired_at ELSE ? END,
+                       holder = ?, expires_at = ?
+                   WHERE name = ? AND (holder = ? OR expires_at < ?)""",
+                (holder, now, holder, expires_at, NAME, holder, now),
+            )
+        won = cursor.rowcount == 1
+    except Exception as e:
+        # Keep the current expiry: a leader that cannot reach the database steps down once it passes.
+        with _lock:
+            _stats["errors"] += 1
+        print(f"Scheduler lease renewal failed: {e}")
+        return is_leader()
+
+    with _lock:
+        was_leader = now < _expires_at
+        if won:
+            _expires_at = expires_at
+            _stats["renewals" if was_leader else "acquired"] += 1
+        else:
+            _expires_at = 0.0
+            if was_leader:
+                _stats["lost"] += 1
+    if won and not was_leader:
+        print(f"Scheduler lease acquired by {holder}; this process runs the background jobs.")
+    elif was_leader and not won:
+        print(f"Scheduler lease lost by {holder}; background jobs paused in this process.")
+    return won
+
+
+def release():
+    """Hand the lease back so another process can take over without waiting for it to expire."""
+    global _expires_at
+    with _lock:
+        if _expires_at == 0.0:
+            return
+        _expires_at = 0.0
+    try:
+        conn = get_db_connection()
+        with conn:
+            conn.execute(
+                "UPDATE scheduler_leases SET expires_at = 0 WHERE name = ? AND holder = ?", (NAME, holder_id())
+            )
+    except Exception as e:
+        print(f"Scheduler lease release failed: {e}")
+
+
+atexit.register(release)
+
+
+def leader_only(job):
+    """Wrap a scheduler job so it only runs in the process holding the lease."""
+
+    @functools.wraps(job)
+    def wrapper(*args, **kwargs):
+        if not is_leader():
+            return None
+        return job(*args, **kwargs)
+
+    return wrapper
+
+
+def get_stats():
+    """Return this process's lease counters and the holder currently recorded in the database."""
+    with _lock:
+        stats = dict(_stats)
+        stats["leader"] = time.time() < _expires_at
+    stats["process"] = holder_id()
+    row = get_db_connection().execute(
+        "SELECT holder, expires_at FROM scheduler_leases WHERE name = ?", (NAME,)
+    ).fetchone()
+    stats["holder"] = row["holder"] if row is not None and row["expires_at"] > time.time() else None
+    return stats
@@ -0,0 +1,305 @@
+"""Background alert check: fetch every tracked location and send alerts.
+
+Locations are processed concurrently on a bounded thread pool. Each tick has a
+deadline; locations that have not finished by then are counted as timed out
+and any that never started are cancelled, so a slow upstream cannot push the
+tick past the next scheduled run. Readings go through the write buffer and are
+committed together at the end of the tick.
+
+Locations are resolved to coordinates once, when they are first tracked, and
+grouped into cells of ``LOCATION_GRID_DEGREES``; a location that fails to
+geocode is retried after ``POLL_MAX_INTERVAL``. Each cell is one fetch unit:
+"London", "london, uk" and "London,GB" share a single upstream call and stored
+reading, and the subscribers of every alias are evaluated against it.
+
+The check runs every ``SCHEDULER_TICK_SECONDS`` but only fetches the cells
+that ``poll_planner`` says are due. Each fetch reports the subscriber count and
+threshold headroom back to the planner, which sets the cell's next poll time.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import Config
+from services import (
+    event_hub,
+    mail_queue,
+    metrics,
+    poll_planner,
+    reading_cache,
+    subscriber_registry,
+    threshold_engine,
+    write_buffer,
+)
+from services.geocode_cache import normalize_query
+from services.alert_service import check_and_send_alerts
+from services.api_service import fetch_air_quality_at, get_coordinates, grid_key
+
+_executor = None
+_executor_lock = threading.Lock()
+_tick_lock = threading.Lock()
+_running = set()  # grid cells still being processed, possibly from an earlier tick
+# Only touched by the tick itself (under _tick_lock). Tracked locations are geocoded once;
+# one that failed is retried after POLL_MAX_INTERVAL instead of on every tick.
+_cell_of = {}  # location -> (cell key, cell lat, cell lon, name)
+_geocode_retry_at = {}  # location -> monotonic time of the next geocoding attempt
+_running_lock = threading.Lock()
+_last_tick = {}
+_tick_seconds = metrics.histogram(
+    "alert_tick_seconds", "Duration of a scheduled alert check.",
+    buckets=(0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 240.0, 600.0),
+)
+_ticks_skipped = metrics.counter(
+    "alert_ticks_skipped_total", "Alert checks skipped because the previous one was still running."
+)
+_unit_seconds = metrics.histogram("alert_fetch_unit_seconds", "Fetch and alert evaluation time of one grid cell.")
+
+
+def check_deadline():
+    """Keep the tick deadline below the tick interval; returns the deadline in effect.
+
+    A tick still running when the next one is due makes APScheduler drop that
+    run (``max_instances=1``), so a longer deadline would silently skip ticks.
+    """
+    limit = max(1, Config.SCHEDULER_TICK_SECONDS - Config.SCHEDULER_TICK_MARGIN)
+    if Config.SCHEDULER_TICK_DEADLINE > limit:
+        print(
+            f"WARNING: SCHEDULER_TICK_DEADLINE={Config.SCHEDULER_TICK_DEADLINE} would run into the next "
+            f"tick (SCHEDULER_TICK_SECONDS={Config.SCHEDULER_TICK_SECONDS}); using {limit}s."
+        )
+        Config.SCHEDULER_TICK_DEADLINE = limit
+    return Config.SCHEDULER_TICK_DEADLINE
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.SCHEDULER_MAX_WORKERS,
+                thread_name_prefix="alert-check",
+            )
+        return _executor
+
+
+def _tracked_locations():
+    """Locations with subscribers plus those watched by an open live stream."""
+    subscriber_registry.refresh_if_stale()
+    locations = {}
+    for location in subscriber_registry.locations() + event_hub.watched_locations():
+        locations.setdefault(normalize_query(location), location)
+    return list(locations.values())
+
+
+class FetchUnit:
+    """One grid cell: a single upstream fetch shared by every location alias inside it."""
+
+    __slots__ = ("key", "lat", "lon", "name", "aliases")
+
+    def __init__(self, key, lat, lon, name):
+        self.key = key
+        self.lat = lat
+        self.lon = lon
+        self.name = name
+        self.aliases = []
+
+
+def _group_by_cell(locations, executor, timeout):
+    """Group ``locations`` by grid cell, geocoding only those not resolved before.
+
+    Returns ``(units, failed)`` where ``failed`` maps each location whose
+    geocoding failed in this call to the error message. Locations waiting to
+    retry a failed lookup are left out of both.
+    """
+    tracked = set(locations)
+    for cache in (_cell_of, _geocode_retry_at):
+        for location in [location for location in cache if location not in tracked]:
+            del cache[location]
+
+    now = time.monotonic()
+    pending = [
+        location for location in locations
+        if location not in _cell_of and _geocode_retry_at.get(location, now) <= now
+    ]
+    futures = {executor.submit(get_coordinates, location): location for location in pending}
+    done, not_done = wait(futures, timeout=timeout)
+    failed = {}
+    for future in futures:
+        location = futures[future]
+        if future in not_done:
+            future.cancel()
+            failed[location] = "geocoding timed out"
+            continue
+        try:
+            lat, lon, name = future.result()
+        except Exception as e:
+            failed[location] = str(e)
+            _geocode_retry_at[location] = now + Config.POLL_MAX_INTERVAL
+            continue
+        _geocode_retry_at.pop(location, None)
+        _cell_of[location] = (*grid_key(lat, lon), name)
+
+    units = {}
+    for location in locations:
+        if location not in _cell_of:
+            continue
+        key, cell_lat, cell_lon, name = _cell_of[location]
+        unit = units.get(key)
+        if unit is None:
+            unit = units[key] = FetchUnit(key, cell_lat, cell_lon, name)
+        unit.aliases.append(location)
+    return list(units.values()), failed
+
+
+def _alert_pressure(unit, data):
+    """Return ``(subscribers, headroom)`` over every alias of ``unit`` for the poll planner."""
+    from models.location import Location
+
+    subscribers = 0
+    headroom = None
+    for alias in unit.aliases:
+        location_id = Location.get_id(alias)
+        if location_id is None:
+            continue
+        thresholds = threshold_engine.get_thresholds(location_id)
+        subscribers += len(thresholds)
+        distance = thresholds.headroom(data) if len(thresholds) else None
+        if distance is not None:
+            headroom = distance if headroom is None else min(headroom, distance)
+    return subscribers, headroom
+
+
+def _check_unit(unit, batch):
+    """Fetch one grid cell and evaluate every alias against it. Returns the elapsed seconds."""
+    start = time.perf_counter()
+    try:
+        data = fetch_air_quality_at(unit.lat, unit.lon, unit.name, store=False)
+        write_buffer.add(unit.name, data)
+        for alias in unit.aliases:
+            reading_cache.put(alias, data)
+            check_and_send_alerts(alias, data, batch)
+        poll_planner.observe(unit, data, *_alert_pressure(unit, data))
+    finally:
+        with _running_lock:
+            _running.discard(unit.key)
+    elapsed = time.perf_counter() - start
+    _unit_seconds.observe(elapsed)
+    return elapsed
+
+
+def run_alert_tick():
+    """Run one alert check over all tracked locations and return a summary dict.
+
+    Returns None without doing anything if the previous tick is still running.
+    """
+    if not _tick_lock.acquire(blocking=False):
+        _ticks_skipped.inc()
+        print("Scheduled check skipped: previous tick is still running.")
+        return None
+    try:
+        return _run_tick()
+    finally:
+        _tick_lock.release()
+
+
+def _run_tick():
+    started = time.time()
+    tick_start = time.perf_counter()
+    executor = _get_executor()
+
+    locations = _tracked_locations()
+    units, failures = _group_by_cell(locations, executor, Config.SCHEDULER_TICK_DEADLINE)
+    for location, error in failures.items():
+        print(f"Scheduled check failed for {location}: {error}")
+
+    with _running_lock:
+        busy = _running & {unit.key for unit in units}
+    skipped = [alias for unit in units if unit.key in busy for alias in unit.aliases]
+    due = poll_planner.select(units, busy)
+
+    batch = mail_queue.Batch()
+    futures = {}
+    for unit in due:
+        with _running_lock:
+            _running.add(unit.key)
+        futures[executor.submit(_check_unit, unit, batch)] = unit
+
+    remaining = Config.SCHEDULER_TICK_DEADLINE - (time.perf_counter() - tick_start)
+    done, not_done = wait(futures, timeout=max(0, remaining))
+
+    timings = {}
+    succeeded = 0
+    failed = len(failures)
+    for future in done:
+        unit = futures[future]
+        try:
+            timings[unit.name] = round(future.result(), 3)
+            succeeded += len(unit.aliases)
+        except Exception as e:
+            failed += len(unit.aliases)
+            poll_planner.failed(unit)
+            print(f"Scheduled check failed for {', '.join(unit.aliases)}: {e}")
+
+    timed_out = 0
+    for future in not_done:
+        unit = futures[future]
+        if future.cancel():
+            with _running_lock:
+                _running.discard(unit.key)
+        timed_out += len(unit.aliases)
+        poll_planner.failed(unit)
+        print(f"Scheduled check timed out for {', '.join(unit.aliases)}.")
+
+    # One commit for every reading fetched during this tick.
+    rows_written = write_buffer.flush()
+    # One SMTP session for every alert raised during this tick.
+    deliveries = batch.flush()
+
+    duration = time.perf_counter() - tick_start
+    _tick_seconds.observe(duration)
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:5]
+    summary = {
+        "started_at": started,
+        "duration_seconds": round(duration, 3),
+        "locations": len(locations),
+        "fetch_units": len(units),
+        "polled_units": len(due),
+        "succeeded": succeeded,
+        "failed": failed,
+        "timed_out": timed_out,
+        "skipped": len(skipped),
+        "rows_written": rows_written,
+        "emails_queued": len(deliveries),
+        "slowest": [{"location": loc, "seconds": secs} for loc, secs in slowest],
+    }
+    _last_tick.clear()
+    _last_tick.update(summary)
+    print(
+        f"Scheduled check: {summary['locations']} location(s) in {summary['duration_seconds']}s – "
+        f"{len(due)} of {len(units)} cell(s) due, {succeeded} ok, {failed} failed, {timed_out} timed out, "
+        f"{len(skipped)} skipped."
+    )
+    return summary
+
+
+def refresh_watched():
+    """Keep the live streams of a process without the scheduler lease up to date.
+
+    Readings of locations the lease holder tracks are taken from the database
+    once it has stored them. Locations only watched here are fetched like an
+    API request would, so they go upstream at most once per ``READING_CACHE_TTL``.
+    """
+    refreshed = 0
+    for location in event_hub.watched_locations():
+        try:
+            if not reading_cache.sync_stored(location):
+                reading_cache.get_reading(location)
+            refreshed += 1
+        except Exception as e:
+            print(f"Live stream refresh failed for {location}: {e}")
+    return refreshed
+
+
+def get_last_tick():
+    """Return the summary of the most recent tick (empty before the first run)."""
+    return dict(_last_tick)
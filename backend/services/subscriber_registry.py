@@ -0,0 +1,138 @@
+"""Process-level registry of alert subscribers, keyed by location.
+
+All user preferences are loaded once at startup into compact ``__slots__``
+records. ``UserPreferences.create``, ``update`` and ``delete`` write through to
+the registry, so the scheduler and the alert routes read subscribers from
+memory instead of querying ``user_preferences`` on every check. A
+single-row read of the table's write counter (bumped by triggers, see
+``db_setup``) picks up changes made by other processes; the leader runs
+it every alert tick, other processes on every manual check and live-stream
+refresh.
+"""
+import threading
+
+from database.db_setup import get_db_connection
+from services import threshold_engine
+
+
+class Subscriber:
+    """The alert-relevant fields of one ``user_preferences`` row."""
+
+    __slots__ = (
+        "id", "location_id", "location", "email", "email_enabled", "alert_threshold",
+        "pm25_threshold", "pm10_threshold", "no2_threshold", "o3_threshold",
+    )
+
+    def __init__(self, row):
+        for field in self.__slots__:
+            setattr(self, field, row[field])
+        self.email_enabled = bool(self.email_enabled)
+
+
+_by_id = {}
+_by_location = {}  # location_id -> {preference_id: Subscriber}
+_lock = threading.RLock()
+_loaded = False
+_fingerprint = None
+
+
+def _read_fingerprint(conn):
+    """Return the write counter of ``user_preferences``, kept up to date by triggers."""
+    row = conn.execute(
+        "SELECT version FROM table_versions WHERE name = 'user_preferences'"
+    ).fetchone()
+    return row[0] if row is not None else None
+
+
+def load():
+    """(Re)load every subscriber from the database. Returns the number loaded."""
+    global _loaded, _fingerprint
+    conn = get_db_connection()
+    columns = ", ".join(Subscriber.__slots__)
+    rows = conn.execute(f"SELECT {columns} FROM user_preferences").fetchall()
+    fingerprint = _read_fingerprint(conn)
+    with _lock:
+        _by_id.clear()
+        _by_location.clear()
+        for row in rows:
+            _add(Subscriber(row))
+        _loaded = True
+        _fingerprint = fingerprint
+        threshold_engine.invalidate_all()
+    return len(rows)
+
+
+def _ensure_loaded():
+    if not _loaded:
+        load()
+
+
+def refresh_if_stale():
+    """Reload if another process changed ``user_preferences`` since the last load."""
+    if not _loaded:
+        load()
+        return True
+    if _read_fingerprint(get_db_connection()) != _fingerprint:
+        load()
+        return True
+    return False
+
+
+def _add(subscriber):
+    _by_id[subscriber.id] = subscriber
+    _by_location.setdefault(subscriber.location_id, {})[subscriber.id] = subscriber
+
+
+def _discard(preference_id):
+    """Remove a subscriber and return its location_id (or None). Caller holds _lock."""
+    subscriber = _by_id.pop(preference_id, None)
+    if subscriber is None:
+        return None
+    subscribers = _by_location.get(subscriber.location_id)
+    if subscribers is not None:
+        subscribers.pop(preference_id, None)
+        if not subscribers:
+            del _by_location[subscriber.location_id]
+    return subscriber.location_id
+
+
+def upsert(row):
+    """Write-through for a created or updated preference row."""
+    global _fingerprint
+    _ensure_loaded()
+    subscriber = Subscriber(row)
+    with _lock:
+        previous_location = _discard(subscriber.id)
+        _add(subscriber)
+        _fingerprint = _read_fingerprint(get_db_connection())
+    threshold_engine.invalidate(previous_location, subscriber.location_id)
+
+
+def remove(preference_id):
+    """Write-through for a deleted preference."""
+    global _fingerprint
+    _ensure_loaded()
+    with _lock:
+        location_id = _discard(preference_id)
+        _fingerprint = _read_fingerprint(get_db_connection())
+    threshold_engine.invalidate(location_id)
+
+
+def locations():
+    """Return one location name per tracked location (the spelling of one subscriber)."""
+    _ensure_loaded()
+    with _lock:
+        return [next(iter(subs.values())).location for subs in _by_location.values()]
+
+
+def subscribers_for(location_id):
+    """Return the subscribers of a location, ordered by preference ID."""
+    _ensure_loaded()
+    with _lock:
+        subscribers = _by_location.get(location_id, {})
+        return [subscribers[key] for key in sorted(subscribers)]
+
+
+def get_stats():
+    with _lock:
+        return {"subscribers": len(_by_id), "locations": len(_by_location), "loaded": _loaded}
@@ -0,0 +1,105 @@
+"""Vectorized subscriber threshold evaluation.
+
+For each location the thresholds of every email-enabled subscriber are held
+in columnar NumPy arrays, so a new reading is compared against all of them in
+one vectorized operation per metric instead of a Python loop over rows. The
+arrays are built from the in-memory subscriber registry and rebuilt for a
+location only when one of its preferences changes.
+"""
+import threading
+
+import numpy as np
+
+# metric -> user_preferences column; metrics without a threshold are stored as NaN
+THRESHOLD_COLUMNS = {
+    "aqi": "alert_threshold",
+    "pm25": "pm25_threshold",
+    "pm10": "pm10_threshold",
+    "no2": "no2_threshold",
+    "o3": "o3_threshold",
+}
+DEFAULT_AQI_THRESHOLD = 150
+
+_by_location = {}
+_lock = threading.Lock()
+_version = 0  # bumped on every invalidation so a load racing a write is not cached
+
+
+class LocationThresholds:
+    """Columnar thresholds for the email-enabled subscribers of one location."""
+
+    __slots__ = ("ids", "emails", "thresholds")
+
+    def __init__(self, subscribers):
+        subscribers = [s for s in subscribers if s.email_enabled and s.email]
+        self.ids = np.array([s.id for s in subscribers], dtype=np.int64)
+        self.emails = [s.email for s in subscribers]
+        self.thresholds = {}
+        for metric, column in THRESHOLD_COLUMNS.items():
+            values = [getattr(s, column) for s in subscribers]
+            if metric == "aqi":
+                values = [v or DEFAULT_AQI_THRESHOLD for v in values]
+            else:
+                values = [v if v else np.nan for v in values]
+            self.thresholds[metric] = np.array(values, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def exceeded(self, reading):
+        """Return {metric: boolean mask} of subscribers whose threshold is met or exceeded."""
+        return {
+            metric: thresholds <= float(reading.get(metric) or 0)
+            for metric, thresholds in self.thresholds.items()
+        }
+
+    def headroom(self, reading):
+        """Return the smallest relative distance of any reading value to any threshold.
+
+        0 means a value sits exactly on a subscriber's threshold, 0.5 that every
+        value is at least 50% above or below; None when there are no subscribers.
+        """
+        nearest = None
+        for metric, thresholds in self.thresholds.items():
+            value = reading.get(metric)
+            if value is None or not len(thresholds) or np.isnan(thresholds).all():
+                continue
+            distance = float(np.nanmin(np.abs(thresholds - float(value)) / thresholds))
+            nearest = distance if nearest is None else min(nearest, distance)
+        return nearest
+
+
+def _load(location_id):
+    from services import subscriber_registry
+
+    return LocationThresholds(subscriber_registry.subscribers_for(location_id))
+
+
+def get_thresholds(location_id):
+    """Return the LocationThresholds for ``location_id``, building it on first use."""
+    with _lock:
+        thresholds = _by_location.get(location_id)
+        version = _version
+    if thresholds is None:
+        thresholds = _load(location_id)
+        with _lock:
+            if version == _version:
+                _by_location[location_id] = thresholds
+    return thresholds
+
+
+def invalidate(*location_ids):
+    """Drop the arrays of locations whose preferences changed; they rebuild on next use."""
+    global _version
+    with _lock:
+        _version += 1
+        for location_id in location_ids:
+            _by_location.pop(location_id, None)
+
+
+def invalidate_all():
+    """Drop the arrays of every location."""
+    global _version
+    with _lock:
+        _version += 1
+        _by_location.clear()
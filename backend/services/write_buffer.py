@@ -0,0 +1,100 @@
+"""Write-behind buffer for air quality readings.
+
+Readings from concurrent fetches are collected in memory and written with
+``AirQualityData.save_many``, so a scheduler tick over hundreds of locations
+costs one commit instead of one per location. The buffer is flushed when it
+reaches ``WRITE_BUFFER_MAX_ROWS``, every ``WRITE_BUFFER_FLUSH_INTERVAL``
+seconds by a background thread, on demand with ``flush()``, and once more at
+interpreter exit. Readings that fail to be written ``WRITE_BUFFER_MAX_RETRIES``
+times are dropped (and counted), so a database that keeps failing cannot make
+the buffer grow without bound.
+"""
+import atexit
+import threading
+
+from config import Config
+from models.air_quality_data import AirQualityData
+
+_pending = []  # (location, data)
+_attempts = []  # failed writes so far, parallel to _pending
+_lock = threading.Lock()
+_flush_lock = threading.Lock()  # keeps flushes, and so row order, sequential
+_flusher = None
+_stop = threading.Event()
+_stats = {"buffered": 0, "written": 0, "flushes": 0, "failed_flushes": 0, "dropped": 0}
+
+
+def add(location, data):
+    """Buffer one reading. Flushes immediately once the buffer is full."""
+    with _lock:
+        _pending.append((location, data))
+        _attempts.append(0)
+        _stats["buffered"] += 1
+        full = len(_pending) >= Config.WRITE_BUFFER_MAX_ROWS
+    _ensure_flusher()
+    if full:
+        flush()
+
+
+def flush():
+    """Write every buffered reading in one transaction. Returns the number written.
+
+    On failure the readings are put back at the front of the buffer so the
+    next flush retries them, except those that already failed
+    ``WRITE_BUFFER_MAX_RETRIES`` times, which are dropped.
+    """
+    with _flush_lock:
+        with _lock:
+            batch = _pending[:]
+            attempts = _attempts[:]
+            del _pending[:]
+            del _attempts[:]
+        if not batch:
+            return 0
+        try:
+            AirQualityData.save_many(batch)
+        except Exception as e:
+            retry = [i for i, n in enumerate(attempts) if n + 1 < Config.WRITE_BUFFER_MAX_RETRIES]
+            dropped = len(batch) - len(retry)
+            with _lock:
+                _pending[:0] = [batch[i] for i in retry]
+                _attempts[:0] = [attempts[i] + 1 for i in retry]
+                _stats["failed_flushes"] += 1
+                _stats["dropped"] += dropped
+            print(f"Write buffer: failed to write {len(batch)} reading(s), dropped {dropped}: {e}")
+            return 0
+        with _lock:
+            _stats["written"] += len(batch)
+            _stats["flushes"] += 1
+        return len(batch)
+
+
+def _ensure_flusher():
+    global _flusher
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name="write-buffer", daemon=True)
+            _flusher.start()
+
+
+def _flush_loop():
+    while not _stop.wait(Config.WRITE_BUFFER_FLUSH_INTERVAL):
+        flush()
+
+
+def _shutdown():
+    _stop.set()
+    written = flush()
+    if written:
+        print(f"Write buffer: flushed {written} reading(s) on shutdown.")
+
+
+atexit.register(_shutdown)
+
+
+def get_stats():
+    """Return buffer counters and the number of readings waiting to be written."""
+    with _lock:
+        stats = dict(_stats)
+        stats["pending"] = len(_pending)
+    return stats
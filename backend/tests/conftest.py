@@ -0,0 +1,60 @@
+import contextlib
+import os
+import smtplib
+import sys
+
+import pytest
+from flask import Flask
+from flask_mail import Mail
+
+# Modules import each other as top-level packages (``from config import Config``).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import mail_queue  # noqa: E402
+
+
+class FakeMail:
+    """Stands in for Flask-Mail: records every message sent, optionally failing some recipients."""
+
+    def __init__(self, fail=()):
+        self.sent = []
+        self.fail = set(fail)
+        self.app = Flask(__name__)
+        Mail(self.app)
+
+    @contextlib.contextmanager
+    def connect(self):
+        yield self
+
+    def send(self, message):
+        recipient = message.recipients[0]
+        if recipient in self.fail:
+            raise smtplib.SMTPRecipientsRefused({recipient: (550, b"no such user")})
+        self.sent.append((recipient, message.subject))
+
+
+@pytest.fixture
+def mail(monkeypatch):
+    fake = FakeMail()
+    monkeypatch.setattr(mail_queue, "_mail", fake)
+    return fake
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh database file for the test; thread-local and pooled connections start over."""
+    from database import db_setup
+    from models.location import Location
+    from services import subscriber_registry
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    db_setup._local.conn = None
+    while not db_setup._pool.empty():
+        db_setup._pool.get_nowait().close()
+    Location._ids.clear()
+    db_setup.init_db()
+    subscriber_registry.load()
+    yield db_setup.get_db_connection()
+    db_setup._local.conn.close()
+    db_setup._local.conn = None
+    Location._ids.clear()
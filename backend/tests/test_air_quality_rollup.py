@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from models.air_quality_rollup import METRICS, AirQualityRollup
+from models.location import Location
+
+TIMESTAMPS = [
+    "2026-10-17T22:05:00", "2026-10-17T22:35:00", "2026-10-17T23:10:00",
+    "2026-10-18T00:00:00", "2026-10-18T00:20:00", "2026-10-18T00:40:00", "2026-10-18T01:15:00",
+]
+
+
+def insert(db, location_id, timestamp, aqi):
+    db.execute(
+        f"""INSERT INTO air_quality_data (location, location_id, timestamp, {", ".join(METRICS)})
+            VALUES ('Testville', ?, ?, {", ".join("?" * len(METRICS))})""",
+        (location_id, timestamp, aqi, aqi / 2, None, 1.0, 2.0, 3.0, 4.0),
+    )
+
+
+def buckets(db, table):
+    return [tuple(row) for row in db.execute(f"SELECT * FROM {table} ORDER BY location_id, bucket_start")]
+
+
+def test_rebuild_summarizes_every_hour_and_day(db):
+    location_id = Location.get_or_create_id("Testville")
+    with db:
+        for i, timestamp in enumerate(TIMESTAMPS):
+            insert(db, location_id, timestamp, 10 * (i + 1))
+        assert AirQualityRollup.rebuild(db) == 4
+
+    hourly = {row["bucket_start"]: row for row in db.execute("SELECT * FROM air_quality_hourly")}
+    assert sorted(hourly) == [
+        "2026-10-17T22:00:00", "2026-10-17T23:00:00", "2026-10-18T00:00:00", "2026-10-18T01:00:00",
+    ]
+    midnight = hourly["2026-10-18T00:00:00"]
+    assert midnight["samples"] == 3
+    assert (midnight["aqi_min"], midnight["aqi_max"], midnight["aqi_mean"], midnight["aqi_p95"]) == (40, 60, 50, 60)
+    assert midnight["pm10_mean"] is None
+
+    daily = {row["bucket_start"]: row for row in db.execute("SELECT * FROM air_quality_daily")}
+    assert sorted(daily) == ["2026-10-17T00:00:00", "2026-10-18T00:00:00"]
+    assert daily["2026-10-17T00:00:00"]["samples"] == 3
+    assert daily["2026-10-18T00:00:00"]["aqi_mean"] == 55
+    assert daily["2026-10-18T00:00:00"]["pm25_max"] == 35
+
+
+def test_refresh_matches_rebuild(db):
+    location_id = Location.get_or_create_id("Testville")
+    with db:
+        for i, timestamp in enumerate(TIMESTAMPS):
+            insert(db, location_id, timestamp, 10 * (i + 1))
+            AirQualityRollup.refresh(db, location_id, timestamp)
+    refreshed = buckets(db, "air_quality_hourly"), buckets(db, "air_quality_daily")
+
+    with db:
+        db.execute("DELETE FROM air_quality_hourly")
+        db.execute("DELETE FROM air_quality_daily")
+        AirQualityRollup.rebuild(db)
+    assert (buckets(db, "air_quality_hourly"), buckets(db, "air_quality_daily")) == refreshed
+
+
+def test_rebuild_keeps_buckets_without_raw_readings(db):
+    """Rollups of readings already removed by retention survive a rebuild."""
+    location_id = Location.get_or_create_id("Testville")
+    with db:
+        insert(db, location_id, TIMESTAMPS[0], 10)
+        AirQualityRollup.refresh(db, location_id, TIMESTAMPS[0])
+        db.execute("DELETE FROM air_quality_data")
+        insert(db, location_id, TIMESTAMPS[-1], 20)
+        AirQualityRollup.rebuild(db)
+    assert [row[1] for row in buckets(db, "air_quality_daily")] == ["2026-10-17T00:00:00", "2026-10-18T00:00:00"]
+
+
+def test_empty_and_non_empty_column_series_have_the_same_keys(db):
+    from services.api_service import fetch_air_quality_history
+
+    empty = fetch_air_quality_history("Testville", hours=24, resolution="hour", layout="columns")
+    location_id = Location.get_or_create_id("Testville")
+    now = datetime.utcnow().isoformat()
+    with db:
+        insert(db, location_id, now, 42)
+        AirQualityRollup.refresh(db, location_id, now)
+    filled = fetch_air_quality_history("Testville", hours=24, resolution="hour", layout="columns")
+
+    assert list(empty) == list(filled)
+    assert all(values == [] for values in empty.values())
+    assert filled["aqi"] == [42]
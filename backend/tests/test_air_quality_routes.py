@@ -0,0 +1,46 @@
+from flask import Flask
+
+from routes.air_quality import air_quality_bp
+
+
+def test_get_batch_is_not_a_location_lookup():
+    app = Flask(__name__)
+    app.register_blueprint(air_quality_bp)
+
+    response = app.test_client().get("/api/air-quality/batch")
+
+    assert response.status_code == 405
+    assert response.headers["Allow"] == "POST"
+    assert response.get_json()["success"] is False
+
+
+def test_batch_rejects_an_empty_list():
+    app = Flask(__name__)
+    app.register_blueprint(air_quality_bp)
+
+    response = app.test_client().post("/api/air-quality/batch", json={"locations": []})
+
+    assert response.status_code == 400
+
+
+def test_batch_still_returns_readings_that_could_not_be_saved(monkeypatch):
+    from models.air_quality_data import AirQualityData
+    from services import reading_cache
+
+    def fetched(location, store=True):
+        return {"location": location, "aqi": 42, "pm25": 10.0}, False, 0.0
+
+    def save_many(readings):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(reading_cache, "get_reading", fetched)
+    monkeypatch.setattr(AirQualityData, "save_many", save_many)
+    app = Flask(__name__)
+    app.register_blueprint(air_quality_bp)
+
+    response = app.test_client().post("/api/air-quality/batch", json={"locations": ["Paris", "Lyon"]})
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["data"]["location"] for r in results] == ["Paris", "Lyon"]
+    assert all(r["success"] and "database is locked" in r["save_error"] for r in results)
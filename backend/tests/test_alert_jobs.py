@@ -0,0 +1,65 @@
+import threading
+
+from services import alert_jobs, mail_queue
+
+
+def test_job_follows_only_its_own_deliveries(db, mail, monkeypatch):
+    """Another caller flushing while the job runs neither steals nor adds to the job's mail."""
+    other = mail_queue.Batch()
+    other.add("other@example.com", "Lyon", "Lyon alert", "lyon")
+
+    def check(location, data, batch):
+        batch.add("a@example.com", location, "alert", "body")
+        batch.add("b@example.com", location, "alert", "body")
+        other.flush()
+        return ["a@example.com", "b@example.com"]
+
+    monkeypatch.setattr(alert_jobs, "fetch_air_quality", lambda location: {"aqi": 180})
+    monkeypatch.setattr(alert_jobs.reading_cache, "put", lambda location, data: None)
+    monkeypatch.setattr(alert_jobs, "check_and_send_alerts", check)
+    mail.fail.add("b@example.com")
+
+    job = alert_jobs.AlertJob("Paris")
+    alert_jobs._run(job, "paris")
+
+    result = job.to_dict()
+    assert result["status"] == "done"
+    assert result["recipients"] == 2
+    assert result["processed"] == 2
+    assert (result["sent"], result["failed"]) == (1, 1)
+
+
+def test_job_without_alerts_finishes_at_once(db, mail, monkeypatch):
+    monkeypatch.setattr(alert_jobs, "fetch_air_quality", lambda location: {"aqi": 20})
+    monkeypatch.setattr(alert_jobs.reading_cache, "put", lambda location, data: None)
+    monkeypatch.setattr(alert_jobs, "check_and_send_alerts", lambda location, data, batch: [])
+
+    job = alert_jobs.AlertJob("Paris")
+    done = threading.Thread(target=alert_jobs._run, args=(job, "paris"))
+    done.start()
+    done.join(5)
+
+    assert job.to_dict()["status"] == "done"
+    assert job.to_dict()["recipients"] == 0
+
+
+def test_job_sees_subscribers_added_by_another_process(db, mail, monkeypatch):
+    from models.location import Location
+
+    location_id = Location.get_or_create_id("Testville")
+    with db:
+        # Written straight to the database, as another worker process would.
+        db.execute(
+            """INSERT INTO user_preferences (location, location_id, email, alert_threshold, email_enabled,
+                                             created_at, updated_at)
+               VALUES ('Testville', ?, 'new@example.com', 100, 1, '2026-10-18T00:00:00', '2026-10-18T00:00:00')""",
+            (location_id,),
+        )
+    monkeypatch.setattr(alert_jobs, "fetch_air_quality", lambda location: {"aqi": 180})
+    monkeypatch.setattr(alert_jobs.reading_cache, "put", lambda location, data: None)
+
+    job = alert_jobs.AlertJob("Testville")
+    alert_jobs._run(job, "testville")
+
+    assert job.to_dict()["recipients"] == 1
+    assert [recipient for recipient, _ in mail.sent] == ["new@example.com"]
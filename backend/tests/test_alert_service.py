@@ -0,0 +1,92 @@
+import pytest
+
+from models.alert_state import AlertState
+from models.user_preferences import UserPreferences
+from services import alert_service, mail_queue
+
+EMAIL = "alice@example.com"
+READING = {"aqi": 180, "pm25": 10.0, "pm10": 20.0, "no2": 5.0, "o3": 30.0}
+
+
+def check(reading=READING):
+    """Run one check in its own batch; return (recipients, deliveries after they finished)."""
+    batch = mail_queue.Batch()
+    recipients = alert_service.check_and_send_alerts("Testville", reading, batch)
+    deliveries = batch.flush()
+    for delivery in deliveries:
+        assert delivery.wait(5)
+    return recipients, deliveries
+
+
+def aqi_state(db):
+    row = db.execute("SELECT * FROM alert_state WHERE metric = 'aqi'").fetchone()
+    return AlertState.from_row(row)
+
+
+def test_failed_delivery_does_not_start_the_cooldown(db, mail):
+    UserPreferences.create({"location": "Testville", "email": EMAIL, "alert_threshold": 150, "email_enabled": True})
+    mail.fail.add(EMAIL)
+
+    recipients, deliveries = check()
+    assert recipients == [EMAIL]
+    assert [d.status for d in deliveries] == ["failed"]
+    state = aqi_state(db)
+    assert state.firing and state.last_sent_at is None and state.band is None
+
+    mail.fail.clear()
+    recipients, deliveries = check()
+    assert recipients == [EMAIL]
+    assert [d.status for d in deliveries] == ["sent"]
+    state = aqi_state(db)
+    assert state.last_sent_at is not None
+    assert state.band == alert_service.get_aqi_band(READING["aqi"])
+
+    assert check() == ([], [])
+
+
+def test_alert_is_not_queued_twice_while_in_flight(db, mail):
+    UserPreferences.create({"location": "Testville", "email": EMAIL, "alert_threshold": 150, "email_enabled": True})
+
+    first, second = mail_queue.Batch(), mail_queue.Batch()
+    assert alert_service.check_and_send_alerts("Testville", READING, first) == [EMAIL]
+    assert alert_service.check_and_send_alerts("Testville", READING, second) == []
+
+    (delivery,) = first.flush()
+    assert delivery.wait(5) and delivery.status == "sent"
+    assert aqi_state(db).last_sent_at is not None
+    assert check() == ([], [])
+
+
+def test_saving_a_state_keeps_the_delivered_band_of_a_firing_alert(db):
+    UserPreferences.create({"location": "Testville", "email": EMAIL})
+    preference_id = db.execute("SELECT id FROM user_preferences").fetchone()["id"]
+    AlertState.save_many([AlertState(preference_id, "aqi", True, None, 180, None, 1.0)])
+    AlertState.mark_sent([(preference_id, "aqi", 4)], 2.0)
+
+    # A check that loaded the state before the delivery finished saves its stale copy.
+    AlertState.save_many([AlertState(preference_id, "aqi", True, None, 190, None, 3.0)])
+    state = aqi_state(db)
+    assert (state.band, state.last_sent_at, state.last_value) == (4, 2.0, 190)
+
+    # Once clear, a new episode starts from scratch.
+    AlertState.save_many([AlertState(preference_id, "aqi", False, 4, 100, 2.0, 4.0)])
+    AlertState.save_many([AlertState(preference_id, "aqi", True, None, 180, None, 5.0)])
+    state = aqi_state(db)
+    assert (state.firing, state.band, state.last_sent_at) == (True, None, None)
+
+
+def test_failed_check_releases_its_in_flight_alerts(db, mail, monkeypatch):
+    UserPreferences.create({"location": "Testville", "email": EMAIL, "alert_threshold": 150, "email_enabled": True})
+    save_many = AlertState.save_many
+
+    def failing_save(states):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(AlertState, "save_many", failing_save)
+    with pytest.raises(RuntimeError):
+        alert_service.check_and_send_alerts("Testville", READING, mail_queue.Batch())
+    monkeypatch.setattr(AlertState, "save_many", save_many)
+
+    recipients, deliveries = check()
+    assert recipients == [EMAIL]
+    assert [d.status for d in deliveries] == ["sent"]
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from services.aqi_calculator import (
+    BREAKPOINTS,
+    MAX_AQI,
+    MOLAR_VOLUME,
+    MOLECULAR_WEIGHTS,
+    POLLUTANTS,
+    aqi_for_reading,
+    compute_aqi,
+    sub_index,
+)
+
+
+def to_ugm3(pollutant, value):
+    """Convert a value in the table's unit back to µg/m³ (nudged up so truncation keeps it)."""
+    if pollutant in MOLECULAR_WEIGHTS:
+        if pollutant == "co":
+            value = value * 1000.0  # ppm -> ppb
+        value = value * MOLECULAR_WEIGHTS[pollutant] / MOLAR_VOLUME
+    return value * (1 + 1e-7)
+
+
+BREAKPOINT_ENDS = [
+    (pollutant, c, i)
+    for pollutant, rows in BREAKPOINTS.items()
+    for c_low, c_high, i_low, i_high in rows
+    for c, i in ((c_low, i_low), (c_high, i_high))
+]
+SEAMS = [
+    (pollutant, below, above)
+    for pollutant, rows in BREAKPOINTS.items()
+    for below, above in zip(rows, rows[1:])
+]
+
+
+@pytest.mark.parametrize("pollutant,concentration,expected", BREAKPOINT_ENDS)
+def test_sub_index_at_breakpoints(pollutant, concentration, expected):
+    assert sub_index(pollutant, to_ugm3(pollutant, concentration)) == expected
+
+
+@pytest.mark.parametrize("pollutant,below,above", SEAMS)
+def test_sub_index_rises_across_seams(pollutant, below, above):
+    last_of_row = sub_index(pollutant, to_ugm3(pollutant, below[1]))
+    first_of_next = sub_index(pollutant, to_ugm3(pollutant, above[0]))
+    assert first_of_next == last_of_row + 1
+
+
+@pytest.mark.parametrize("pollutant,below,above", SEAMS)
+def test_aqi_for_reading_across_seams(pollutant, below, above):
+    assert aqi_for_reading({pollutant: to_ugm3(pollutant, below[1])}) == (below[3], pollutant)
+    assert aqi_for_reading({pollutant: to_ugm3(pollutant, above[0])}) == (above[2], pollutant)
+
+
+@pytest.mark.parametrize("pollutant", POLLUTANTS)
+def test_sub_index_never_decreases(pollutant):
+    top = BREAKPOINTS[pollutant][-1][1]
+    concentrations = to_ugm3(pollutant, np.linspace(0, top * 1.2, 20001))
+    indices = sub_index(pollutant, concentrations)
+    assert np.all(np.diff(indices) >= 0)
+    assert indices[-1] == MAX_AQI
+
+
+def test_ozone_above_the_8_hour_table():
+    assert [sub_index("o3", to_ugm3("o3", ppb)) for ppb in (200, 201, 250, 404, 604)] == [
+        300, 301, 325, 401, 500,
+    ]
+
+
+def test_missing_and_negative_values():
+    assert np.isnan(sub_index("pm25", np.nan))
+    assert np.isnan(sub_index("pm25", -1.0))
+    assert aqi_for_reading({}) == (0, None)
+    assert aqi_for_reading({"pm25": None, "pm10": 0.0}) == (0, None)
+
+
+def test_dominant_pollutant_is_the_highest_sub_index():
+    reading = {"pm25": to_ugm3("pm25", 35.5), "o3": to_ugm3("o3", 106), "no2": to_ugm3("no2", 54)}
+    assert aqi_for_reading(reading) == (201, "o3")
+
+
+def test_compute_aqi_on_columns():
+    aqi, dominant = compute_aqi({
+        "pm25": np.array([to_ugm3("pm25", 9.0), to_ugm3("pm25", 225.5)]),
+        "o3": np.array([to_ugm3("o3", 201), np.nan]),
+    })
+    assert aqi.tolist() == [301, 301]
+    assert dominant.tolist() == ["o3", "pm25"]
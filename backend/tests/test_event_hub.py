@@ -0,0 +1,22 @@
+from services import event_hub
+
+
+def test_wait_returns_only_new_events_for_its_keys_in_order():
+    cursor = event_hub.last_event_id()
+    event_hub.publish("Paris", {"aqi": 1})
+    event_hub.publish("Lyon", {"aqi": 2})
+    event_hub.publish("paris ", {"aqi": 3})
+
+    events, cursor = event_hub.wait(cursor, {"paris"}, 0)
+
+    assert [e.data["aqi"] for e in events] == [1, 3]
+    assert cursor == event_hub.last_event_id()
+    event_hub.publish("Paris", {"aqi": 4})
+    events, _ = event_hub.wait(cursor, {"paris"}, 0)
+    assert [e.data["aqi"] for e in events] == [4]
+
+
+def test_wait_times_out_without_new_events():
+    cursor = event_hub.last_event_id()
+
+    assert event_hub.wait(cursor, {"paris"}, 0) == ([], cursor)
@@ -0,0 +1,15 @@
+from services import http_client, metrics
+
+
+def test_upstream_latency_is_exported_once(monkeypatch):
+    monkeypatch.setattr(metrics, "_stats_sources", {"upstream": http_client.get_stats})
+    http_client._observe("https://api.example.com/data/2.5/air_pollution", 0.2, 200)
+
+    names = {
+        line.split("{")[0].split(" ")[0]
+        for line in metrics.render().splitlines()
+        if line.startswith("aqm_upstream_")
+    }
+
+    assert "aqm_upstream_request_seconds_sum" in names
+    assert not [name for name in names if "latency" in name]
@@ -0,0 +1,62 @@
+import time
+
+from services import mail_queue
+
+
+def test_alerts_for_one_recipient_merge_into_one_message(mail):
+    batch = mail_queue.Batch()
+    batch.add("a@example.com", "Paris", "Paris alert", "paris")
+    batch.add("a@example.com", "Lyon", "Lyon alert", "lyon")
+    batch.add("b@example.com", "Paris", "Paris alert", "paris")
+
+    deliveries = batch.flush()
+
+    assert [d.recipient for d in deliveries] == ["a@example.com", "b@example.com"]
+    assert deliveries[0].subject == "⚠️ Air Quality Alerts for 2 locations"
+    assert "paris" in deliveries[0].body and "lyon" in deliveries[0].body
+    assert deliveries[1].body == "paris" + mail_queue.SIGNATURE
+    for delivery in deliveries:
+        assert delivery.wait(5)
+        assert delivery.status == "sent"
+
+
+def test_flush_only_sends_its_own_batch(mail):
+    first = mail_queue.Batch()
+    second = mail_queue.Batch()
+    first.add("a@example.com", "Paris", "Paris alert", "paris")
+    second.add("b@example.com", "Lyon", "Lyon alert", "lyon")
+
+    deliveries = first.flush()
+
+    assert [d.recipient for d in deliveries] == ["a@example.com"]
+    assert len(second) == 1
+    assert mail_queue.get_stats()["pending"] >= 1
+    assert [d.recipient for d in second.flush()] == ["b@example.com"]
+    assert len(second) == 0
+
+
+def test_add_after_flush_is_sent_on_its_own(mail):
+    batch = mail_queue.Batch()
+    assert batch.flush() == []
+
+    batch.add("late@example.com", "Paris", "Paris alert", "paris")
+
+    assert len(batch) == 0
+    for _ in range(50):
+        if mail.sent:
+            break
+        time.sleep(0.1)
+    assert mail.sent == [("late@example.com", "Paris alert")]
+
+
+def test_refused_recipient_fails_without_holding_up_the_rest(mail):
+    mail.fail.add("bad@example.com")
+    batch = mail_queue.Batch()
+    batch.add("bad@example.com", "Paris", "Paris alert", "paris")
+    batch.add("good@example.com", "Paris", "Paris alert", "paris")
+
+    bad, good = batch.flush()
+
+    assert bad.wait(5) and good.wait(5)
+    assert bad.status == "failed"
+    assert good.status == "sent"
@@ -0,0 +1,18 @@
+from models.air_quality_data import AirQualityData
+from services import api_service, reading_cache
+
+
+def test_stored_reading_has_the_shape_of_a_live_one(db, monkeypatch):
+    monkeypatch.setattr(reading_cache, "_readings", type(reading_cache._readings)())
+    response = {"list": [{"main": {"aqi": 3}, "components": {
+        "pm2_5": 30.0, "pm10": 40.0, "co": 300.0, "no2": 20.0, "o3": 50.0, "so2": 5.0,
+    }}]}
+    live = api_service._parse_air_quality(response, "Testville")
+    AirQualityData.save("Testville", live)
+
+    data, cached, _ = reading_cache.get_reading("Testville")
+
+    assert cached
+    assert data == live
+    reading_cache._readings.clear()
+    assert reading_cache.peek("Testville")[0] == live
@@ -0,0 +1,64 @@
+from concurrent.futures import Future
+
+from config import Config
+from services import scheduler_service
+
+
+def test_deadline_past_the_next_tick_is_lowered(monkeypatch):
+    monkeypatch.setattr(Config, "SCHEDULER_TICK_SECONDS", 30)
+    monkeypatch.setattr(Config, "SCHEDULER_TICK_DEADLINE", 240)
+
+    assert scheduler_service.check_deadline() == 25
+    assert Config.SCHEDULER_TICK_DEADLINE == 25
+
+
+def test_deadline_within_the_tick_is_kept(monkeypatch):
+    monkeypatch.setattr(Config, "SCHEDULER_TICK_SECONDS", 300)
+    monkeypatch.setattr(Config, "SCHEDULER_TICK_DEADLINE", 240)
+
+    assert scheduler_service.check_deadline() == 240
+
+
+def test_default_deadline_fits_the_default_tick():
+    assert Config.SCHEDULER_TICK_DEADLINE <= Config.SCHEDULER_TICK_SECONDS - Config.SCHEDULER_TICK_MARGIN
+
+
+class ImmediateExecutor:
+    """Runs submitted calls inline and hands back finished futures."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def test_locations_are_geocoded_once_and_failures_retried_later(monkeypatch):
+    calls = []
+
+    def get_coordinates(location):
+        calls.append(location)
+        if location == "Atlantis":
+            raise ValueError("Location 'Atlantis' not found.")
+        return 51.5, -0.12, "London"
+
+    monkeypatch.setattr(scheduler_service, "get_coordinates", get_coordinates)
+    monkeypatch.setattr(scheduler_service, "_cell_of", {})
+    monkeypatch.setattr(scheduler_service, "_geocode_retry_at", {})
+    executor = ImmediateExecutor()
+
+    units, failed = scheduler_service._group_by_cell(["London", "london, uk", "Atlantis"], executor, 5)
+    assert [unit.aliases for unit in units] == [["London", "london, uk"]]
+    assert list(failed) == ["Atlantis"]
+
+    units, failed = scheduler_service._group_by_cell(["London", "london, uk", "Atlantis"], executor, 5)
+    assert [unit.aliases for unit in units] == [["London", "london, uk"]]
+    assert failed == {}
+    assert calls == ["London", "london, uk", "Atlantis"]
+
+    scheduler_service._geocode_retry_at["Atlantis"] = 0
+    scheduler_service._group_by_cell(["London", "Atlantis"], executor, 5)
+    assert calls[3:] == ["Atlantis"]
+    assert "london, uk" not in scheduler_service._cell_of
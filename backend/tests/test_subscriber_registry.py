@@ -0,0 +1,28 @@
+from models.location import Location
+from models.user_preferences import UserPreferences
+from services import subscriber_registry
+
+
+def test_refresh_picks_up_writes_from_other_processes(db):
+    preference = UserPreferences.create({"location": "Testville", "email": "a@example.com", "email_enabled": True})
+    location_id = Location.get_id("Testville")
+    assert subscriber_registry.refresh_if_stale() is False
+
+    # Straight to the database, as another worker process would write.
+    with db:
+        db.execute("UPDATE user_preferences SET email = 'b@example.com' WHERE id = ?", (preference.id,))
+    assert subscriber_registry.refresh_if_stale() is True
+    assert [s.email for s in subscriber_registry.subscribers_for(location_id)] == ["b@example.com"]
+
+    with db:
+        db.execute("DELETE FROM user_preferences")
+    assert subscriber_registry.refresh_if_stale() is True
+    assert subscriber_registry.subscribers_for(location_id) == []
+    assert subscriber_registry.refresh_if_stale() is False
+
+
+def test_fingerprint_reads_one_row(db):
+    plan = db.execute(
+        "EXPLAIN QUERY PLAN SELECT version FROM table_versions WHERE name = 'user_preferences'"
+    ).fetchall()
+    assert all("SCAN" not in row["detail"] for row in plan)
@@ -1,5 +1,5 @@
 import React, { useState } from "react";
-import { getAirQuality } from "../services/api";
+import { getAirQualityBatch } from "../services/api";
 import { getAQIColor, getAQILabel, formatPollutant } from "../utils/helpers";
 import { POLLUTANT_LABELS, POLLUTANT_UNITS } from "../utils/constants";
 
@@ -9,22 +9,41 @@ export default function Comparison() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
 
+  // Fetches all names in one batch request; returns the readings and per-location errors.
+  async function fetchBatch(names) {
+    const res = await getAirQualityBatch(names);
+    if (!res.success) throw new Error(res.error || "Failed to fetch data.");
+    const readings = res.results.filter((r) => r.success).map((r) => r.data);
+    const errors = res.results.filter((r) => !r.success).map((r) => `${r.location}: ${r.error}`);
+    return { readings, errors };
+  }
+
+  function mergeReadings(prev, readings) {
+    const byName = new Map(prev.map((l) => [l.location.toLowerCase(), l]));
+    readings.forEach((r) => byName.set(r.location.toLowerCase(), r));
+    return Array.from(byName.values());
+  }
+
+  // Accepts one city or a comma-separated list, e.g. "London, Paris, Berlin".
   async function addLocation() {
-    const trimmed = input.trim();
-    if (!trimmed) return;
-    if (locations.find((l) => l.location?.toLowerCase() === trimmed.toLowerCase())) {
-      setError("Location already added.");
+    const names = input
+      .split(",")
+      .map((n) => n.trim())
+      .filter(Boolean)
+      .filter((n) => !locations.find((l) => l.location?.toLowerCase() === n.toLowerCase()));
+    if (names.length === 0) {
+      if (input.trim()) setError("Location already added.");
       return;
     }
     setError("");
     setLoading(true);
     try {
-      const res = await getAirQuality(trimmed);
-      if (res.success) {
-        setLocations((prev) => [...prev, res.data]);
-        setInput("");
+      const { readings, errors } = await fetchBatch(names);
+      setLocations((prev) => mergeReadings(prev, readings));
+      if (errors.length > 0) {
+        setError(errors.join(" · "));
       } else {
-        setError(res.error || "Failed to fetch data.");
+        setInput("");
       }
     } catch (err) {
       setError(err.message);
@@ -33,6 +52,21 @@ export default function Comparison() {
     }
   }
 
+  async function refreshAll() {
+    if (locations.length === 0) return;
+    setError("");
+    setLoading(true);
+    try {
+      const { readings, errors } = await fetchBatch(locations.map((l) => l.location));
+      setLocations((prev) => mergeReadings(prev, readings));
+      if (errors.length > 0) setError(errors.join(" · "));
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoading(false);
+    }
+  }
+
   function removeLocation(locationName) {
     setLocations((prev) => prev.filter((l) => l.location !== locationName));
   }
@@ -53,7 +87,7 @@ export default function Comparison() {
           value={input}
           onChange={(e) => setInput(e.target.value)}
           onKeyDown={(e) => e.key === "Enter" && addLocation()}
-          placeholder="Add a city to compare…"
+          placeholder="Add cities to compare, e.g. London, Paris…"
           className="location-input"
           disabled={loading}
         />
@@ -64,6 +98,13 @@ export default function Comparison() {
         >
           {loading ? "Loading…" : "+ Add"}
         </button>
+        <button
+          className="btn btn-secondary"
+          onClick={refreshAll}
+          disabled={loading || locations.length === 0}
+        >
+          ↻ Refresh all
+        </button>
       </div>
 
       {error && <p className="error-message">{error}</p>}
@@ -3,9 +3,9 @@ import LocationInput from "./LocationInput";
 import AirQualityCard from "./AirQualityCard";
 import TrendChart from "./TrendChart";
 import Recommendations from "./Recommendations";
-import { getAirQuality, getAirQualityHistory } from "../services/api";
+import { getAirQuality, getAirQualityHistory, openLiveStream } from "../services/api";
 import { checkAndNotify } from "../services/notifications";
-import { POLL_INTERVAL, DEFAULT_THRESHOLDS } from "../utils/constants";
+import { DEFAULT_THRESHOLDS } from "../utils/constants";
 
 export default function Dashboard() {
   const [airData, setAirData] = useState(null);
@@ -15,15 +15,16 @@ export default function Dashboard() {
   const [error, setError] = useState("");
   const [lastUpdated, setLastUpdated] = useState(null);
   const [currentLocation, setCurrentLocation] = useState("");
+  const [historyRange, setHistoryRange] = useState("24h");
 
-  const fetchData = useCallback(async (location) => {
+  const fetchData = useCallback(async (location, range) => {
     if (!location) return;
     setLoading(true);
     setError("");
     try {
       const [aqRes, histRes] = await Promise.allSettled([
         getAirQuality(location),
-        getAirQualityHistory(location),
+        getAirQualityHistory(location, range),
       ]);
 
       if (aqRes.status === "fulfilled" && aqRes.value.success) {
@@ -47,18 +48,40 @@ export default function Dashboard() {
     }
   }, []);
 
-  // Auto-refresh every POLL_INTERVAL ms
+  // Live updates: the server pushes a reading whenever a new one is fetched.
   useEffect(() => {
     if (!currentLocation) return;
-    const interval = setInterval(() => {
-      fetchData(currentLocation);
-    }, POLL_INTERVAL);
-    return () => clearInterval(interval);
-  }, [currentLocation, fetchData]);
+    const source = openLiveStream([currentLocation]);
+    source.addEventListener("reading", async (event) => {
+      const { data, recommendations } = JSON.parse(event.data);
+      setAirData(data);
+      setRecommendations(recommendations);
+      setLastUpdated(new Date().toISOString());
+      checkAndNotify(data.aqi, currentLocation, DEFAULT_THRESHOLDS.aqi);
+      try {
+        const res = await getAirQualityHistory(currentLocation, historyRange);
+        if (res.success) setHistory(res.data || []);
+      } catch (err) {
+        // Keep the current chart; the next reading retries.
+      }
+    });
+    return () => source.close();
+  }, [currentLocation, historyRange]);
 
   function handleSearch(location) {
     setCurrentLocation(location);
-    fetchData(location);
+    fetchData(location, historyRange);
+  }
+
+  async function handleRangeChange(range) {
+    setHistoryRange(range);
+    if (!currentLocation) return;
+    try {
+      const res = await getAirQualityHistory(currentLocation, range);
+      if (res.success) setHistory(res.data || []);
+    } catch (err) {
+      setError(err.message);
+    }
   }
 
   return (
@@ -95,7 +118,11 @@ export default function Dashboard() {
             <Recommendations recommendations={recommendations} />
           </div>
           <div className="dashboard-chart">
-            <TrendChart history={history} />
+            <TrendChart
+              history={history}
+              range={historyRange}
+              onRangeChange={handleRangeChange}
+            />
           </div>
         </div>
       )}
@@ -110,7 +137,7 @@ export default function Dashboard() {
 
       {currentLocation && (
         <p className="refresh-note">
-          Auto-refreshes every 5 minutes · Monitoring: <strong>{currentLocation}</strong>
+          Live updates · Monitoring: <strong>{currentLocation}</strong>
         </p>
       )}
     </div>
@@ -11,7 +11,7 @@ import {
   Filler,
 } from "chart.js";
 import { Line } from "react-chartjs-2";
-import { POLLUTANT_LABELS, POLLUTANT_UNITS } from "../utils/constants";
+import { HISTORY_RANGES, POLLUTANT_LABELS, POLLUTANT_UNITS } from "../utils/constants";
 import { getAQIColor } from "../utils/helpers";
 
 ChartJS.register(
@@ -27,21 +27,40 @@ ChartJS.register(
 
 const POLLUTANT_KEYS = ["aqi", "pm25", "pm10", "co", "no2", "o3", "so2"];
 
-export default function TrendChart({ history }) {
+export default function TrendChart({ history, range = "24h", onRangeChange }) {
   const [activePollutant, setActivePollutant] = useState("aqi");
+  const rangeOption = HISTORY_RANGES.find((r) => r.value === range) || HISTORY_RANGES[0];
+
+  const rangeControls = onRangeChange && (
+    <div className="chart-controls">
+      {HISTORY_RANGES.map((r) => (
+        <button
+          key={r.value}
+          className={`chart-btn ${range === r.value ? "active" : ""}`}
+          onClick={() => onRangeChange(r.value)}
+        >
+          {r.label}
+        </button>
+      ))}
+    </div>
+  );
 
   if (!history || history.length === 0) {
     return (
       <div className="trend-chart-container">
         <h3>Air Quality Trend</h3>
+        {rangeControls}
         <p className="no-data">No historical data available yet. Data is stored as you search.</p>
       </div>
     );
   }
 
+  const showDates = range !== "24h";
   const labels = history.map((item) => {
     const date = new Date(item.timestamp + (item.timestamp.endsWith("Z") ? "" : "Z"));
-    return date.toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" });
+    return showDates
+      ? date.toLocaleDateString([], { month: "short", day: "numeric" })
+      : date.toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" });
   });
 
   const values = history.map((item) => item[activePollutant] ?? 0);
@@ -76,7 +95,7 @@ export default function TrendChart({ history }) {
       },
       title: {
         display: true,
-        text: "Air Quality Trend (Last 24 Hours)",
+        text: `Air Quality Trend (Last ${rangeOption.label})`,
         color: "#e0e0e0",
       },
     },
@@ -95,6 +114,7 @@ export default function TrendChart({ history }) {
 
   return (
     <div className="trend-chart-container">
+      {rangeControls}
       <div className="chart-controls">
         {POLLUTANT_KEYS.map((key) => (
           <button
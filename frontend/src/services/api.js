@@ -24,13 +24,25 @@ export async function getAirQuality(location) {
   return response.data;
 }
 
-export async function getAirQualityHistory(location) {
+export async function getAirQualityBatch(locations) {
+  const response = await api.post("/api/air-quality/batch", { locations });
+  return response.data;
+}
+
+export async function getAirQualityHistory(location, range = "24h") {
   const response = await api.get(
-    `/api/air-quality/${encodeURIComponent(location)}/history`
+    `/api/air-quality/${encodeURIComponent(location)}/history`,
+    { params: { range } }
   );
   return response.data;
 }
 
+// Server-Sent Events stream of new readings; the browser reconnects and resumes on its own.
+export function openLiveStream(locations) {
+  const query = encodeURIComponent(locations.join(","));
+  return new EventSource(`${API_BASE_URL}/api/stream?locations=${query}`);
+}
+
 export async function savePreferences(data) {
   const response = await api.post("/api/preferences", data);
   return response.data;
@@ -67,7 +67,14 @@ export const DEFAULT_THRESHOLDS = {
 export const API_BASE_URL =
   process.env.REACT_APP_API_URL || "http://localhost:5000";
 
-export const POLL_INTERVAL = 300000; // 5 minutes in milliseconds
+// History ranges offered by the trend chart; longer ranges are served from
+// hourly/daily rollups by the backend.
+export const HISTORY_RANGES = [
+  { value: "24h", label: "24 Hours" },
+  { value: "7d", label: "7 Days" },
+  { value: "30d", label: "30 Days" },
+  { value: "1y", label: "1 Year" },
+];
 
 export const POLLUTANT_UNITS = {
   pm25: "µg/m³",